@@ -96,6 +96,13 @@ async def detailed_health_check():
         # 基础版本无需额外的存储统计信息
         details["storage"] = {"status": "基础版本，无向量存储"}
         
+        # 知识库监听状态(队列深度、同步延迟)
+        from app.core.kb_watcher import get_knowledge_base_watcher
+        watcher = get_knowledge_base_watcher()
+        details["knowledge_base_watcher"] = (
+            watcher.get_stats() if watcher else {"running": False}
+        )
+        
         return details
         
     except Exception as e:
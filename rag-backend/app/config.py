@@ -5,7 +5,7 @@
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict, Optional
 import os
 
 class Settings(BaseSettings):
@@ -15,10 +15,32 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = Field(..., description="OpenAI API密钥")
     OPENAI_MODEL: str = Field(default="gpt-4.1-mini", description="OpenAI模型名称")
     OPENAI_EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="嵌入模型名称")
+    OPENAI_EMBEDDING_DIMENSIONS: Optional[int] = Field(default=None, description="嵌入输出维度(text-embedding-3-*支持降维，为空时使用模型默认维度)")
     
-    # ChromaDB配置
-    CHROMA_PERSIST_DIRECTORY: str = Field(default="./chroma_db", description="ChromaDB持久化目录")
-    CHROMA_COLLECTION_NAME: str = Field(default="personal_knowledge", description="ChromaDB集合名称")
+    # 嵌入提供方配置
+    EMBEDDING_PROVIDER: str = Field(default="openai", description="嵌入提供方: openai、hashing(本地哈希向量化) 或 onnx(本地句向量模型)")
+    EMBEDDING_LOCAL_DIMENSIONS: int = Field(default=384, description="hashing提供方的向量维度")
+    EMBEDDING_ONNX_MODEL_PATH: str = Field(default="./models/all-MiniLM-L6-v2", description="ONNX模型目录(含model.onnx和tokenizer.json)")
+    EMBEDDING_LOCAL_BATCH_SIZE: int = Field(default=32, description="本地提供方每批文本数")
+    EMBEDDING_LOCAL_THREADS: int = Field(default=2, description="本地提供方线程池大小")
+    EMBEDDING_MIGRATION_ENABLED: bool = Field(default=False, description="嵌入模型/维度变化后在后台迁移到影子集合(旧集合继续服务)，关闭时全量重建")
+    EMBEDDING_MIGRATION_TOKENS_PER_MINUTE: int = Field(default=500000, description="迁移时每分钟最多向量化的token数(0表示不限速)")
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = Field(default=64, description="迁移时每批向量化的分块数")
+    EMBEDDING_MIGRATION_SHADOW_QUERIES: bool = Field(default=True, description="迁移期间同时查询影子集合，统计结果重合度和延迟")
+    
+    # 向量数据库配置
+    VECTOR_BACKEND: str = Field(default="chroma", description="向量存储后端: chroma 或 numpy(内存映射矩阵，切换后需重建或导入快照)")
+    CHROMA_PERSIST_DIRECTORY: str = Field(default="./chroma_db", description="向量数据持久化目录(两种后端共用)")
+    CHROMA_COLLECTION_NAME: str = Field(default="personal_knowledge", description="集合名称")
+    INDEX_SNAPSHOT_PATH: str = Field(default="", description="预构建的索引快照目录(启动时集合为空则导入，留空不启用)")
+    NUMPY_INDEX_MODE: str = Field(default="exact", description="NumPy后端检索模式: exact(精确) 或 ivf(近似)")
+    NUMPY_IVF_MIN_VECTORS: int = Field(default=20000, description="向量数达到该值才启用IVF")
+    NUMPY_IVF_NLIST: int = Field(default=0, description="IVF列表数(0表示取向量数的平方根)")
+    NUMPY_IVF_NPROBE: int = Field(default=8, description="IVF每次查询探测的列表数")
+    NUMPY_QUANTIZATION: str = Field(default="none", description="NumPy后端向量量化: none 或 int8(内存约为1/4，候选从磁盘全精度重排)")
+    NUMPY_RERANK_FACTOR: int = Field(default=4, description="量化检索时全精度重排的候选数(相对于top-k的倍数)")
+    VECTOR_READ_WORKERS: int = Field(default=4, description="向量存储读通道(检索/统计)线程数")
+    VECTOR_WRITE_WORKERS: int = Field(default=1, description="向量存储写通道(写入/删除)线程数")
     
     # API配置
     API_HOST: str = Field(default="0.0.0.0", description="API服务器地址")
@@ -30,12 +52,78 @@ class Settings(BaseSettings):
     MAX_ROUNDS_PER_SESSION: int = Field(default=5, description="每会话最大轮数")
     
     # 分块配置
-    CHUNK_SIZE: int = Field(default=1500, description="文档分块大小")
-    CHUNK_OVERLAP: int = Field(default=200, description="分块重叠大小")
+    CHUNK_SIZE: int = Field(default=1500, description="文档分块大小(token)")
+    CHUNK_OVERLAP: int = Field(default=200, description="分块重叠大小(token)")
+    MARKDOWN_SECTION_LEVEL: int = Field(default=3, description="Markdown按标题分块的最深层级(1-6)")
+    TIKTOKEN_CACHE_DIR: str = Field(default="./tiktoken_cache", description="tiktoken编码文件目录(首次使用时下载，之后离线可用)")
+    
+    # 嵌入缓存配置
+    EMBEDDING_CACHE_ENABLED: bool = Field(default=True, description="启用嵌入向量持久化缓存")
+    EMBEDDING_CACHE_PATH: str = Field(default="./embedding_cache/embeddings.db", description="嵌入缓存数据库路径")
+    EMBEDDING_CACHE_MAX_MB: int = Field(default=256, description="嵌入缓存容量上限(MB)")
+    
+    # 查询向量缓存配置
+    QUERY_EMBEDDING_CACHE_SIZE: int = Field(default=1024, description="查询向量缓存条目数上限")
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = Field(default=86400, description="查询向量缓存有效期(秒)")
+    
+    # 语义回答缓存配置
+    ANSWER_CACHE_ENABLED: bool = Field(default=True, description="启用语义回答缓存(相似问题复用回答)")
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.95, description="复用回答所需的最低查询相似度")
+    ANSWER_CACHE_SIZE: int = Field(default=256, description="回答缓存条目数上限")
+    ANSWER_CACHE_TTL_SECONDS: int = Field(default=3600, description="回答缓存有效期(秒)")
+    
+    # 嵌入批处理配置
+    EMBEDDING_BATCH_MAX_TOKENS: int = Field(default=100000, description="单次嵌入请求的token预算")
+    EMBEDDING_BATCH_MAX_INPUTS: int = Field(default=1024, description="单次嵌入请求的最大输入数")
+    EMBEDDING_MAX_INPUT_TOKENS: int = Field(default=8191, description="单个输入的最大token数")
+    EMBEDDING_CONCURRENCY: int = Field(default=4, description="并发嵌入请求数")
+    EMBEDDING_BATCH_LINGER_SECONDS: float = Field(default=0.05, description="凑批等待时间(秒)")
+    
+    # 近似去重配置
+    NEAR_DUP_ENABLED: bool = Field(default=True, description="摄取时合并近似重复的分块")
+    NEAR_DUP_MAX_DISTANCE: int = Field(default=6, description="SimHash汉明距离不超过该值视为近似重复(64位指纹)")
+    
+    # 标签配置
+    TAG_KEYWORDS_FILE: Optional[str] = Field(default=None, description="标签关键词/别名文件(JSON)，为空时使用app/data/tag_keywords.json")
+    
+    # 摄取流水线配置
+    INGEST_QUEUE_SIZE: int = Field(default=8, description="流水线阶段间队列容量")
+    INGEST_STAGE_WORKERS: Dict[str, int] = Field(
+        default_factory=lambda: {"read": 2, "clean": 1, "chunk": 1, "tag": 1, "embed": 2, "write": 1},
+        description="流水线各阶段并发数"
+    )
+    INGEST_PROCESS_WORKERS: int = Field(default=0, description="分块/打标签进程池大小(0表示在事件循环内执行)")
+    
+    # 知识库配置
+    KNOWLEDGE_BASE_PATH: str = Field(default="./knowledge_base", description="知识库目录")
+    KB_WATCH_ENABLED: bool = Field(default=True, description="监听知识库变更并自动增量同步")
+    KB_WATCH_FORCE_POLLING: bool = Field(default=False, description="强制使用轮询监听(网络/容器挂载目录无原生事件时使用)")
+    KB_WATCH_POLL_INTERVAL_SECONDS: float = Field(default=2.0, description="轮询间隔(秒)")
+    KB_WATCH_DEBOUNCE_SECONDS: float = Field(default=1.0, description="最后一次变更后等待的静默时间(秒)")
+    KB_WATCH_MAX_DELAY_SECONDS: float = Field(default=10.0, description="变更持续发生时的最长等待时间(秒)")
+    KB_WATCH_RETRY_SECONDS: float = Field(default=5.0, description="同步失败后首次重试的等待时间(秒，之后每次翻倍)")
+    KB_WATCH_RETRY_MAX_SECONDS: float = Field(default=300.0, description="同步失败重试的最长等待时间(秒)")
     
     # 检索配置
     TOP_K_RESULTS: int = Field(default=5, description="检索返回数量")
     SIMILARITY_THRESHOLD: float = Field(default=0.7, description="相似度阈值")
+    HYBRID_SEARCH_ENABLED: bool = Field(default=True, description="融合BM25词法检索与向量检索(RRF)")
+    HYBRID_RRF_K: int = Field(default=60, description="倒数排名融合常数k")
+    LEXICAL_MIN_COVERAGE: float = Field(default=0.5, description="词法结果至少命中的查询词项比例(按IDF加权)")
+    LEXICAL_FAST_PATH_ENABLED: bool = Field(default=True, description="关键词查询只走词法检索，不调用嵌入API")
+    LEXICAL_FAST_PATH_MAX_TERMS: int = Field(default=3, description="词项数不超过该值且全部命中时视为关键词查询")
+    QUERY_ROUTER_ENABLED: bool = Field(default=True, description="按问题路由到相关的内容类型/标签分区检索")
+    QUERY_ROUTER_MIN_RESULTS: int = Field(default=2, description="分区检索结果少于该值时补充全量检索结果")
+    QUERY_ROUTER_TAG_BOOST: float = Field(default=0.1, description="带有问题相关标签的结果排序分数加权比例(标签不作为过滤条件)")
+    HIERARCHICAL_SEARCH_ENABLED: bool = Field(default=True, description="两阶段检索: 先按文件质心选出相关文件，再只检索其分块")
+    HIERARCHICAL_MIN_DOCUMENTS: int = Field(default=50, description="文件数达到该值才启用两阶段检索")
+    HIERARCHICAL_TOP_DOCUMENTS: int = Field(default=8, description="两阶段检索第一阶段选出的文件数")
+    MMR_ENABLED: bool = Field(default=True, description="按最大边际相关性(MMR)去除内容重复的检索结果")
+    MMR_LAMBDA: float = Field(default=0.7, description="MMR相关性权重(1表示只看相关性，越小越偏向多样性)")
+    MMR_CANDIDATE_FACTOR: int = Field(default=3, description="截断/去冗余前召回的候选数(相对于top-k的倍数)")
+    ADAPTIVE_CUTOFF_ENABLED: bool = Field(default=True, description="在候选分数的最大断崖处截断结果")
+    ADAPTIVE_CUTOFF_MIN_GAP: float = Field(default=0.15, description="触发截断的最小分数差(相对于最高分)")
+    ADAPTIVE_CUTOFF_MIN_RESULTS: int = Field(default=2, description="截断后至少保留的结果数")
     
     # 日志配置
     LOG_LEVEL: str = Field(default="INFO", description="日志级别")
@@ -61,20 +149,78 @@ class Settings(BaseSettings):
 # 创建全局设置实例
 settings = Settings()
 
+# tiktoken从该目录读取BPE编码文件(默认的系统临时目录可能被清空，导致离线启动时重新下载失败)
+if settings.TIKTOKEN_CACHE_DIR:
+    os.environ["TIKTOKEN_CACHE_DIR"] = settings.TIKTOKEN_CACHE_DIR
+
 # 验证配置
 def validate_config():
     """验证关键配置"""
     if not settings.OPENAI_API_KEY or settings.OPENAI_API_KEY == "your_openai_api_key_here":
         raise ValueError("请设置有效的OPENAI_API_KEY")
     
+    if settings.OPENAI_EMBEDDING_DIMENSIONS is not None and settings.OPENAI_EMBEDDING_DIMENSIONS <= 0:
+        raise ValueError("OPENAI_EMBEDDING_DIMENSIONS必须大于0")
+    
+    if settings.EMBEDDING_PROVIDER.lower() not in ("openai", "hashing", "onnx"):
+        raise ValueError("EMBEDDING_PROVIDER必须是openai、hashing或onnx")
+    
     if settings.CHUNK_SIZE <= 0:
         raise ValueError("CHUNK_SIZE必须大于0")
     
+    if not (0 <= settings.CHUNK_OVERLAP < settings.CHUNK_SIZE):
+        raise ValueError("CHUNK_OVERLAP必须在0到CHUNK_SIZE之间")
+    
+    if not (1 <= settings.MARKDOWN_SECTION_LEVEL <= 6):
+        raise ValueError("MARKDOWN_SECTION_LEVEL必须在1-6之间")
+    
+    if settings.VECTOR_BACKEND.lower() not in ("numpy", "chroma"):
+        raise ValueError("VECTOR_BACKEND必须是numpy或chroma")
+    
+    if settings.NUMPY_INDEX_MODE not in ("exact", "ivf"):
+        raise ValueError("NUMPY_INDEX_MODE必须是exact或ivf")
+    
+    if settings.NUMPY_QUANTIZATION not in ("none", "int8"):
+        raise ValueError("NUMPY_QUANTIZATION必须是none或int8")
+    
+    if settings.NUMPY_RERANK_FACTOR < 1:
+        raise ValueError("NUMPY_RERANK_FACTOR必须大于0")
+    
+    if settings.EMBEDDING_MIGRATION_TOKENS_PER_MINUTE < 0:
+        raise ValueError("EMBEDDING_MIGRATION_TOKENS_PER_MINUTE不能为负数")
+    
+    if settings.EMBEDDING_MIGRATION_BATCH_SIZE < 1:
+        raise ValueError("EMBEDDING_MIGRATION_BATCH_SIZE必须大于0")
+    
+    if settings.VECTOR_READ_WORKERS < 1 or settings.VECTOR_WRITE_WORKERS < 1:
+        raise ValueError("VECTOR_READ_WORKERS和VECTOR_WRITE_WORKERS必须大于0")
+    
     if settings.TOP_K_RESULTS <= 0:
         raise ValueError("TOP_K_RESULTS必须大于0")
     
     if not (0 <= settings.SIMILARITY_THRESHOLD <= 1):
         raise ValueError("SIMILARITY_THRESHOLD必须在0-1之间")
+    
+    if not (0 <= settings.LEXICAL_MIN_COVERAGE <= 1):
+        raise ValueError("LEXICAL_MIN_COVERAGE必须在0-1之间")
+    
+    if settings.HIERARCHICAL_TOP_DOCUMENTS < 1:
+        raise ValueError("HIERARCHICAL_TOP_DOCUMENTS必须大于0")
+    
+    if not (0 <= settings.MMR_LAMBDA <= 1):
+        raise ValueError("MMR_LAMBDA必须在0-1之间")
+    
+    if settings.MMR_CANDIDATE_FACTOR < 1:
+        raise ValueError("MMR_CANDIDATE_FACTOR必须大于0")
+    
+    if not (0 <= settings.ADAPTIVE_CUTOFF_MIN_GAP <= 1):
+        raise ValueError("ADAPTIVE_CUTOFF_MIN_GAP必须在0-1之间")
+    
+    if settings.ADAPTIVE_CUTOFF_MIN_RESULTS < 1:
+        raise ValueError("ADAPTIVE_CUTOFF_MIN_RESULTS必须大于0")
+    
+    if not (0 < settings.ANSWER_CACHE_SIMILARITY_THRESHOLD <= 1):
+        raise ValueError("ANSWER_CACHE_SIMILARITY_THRESHOLD必须在0-1之间")
 
 # 导出配置验证函数
 __all__ = ["settings", "validate_config"]
\ No newline at end of file
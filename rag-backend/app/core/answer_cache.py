@@ -0,0 +1,192 @@
+"""
+语义回答缓存
+很多提问只是同一批问题的不同说法：以查询向量为键缓存完整回答，
+新问题与已缓存问题的余弦相似度超过阈值且语言一致时直接复用回答，省去检索和一次chat_completion；
+知识库索引版本变化时整体失效
+"""
+
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+import time
+
+import numpy as np
+
+from app.config import settings
+
+
+@dataclass
+class AnswerEntry:
+    """缓存的回答"""
+    query: str
+    language: str
+    response: Dict[str, Any]
+    created_at: float
+    last_access: float
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """基于查询向量相似度的回答缓存(容量有限，按最近访问淘汰)"""
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.threshold = threshold
+        self.index_version: Optional[str] = None
+
+        # 向量按槽位存放在预分配矩阵中，查找只需一次矩阵-向量乘积
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: Dict[int, AnswerEntry] = {}
+        self._free: List[int] = list(range(self.maxsize - 1, -1, -1))
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._stale_discards = 0
+
+    def _check_version(self, index_version: str):
+        """索引版本变化时清空缓存(知识库内容已更新，旧回答可能过时)"""
+        if self.index_version == index_version:
+            return
+        if self._entries:
+            self._invalidations += 1
+            logger.info(f"知识库索引已更新，清空回答缓存 ({len(self._entries)} 条)")
+        self.clear()
+        self.index_version = index_version
+
+    def _remove(self, slot: int):
+        """移除槽位上的条目"""
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def _expire(self, now: float):
+        """移除过期条目"""
+        for slot in [slot for slot, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+            self._remove(slot)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """归一化查询向量"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(
+        self,
+        embedding: List[float],
+        language: str,
+        index_version: str
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        查找相似问题的回答
+
+        Returns:
+            (缓存的回答, 相似度)，未命中时返回None
+        """
+        self._check_version(index_version)
+        now = time.time()
+        self._expire(now)
+
+        slots = [slot for slot, entry in self._entries.items() if entry.language == language]
+        vector = self._normalize(embedding)
+        if not slots or self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            self._misses += 1
+            return None
+
+        scores = self._vectors[slots] @ vector
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.threshold:
+            self._misses += 1
+            return None
+
+        entry = self._entries[slots[best]]
+        entry.hits += 1
+        entry.last_access = now
+        self._hits += 1
+        return entry.response, similarity
+
+    def store(
+        self,
+        query: str,
+        embedding: List[float],
+        language: str,
+        index_version: str,
+        response: Dict[str, Any]
+    ):
+        """
+        缓存回答
+
+        index_version为生成回答前读取的索引版本；与缓存当前版本不一致时说明生成期间知识库已更新，
+        回答可能基于旧内容，直接丢弃(缓存版本只由lookup推进，这里不会把它改回旧版本)
+        """
+        if index_version != self.index_version:
+            self._stale_discards += 1
+            logger.debug(f"索引版本已变化，丢弃生成期间的回答: {query}")
+            return
+        vector = self._normalize(embedding)
+
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self.clear()
+            self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+
+        if not self._free:
+            # 淘汰最久未访问的条目
+            lru_slot = min(self._entries, key=lambda slot: self._entries[slot].last_access)
+            self._remove(lru_slot)
+            self._evictions += 1
+
+        slot = self._free.pop()
+        now = time.time()
+        self._vectors[slot] = vector
+        self._entries[slot] = AnswerEntry(
+            query=query,
+            language=language,
+            response=response,
+            created_at=now,
+            last_access=now
+        )
+
+    def clear(self):
+        """清空缓存"""
+        self._entries = {}
+        self._free = list(range(self.maxsize - 1, -1, -1))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计(含各条目命中次数)"""
+        lookups = self._hits + self._misses
+        top_entries = sorted(self._entries.values(), key=lambda entry: entry.hits, reverse=True)[:10]
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "similarity_threshold": self.threshold,
+            "index_version": self.index_version,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "stale_discards": self._stale_discards,
+            "top_entries": [
+                {"query": entry.query, "language": entry.language, "hits": entry.hits}
+                for entry in top_entries
+            ]
+        }
+
+
+# 全局回答缓存实例
+answer_cache_instance = None
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """获取回答缓存实例(未启用时返回None)"""
+    global answer_cache_instance
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    if answer_cache_instance is None:
+        answer_cache_instance = SemanticAnswerCache(
+            maxsize=settings.ANSWER_CACHE_SIZE,
+            ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+            threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        )
+    return answer_cache_instance
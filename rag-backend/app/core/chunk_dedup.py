@@ -0,0 +1,307 @@
+"""
+分块近似去重
+用SimHash指纹 + LSH分段桶在摄取时找出近似重复的分块(如多个文件中重复的项目简介)，
+重复内容只保留一个规范分块，并在其sources中记录所有来源文件
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+import hashlib
+import re
+
+from app.config import settings
+from app.core.index_manifest import IndexManifest, ChunkRecord
+
+# 指纹位数
+FINGERPRINT_BITS = 64
+# 字符shingle长度(中文无空格分词，按字符切片同时适用于中英文)
+SHINGLE_SIZE = 3
+# 分块开头的Markdown标题面包屑(不参与指纹，否则同一章节下的不同分块会被误判为重复)
+LEADING_HEADINGS_PATTERN = re.compile(r'\A(?:#{1,6}[ \t][^\n]*(?:\n|\Z))+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# 随来源文件变化的分块元数据(规范分块统一取主来源的值，标签合并所有来源)
+PROVENANCE_FIELDS = ("content_type", "section_path", "chunk_index", "total_chunks", "tags")
+
+
+def simhash(text: str) -> int:
+    """计算文本的64位SimHash指纹"""
+    body = LEADING_HEADINGS_PATTERN.sub('', text)
+    normalized = WHITESPACE_PATTERN.sub(' ', body.casefold()).strip()
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = Counter([normalized])
+    else:
+        shingles = Counter(
+            normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)
+        )
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle, weight in shingles.items():
+        value = int.from_bytes(
+            hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'
+        )
+        for bit in range(FINGERPRINT_BITS):
+            if value >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class DedupPlan:
+    """单个文件的去重结果"""
+    # 文件引用的规范分块ID(按分块顺序，已去重)
+    refs: List[str] = field(default_factory=list)
+    # 需要向量化写入的分块下标
+    new_idx: List[int] = field(default_factory=list)
+    # 已存在且归属本文件的分块下标(只更新元数据)
+    kept_idx: List[int] = field(default_factory=list)
+    # 本文件新加入来源的其他规范分块(需要更新sources元数据)
+    merged_ids: List[str] = field(default_factory=list)
+    # 撤销信息: 新建的规范分块、加入了本文件来源的规范分块、释放前的分块记录、
+    # 被覆盖的本文件来源元数据
+    created: List[str] = field(default_factory=list)
+    added_sources: List[str] = field(default_factory=list)
+    released: Dict[str, ChunkRecord] = field(default_factory=dict)
+    replaced: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+class ChunkDeduplicator:
+    """基于索引清单的近似重复检测和引用计数"""
+
+    def __init__(self, manifest: IndexManifest):
+        self.manifest = manifest
+        self.enabled = settings.NEAR_DUP_ENABLED
+        self.max_distance = max(0, settings.NEAR_DUP_MAX_DISTANCE)
+
+        # 汉明距离 ≤ d 时，把指纹分成 d+1 段，至少有一段完全相同(鸽巢原理)
+        bands = min(self.max_distance + 1, FINGERPRINT_BITS)
+        width = FINGERPRINT_BITS // bands
+        self._bands: List[Tuple[int, int]] = [
+            (i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+            for i in range(bands)
+        ]
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self._fingerprints: Dict[str, int] = {}
+
+        for chunk_id, record in manifest.chunks.items():
+            self._index(chunk_id, int(record.fingerprint, 16))
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        """指纹在各LSH分段上的桶键"""
+        return [
+            (i, (fingerprint >> start) & ((1 << (end - start)) - 1))
+            for i, (start, end) in enumerate(self._bands)
+        ]
+
+    def _index(self, chunk_id: str, fingerprint: int):
+        """把规范分块加入LSH桶"""
+        self._fingerprints[chunk_id] = fingerprint
+        for key in self._band_keys(fingerprint):
+            self._buckets.setdefault(key, set()).add(chunk_id)
+
+    def _unindex(self, chunk_id: str):
+        """从LSH桶中移除规范分块"""
+        fingerprint = self._fingerprints.pop(chunk_id, None)
+        if fingerprint is None:
+            return
+        for key in self._band_keys(fingerprint):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _find(self, fingerprint: int, file_path: str, referenced: Set[str]) -> Optional[str]:
+        """
+        查找汉明距离最小的近似重复规范分块
+
+        只由本文件引用、且本次未再引用的旧分块即将被删除，不能作为合并目标
+        """
+        best_id = None
+        best_distance = self.max_distance + 1
+        candidates = set()
+        for key in self._band_keys(fingerprint):
+            candidates |= self._buckets.get(key, set())
+
+        for chunk_id in candidates:
+            distance = hamming_distance(fingerprint, self._fingerprints[chunk_id])
+            if distance >= best_distance:
+                continue
+            sources = self.manifest.chunks[chunk_id].sources
+            if chunk_id not in referenced and all(source == file_path for source in sources):
+                continue
+            best_id, best_distance = chunk_id, distance
+        return best_id
+
+    def assign(
+        self,
+        file_path: str,
+        documents: List[str],
+        ids: List[str],
+        previous_ids: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ) -> DedupPlan:
+        """
+        为文件的分块分配规范分块
+
+        与已有规范分块近似重复的分块不再单独写入，只把本文件加入其来源，
+        并记录本文件中该分块的来源元数据(metadatas)
+        """
+        plan = DedupPlan()
+        referenced: Set[str] = set()
+        previous = set(previous_ids)
+
+        for i, (document, chunk_id) in enumerate(zip(documents, ids)):
+            record = self.manifest.chunks.get(chunk_id)
+            if record is not None and chunk_id in previous:
+                # 内容未变的本文件分块
+                canonical = chunk_id
+                plan.kept_idx.append(i)
+            else:
+                fingerprint = simhash(document)
+                canonical = (
+                    self._find(fingerprint, file_path, referenced)
+                    if self.enabled else None
+                )
+                if canonical is None or canonical == chunk_id:
+                    canonical = chunk_id
+                    plan.new_idx.append(i)
+                    if record is None:
+                        record = ChunkRecord(fingerprint=f"{fingerprint:016x}")
+                        self.manifest.chunks[chunk_id] = record
+                        self._index(chunk_id, fingerprint)
+                        plan.created.append(chunk_id)
+
+            if canonical in referenced:
+                continue
+            referenced.add(canonical)
+            plan.refs.append(canonical)
+
+            record = self.manifest.chunks[canonical]
+            if file_path not in record.sources:
+                record.sources.append(file_path)
+                plan.added_sources.append(canonical)
+                if canonical != chunk_id:
+                    plan.merged_ids.append(canonical)
+            elif file_path in record.provenance:
+                plan.replaced[canonical] = record.provenance[file_path]
+            if metadatas is not None:
+                record.provenance[file_path] = {
+                    key: metadatas[i][key] for key in PROVENANCE_FIELDS if key in metadatas[i]
+                }
+
+        return plan
+
+    def release(
+        self,
+        file_path: str,
+        chunk_ids: List[str],
+        plan: Optional[DedupPlan] = None
+    ) -> Tuple[List[str], List[str]]:
+        """
+        释放文件对分块的引用
+
+        Args:
+            plan: 传入时记录释放前的分块记录，用于撤销
+
+        Returns:
+            (已无来源、需要删除的分块ID, 仍有其他来源、需要更新sources的分块ID)
+        """
+        deleted = []
+        updated = []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            record = self.manifest.chunks.get(chunk_id)
+            if record is None:
+                # 旧版清单中没有分块记录，按独占处理
+                deleted.append(chunk_id)
+                continue
+            if plan is not None:
+                plan.released[chunk_id] = ChunkRecord(
+                    record.fingerprint, list(record.sources), dict(record.provenance)
+                )
+            if file_path in record.sources:
+                record.sources.remove(file_path)
+            record.provenance.pop(file_path, None)
+            if record.sources:
+                updated.append(chunk_id)
+            else:
+                del self.manifest.chunks[chunk_id]
+                self._unindex(chunk_id)
+                deleted.append(chunk_id)
+        return deleted, updated
+
+    def rollback(self, file_path: str, plan: DedupPlan) -> Dict[str, List[str]]:
+        """
+        撤销文件的assign/release对清单的修改(文件未能写入向量库时)
+
+        新建的规范分块从未写入，直接删除；其他文件若已合并到这些分块，需要由调用方让它们重新处理
+
+        Returns:
+            被删除的规范分块ID → 仍引用它的其他来源文件
+        """
+        for chunk_id, record in plan.released.items():
+            current = self.manifest.chunks.get(chunk_id)
+            if current is None:
+                self.manifest.chunks[chunk_id] = record
+                self._index(chunk_id, int(record.fingerprint, 16))
+            elif file_path not in current.sources:
+                current.sources.append(file_path)
+                if file_path in record.provenance:
+                    current.provenance[file_path] = record.provenance[file_path]
+
+        for chunk_id in plan.added_sources:
+            record = self.manifest.chunks.get(chunk_id)
+            if record is not None and file_path in record.sources:
+                record.sources.remove(file_path)
+                record.provenance.pop(file_path, None)
+
+        for chunk_id, provenance in plan.replaced.items():
+            record = self.manifest.chunks.get(chunk_id)
+            if record is not None and file_path in record.sources:
+                record.provenance[file_path] = provenance
+
+        orphaned: Dict[str, List[str]] = {}
+        for chunk_id in plan.created:
+            record = self.manifest.chunks.pop(chunk_id, None)
+            if record is None:
+                continue
+            self._unindex(chunk_id)
+            if record.sources:
+                orphaned[chunk_id] = list(record.sources)
+        return orphaned
+
+    def source_metadata(self, chunk_id: str) -> Dict[str, Any]:
+        """
+        规范分块的来源元数据
+
+        第一个来源作为主文件，文件路径、内容类型、章节路径和位置都取自主文件，
+        标签合并所有来源(旧版清单没有来源元数据时只更新来源和路径)
+        """
+        record = self.manifest.chunks[chunk_id]
+        primary = record.sources[0]
+        metadata = {
+            **record.provenance.get(primary, {}),
+            "sources": list(record.sources),
+            "file_path": primary,
+            "filename": Path(primary).name
+        }
+        tags = {
+            tag for provenance in record.provenance.values()
+            for tag in provenance.get("tags", [])
+        }
+        if tags:
+            metadata["tags"] = sorted(tags)
+        return metadata
@@ -0,0 +1,316 @@
+"""
+文档分块器
+清理、分块、打标签和生成分块记录等纯CPU工作；只依赖tiktoken编码和标签器，
+可以在进程池子进程中单独构建，无需创建OpenAI客户端或嵌入提供方
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import bisect
+import hashlib
+import re
+from datetime import datetime
+import tiktoken
+
+from app.config import settings
+from app.core.keyword_tagger import get_keyword_tagger
+from app.models import DocumentMetadata
+
+# 分块使用的编码模型(与OpenAIClient.encoding相同)
+TOKEN_ENCODING_MODEL = "gpt-4.1-mini"
+
+# 段落边界(空行)
+PARAGRAPH_BREAK_PATTERN = re.compile(r'\n\s*\n')
+# 句子边界(中英文句末标点、换行)
+SENTENCE_BREAK_PATTERN = re.compile(r'[.!?;](?=\s)|[。！？；]|\n')
+
+# Markdown标题行
+HEADING_PATTERN = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$', re.MULTILINE)
+# Markdown代码块(其中的#不是标题)
+CODE_FENCE_PATTERN = re.compile(r'^(`{3,}|~{3,}).*?^\1[ \t]*$', re.MULTILINE | re.DOTALL)
+# 章节路径分隔符
+SECTION_SEPARATOR = " > "
+
+
+class DocumentChunker:
+    """文档清理、分块和打标签"""
+
+    def __init__(self, encoding: Optional[tiktoken.Encoding] = None):
+        self.encoding = encoding or tiktoken.encoding_for_model(TOKEN_ENCODING_MODEL)
+
+    def prepare_document(
+        self,
+        doc_path: Path,
+        raw: bytes
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        """清理、分块并生成分块记录"""
+        content = self.clean_content(raw.decode('utf-8'))
+        chunks = self.chunk_document(content, doc_path) if content.strip() else []
+        return self.build_chunk_records(doc_path, chunks)
+
+    def build_chunk_records(
+        self,
+        doc_path: Path,
+        chunks: List[Tuple[str, str]]
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        """构建分块的文档、元数据和ID列表(chunks为 (章节路径, 分块文本) 列表)"""
+        documents = []
+        metadatas = []
+        ids = []
+
+        content_type = self.get_content_type(doc_path)
+        seen_ids: Dict[str, int] = {}
+
+        for i, (section_path, chunk) in enumerate(chunks):
+            # 生成唯一ID(同一文档内内容重复的分块追加序号)
+            chunk_id = self._generate_chunk_id(doc_path, chunk)
+            occurrence = seen_ids.get(chunk_id, 0)
+            seen_ids[chunk_id] = occurrence + 1
+            if occurrence:
+                chunk_id = f"{chunk_id}_{occurrence}"
+
+            # 创建元数据
+            metadata = DocumentMetadata(
+                filename=doc_path.name,
+                file_path=str(doc_path),
+                chunk_index=i,
+                total_chunks=len(chunks),
+                content_type=content_type,
+                section_path=section_path,
+                last_updated=datetime.now(),
+                tags=self.extract_tags(doc_path, chunk)
+            )
+
+            documents.append(chunk)
+            metadatas.append(metadata.model_dump(mode="json"))
+            ids.append(chunk_id)
+
+        return documents, metadatas, ids
+
+    def clean_content(self, content: str) -> str:
+        """清理文档内容"""
+        # 移除多余的空白行
+        content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
+
+        # 移除行尾空格
+        content = re.sub(r' +\n', '\n', content)
+
+        # 统一换行符
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+
+        return content.strip()
+
+    def chunk_document(self, content: str, doc_path: Path) -> List[Tuple[str, str]]:
+        """
+        文档分块
+
+        Markdown文档按标题层级切分为章节，每个章节单独成块并以上级标题作为前缀，
+        使分块脱离原文也能看懂；超过CHUNK_SIZE的章节再按token切分，
+        前缀计入CHUNK_SIZE，过长时从最外层标题开始省略。
+        其他文档直接按token切分
+
+        Returns:
+            (章节路径, 分块文本) 列表
+        """
+        if doc_path.suffix.lower() != ".md":
+            return [("", chunk) for chunk in self._chunk_text(content, settings.CHUNK_SIZE)]
+
+        chunks = []
+        for headings, body in self._split_sections(content):
+            breadcrumb, breadcrumb_tokens = self._fit_breadcrumb(headings)
+            section_path = SECTION_SEPARATOR.join(title for _, title in headings)
+
+            budget = settings.CHUNK_SIZE
+            if breadcrumb:
+                budget -= breadcrumb_tokens + 1
+
+            for piece in self._chunk_text(body, budget):
+                chunk = f"{breadcrumb}\n{piece}" if breadcrumb else piece
+                chunks.append((section_path, chunk))
+
+        return chunks
+
+    def _fit_breadcrumb(self, headings: List[Tuple[int, str]]) -> Tuple[str, int]:
+        """
+        生成标题面包屑，例如 "# 项目经验\n## 电商平台项目"
+
+        面包屑最多占CHUNK_SIZE的1/4，超出时从最外层标题开始省略，仍超出则不加前缀
+        (完整路径保留在section_path元数据中)
+
+        Returns:
+            (面包屑, token数)
+        """
+        limit = settings.CHUNK_SIZE // 4
+        for start in range(len(headings)):
+            breadcrumb = "\n".join(f"{'#' * level} {title}" for level, title in headings[start:])
+            tokens = len(self.encoding.encode(breadcrumb))
+            if tokens <= limit:
+                return breadcrumb, tokens
+        return "", 0
+
+    def _split_sections(self, content: str) -> List[Tuple[List[Tuple[int, str]], str]]:
+        """
+        按Markdown标题切分章节
+
+        只有不深于MARKDOWN_SECTION_LEVEL的标题才开启新章节，更深的标题留在章节正文中；
+        没有正文的标题(紧跟子标题)不单独成块，只出现在子章节的面包屑里
+
+        Returns:
+            (标题栈[(层级, 标题)], 章节正文) 列表
+        """
+        fences = [match.span() for match in CODE_FENCE_PATTERN.finditer(content)]
+
+        def in_fence(pos: int) -> bool:
+            return any(start <= pos < end for start, end in fences)
+
+        headings = [
+            match for match in HEADING_PATTERN.finditer(content)
+            if len(match.group(1)) <= settings.MARKDOWN_SECTION_LEVEL and not in_fence(match.start())
+        ]
+
+        sections = []
+        preamble = content[:headings[0].start()] if headings else content
+        if preamble.strip():
+            sections.append(([], preamble.strip()))
+
+        stack: List[Tuple[int, str]] = []
+        for i, match in enumerate(headings):
+            level = len(match.group(1))
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, match.group(2).strip()))
+
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+            body = content[match.end():end].strip()
+            if body:
+                sections.append((list(stack), body))
+
+        return sections
+
+    def _chunk_text(self, content: str, chunk_size: int) -> List[str]:
+        """
+        按token切分文本
+
+        整段文本只编码一次，按token精确控制分块大小(与OpenAIClient使用相同的编码)：
+        在chunk_size范围内优先选择段落边界，其次句子边界切分，
+        相邻分块之间保留约CHUNK_OVERLAP个token的重叠
+        """
+        encoding = self.encoding
+        tokens = encoding.encode(content)
+        if not tokens:
+            return []
+
+        if len(tokens) <= chunk_size:
+            return [content.strip()]
+
+        overlap = min(max(settings.CHUNK_OVERLAP, 0), chunk_size // 2)
+
+        # 每个token在原文中的起始字符位置
+        _, offsets = encoding.decode_with_offsets(tokens)
+        total = len(tokens)
+
+        def char_pos(token_index: int) -> int:
+            return offsets[token_index] if token_index < total else len(content)
+
+        paragraph_breaks = self._break_token_indices(content, offsets, PARAGRAPH_BREAK_PATTERN)
+        sentence_breaks = self._break_token_indices(content, offsets, SENTENCE_BREAK_PATTERN)
+
+        chunks = []
+        start = 0
+        while start < total:
+            end = min(start + chunk_size, total)
+            cut = end
+            if end < total:
+                # 只在分块后半段寻找边界，避免产生过小的分块
+                lower = start + chunk_size // 2
+                cut = (
+                    self._last_break(paragraph_breaks, lower, end)
+                    or self._last_break(sentence_breaks, lower, end)
+                    or end
+                )
+
+            chunk = content[char_pos(start):char_pos(cut)].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            if cut >= total:
+                break
+
+            # 重叠部分尽量从句子开头开始
+            next_start = cut - overlap
+            if overlap:
+                next_start = self._first_break(sentence_breaks, next_start, cut) or next_start
+            start = max(next_start, start + 1)
+
+        return chunks
+
+    @staticmethod
+    def _break_token_indices(content: str, offsets: List[int], pattern: re.Pattern) -> List[int]:
+        """把文本中的边界位置映射为token下标(边界后第一个token)"""
+        indices = []
+        for match in pattern.finditer(content):
+            index = bisect.bisect_left(offsets, match.end())
+            if 0 < index < len(offsets) and (not indices or indices[-1] != index):
+                indices.append(index)
+        return indices
+
+    @staticmethod
+    def _last_break(breaks: List[int], lower: int, upper: int) -> Optional[int]:
+        """(lower, upper] 范围内最靠后的边界"""
+        i = bisect.bisect_right(breaks, upper) - 1
+        if i >= 0 and breaks[i] > lower:
+            return breaks[i]
+        return None
+
+    @staticmethod
+    def _first_break(breaks: List[int], lower: int, upper: int) -> Optional[int]:
+        """[lower, upper) 范围内最靠前的边界"""
+        i = bisect.bisect_left(breaks, lower)
+        if i < len(breaks) and breaks[i] < upper:
+            return breaks[i]
+        return None
+
+    def _generate_chunk_id(self, doc_path: Path, chunk: str) -> str:
+        """生成分块的唯一ID"""
+        # 使用文件路径和内容哈希生成ID(不含分块索引，插入段落不会使后续分块ID全部失效)
+        content_hash = hashlib.md5(f"{doc_path}\n{chunk}".encode('utf-8')).hexdigest()[:12]
+        return f"{doc_path.stem}_{content_hash}"
+
+    def get_content_type(self, doc_path: Path) -> str:
+        """获取内容类型"""
+        filename = doc_path.name.lower()
+
+        if "skill" in filename or "技能" in filename:
+            return "skills"
+        elif "project" in filename or "项目" in filename:
+            return "projects"
+        elif "experience" in filename or "经历" in filename:
+            return "experience"
+        elif "education" in filename or "教育" in filename:
+            return "education"
+        elif "about" in filename or "关于" in filename:
+            return "about"
+        elif "contact" in filename or "联系" in filename:
+            return "contact"
+        else:
+            return "general"
+
+    def extract_tags(self, doc_path: Path, chunk: str) -> List[str]:
+        """从文档路径和内容中提取标签"""
+        tagger = get_keyword_tagger()
+        tags = tagger.tag_filename(doc_path.name) | tagger.tag_content(chunk)
+        return sorted(tags)
+
+
+# 进程池子进程内复用的分块器(只加载编码和标签关键词)
+_worker_chunker: Optional[DocumentChunker] = None
+
+def prepare_document_in_worker(
+    doc_path: str,
+    raw: bytes
+) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """进程池入口：对单个文件执行清理、分块和打标签"""
+    global _worker_chunker
+    if _worker_chunker is None:
+        _worker_chunker = DocumentChunker()
+    return _worker_chunker.prepare_document(Path(doc_path), raw)
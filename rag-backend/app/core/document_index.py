@@ -0,0 +1,90 @@
+"""
+文档级向量索引
+每个源文件一个质心向量(分块向量的归一化均值)，由摄取流水线在写入文件的分块后生成；
+检索时先按质心选出最相关的文件，再只在这些文件的分块中排序，单次查询的代价随命中文件数而不是语料规模增长
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+
+def centroid(vectors: np.ndarray) -> Optional[np.ndarray]:
+    """分块向量的归一化均值(没有向量时返回None)"""
+    if len(vectors) == 0:
+        return None
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    mean = vectors.mean(axis=0)
+    return mean / max(float(np.linalg.norm(mean)), 1e-12)
+
+
+class DocumentIndex:
+    """文件 → 质心向量与分块ID(内存中，启动时按索引清单重建)"""
+
+    def __init__(self):
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._chunk_ids: Dict[str, List[str]] = {}
+        # 质心矩阵在有变化后的第一次检索时重新堆叠
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def set(self, document: str, vector: Optional[np.ndarray], chunk_ids: List[str]):
+        """写入文件的质心和分块(没有可用向量时移除该文件)"""
+        if vector is None or not chunk_ids:
+            self.remove(document)
+            return
+        self._vectors[document] = vector
+        self._chunk_ids[document] = list(chunk_ids)
+        self._matrix = None
+
+    def build(self, entries: List[Tuple[str, Optional[np.ndarray], List[str]]]):
+        """从 (文件, 质心, 分块ID) 列表全量重建"""
+        self.clear()
+        for document, vector, chunk_ids in entries:
+            self.set(document, vector, chunk_ids)
+
+    def remove(self, document: str):
+        """移除文件"""
+        if self._vectors.pop(document, None) is not None:
+            self._matrix = None
+        self._chunk_ids.pop(document, None)
+
+    def clear(self):
+        """清空索引"""
+        self._vectors = {}
+        self._chunk_ids = {}
+        self._keys = []
+        self._matrix = None
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """按质心相似度返回最相关的k个文件"""
+        if not self._vectors:
+            return []
+        if self._matrix is None:
+            self._keys = list(self._vectors)
+            self._matrix = np.stack([self._vectors[key] for key in self._keys])
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self._matrix @ query
+        k = min(k, len(self._keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[i], float(scores[i])) for i in top]
+
+    def chunk_ids(self, documents: List[str]) -> List[str]:
+        """文件的分块ID(去重，近似重复分块可能被多个文件引用)"""
+        return list(dict.fromkeys(
+            chunk_id for document in documents for chunk_id in self._chunk_ids.get(document, [])
+        ))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        chunks = sum(len(chunk_ids) for chunk_ids in self._chunk_ids.values())
+        return {
+            "documents": len(self._vectors),
+            "avg_chunks_per_document": round(chunks / len(self._vectors), 2) if self._vectors else 0.0
+        }
@@ -5,285 +5,294 @@
 
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-import hashlib
-import re
-from datetime import datetime
 from loguru import logger
 import asyncio
 
 from app.config import settings
 from app.core.vector_store import VectorStore
 from app.core.openai_client import get_openai_client
-from app.models import DocumentMetadata
+from app.core.index_manifest import IndexManifest
+from app.core.ingest_pipeline import IngestPipeline
+from app.core.embedding_migration import EmbeddingMigration
+from app.core.chunk_dedup import ChunkDeduplicator
+from app.core.document_chunker import DocumentChunker
+
+# 索引写入锁(全量重建、增量同步和监听器同步互斥)
+_index_lock = asyncio.Lock()
 
 class DocumentProcessor:
     """文档处理器"""
     
     def __init__(self):
         self.openai_client = get_openai_client()
+        self.chunker = DocumentChunker(self.openai_client.encoding)
         self.supported_extensions = {".md", ".txt"}
         
     async def load_documents(
         self, 
         knowledge_path: Path, 
         vector_store: VectorStore
-    ):
-        """加载知识库文档"""
+    ) -> Dict[str, Any]:
+        """
+        加载知识库文档(全量)
+        
+        Returns:
+            流水线统计信息(含各阶段吞吐量)
+        """
         if not knowledge_path.exists():
             logger.warning(f"知识库路径不存在: {knowledge_path}")
-            return
+            return {}
         
         logger.info(f"开始加载知识库: {knowledge_path}")
         
         # 查找所有支持的文档
-        documents = []
-        for ext in self.supported_extensions:
-            documents.extend(knowledge_path.rglob(f"*{ext}"))
+        documents = self._find_documents(knowledge_path)
         
         if not documents:
             logger.warning("未找到任何支持的文档")
-            return
+            return {}
         
         logger.info(f"找到 {len(documents)} 个文档")
         
-        # 处理每个文档
-        total_chunks = 0
-        for doc_path in documents:
-            try:
-                chunks = await self.process_document(doc_path, vector_store)
-                total_chunks += len(chunks)
-                logger.info(f"已处理文档: {doc_path.name} ({len(chunks)} 个分块)")
-                
-            except Exception as e:
-                logger.error(f"处理文档失败 {doc_path}: {e}")
+        # 全量加载时重建索引清单，供后续增量同步使用
+        manifest = IndexManifest.for_collection(vector_store.collection_name)
+        manifest.clear()
+        
+        # 通过流水线处理所有文档
+        pipeline = IngestPipeline(self, vector_store, manifest)
+        report = await pipeline.run(documents)
         
-        logger.info(f"知识库加载完成: 总共 {total_chunks} 个分块")
+        manifest.save()
+        logger.info(f"知识库加载完成: 总共 {report['chunks_upserted']} 个分块")
+        return report
     
-    async def process_document(
+    async def sync_documents(
         self, 
-        doc_path: Path, 
+        knowledge_path: Path, 
         vector_store: VectorStore
-    ) -> List[Dict[str, Any]]:
-        """处理单个文档"""
-        try:
-            # 读取文档内容
-            content = self._read_document(doc_path)
-            if not content.strip():
-                logger.warning(f"文档内容为空: {doc_path}")
-                return []
+    ) -> Dict[str, Any]:
+        """
+        增量同步知识库
+        
+        根据索引清单跳过未修改的文件，只对新增/修改的分块重新向量化，
+        并删除已移除文件或已缩短文件中多余的分块；
+        集合的嵌入模型/维度与配置不一致时先迁移到新模型(启用迁移时)或改为全量重建
+        
+        Returns:
+            同步统计信息(含各阶段吞吐量)
+        """
+        if not knowledge_path.exists():
+            logger.warning(f"知识库路径不存在: {knowledge_path}")
+            return {}
+        
+        if vector_store.needs_rebuild:
+            if not settings.EMBEDDING_MIGRATION_ENABLED:
+                logger.info("嵌入配置已变化，全量重建索引")
+                return await self.reindex_documents(knowledge_path, vector_store)
+            # 迁移完成后继续增量同步迁移期间的知识库变化
+            await self.migrate_embeddings(vector_store)
+        
+        logger.info(f"开始增量同步知识库: {knowledge_path}")
+        
+        async with _index_lock:
+            manifest = IndexManifest.for_collection(vector_store.collection_name)
+            documents = self._find_documents(knowledge_path)
             
-            # 文档分块
-            chunks = self._chunk_document(content)
+            pipeline = IngestPipeline(self, vector_store, manifest, incremental=True)
+            stats = await pipeline.run(documents)
+            
+            # 清理已删除文件的分块
+            seen_paths = {str(doc_path) for doc_path in documents}
+            removed_paths = [file_path for file_path in manifest.files if file_path not in seen_paths]
+            await self._remove_documents(removed_paths, vector_store, pipeline.deduplicator, stats)
+            
+            manifest.save()
+        
+        logger.info(
+            f"知识库增量同步完成: 新增 {stats['added']}, 更新 {stats['updated']}, "
+            f"删除 {stats['removed']}, 未变 {stats['unchanged']}"
+        )
+        return stats
+    
+    async def sync_paths(
+        self, 
+        paths: List[Path], 
+        vector_store: VectorStore
+    ) -> Dict[str, Any]:
+        """
+        只同步指定路径(供知识库监听器使用)
+        
+        存在的文件走增量流水线；不存在的路径视为删除，
+        若是被删除的目录则移除其下所有已索引文件
+        
+        Returns:
+            同步统计信息
+        """
+        async with _index_lock:
+            manifest = IndexManifest.for_collection(vector_store.collection_name)
             
-            # 准备向量数据库存储的数据
             documents = []
-            metadatas = []
-            ids = []
+            removed_paths = []
+            for path in paths:
+                if path.is_file():
+                    if path.suffix.lower() in self.supported_extensions:
+                        documents.append(path)
+                elif path.is_dir():
+                    documents.extend(self._find_documents(path))
+                else:
+                    removed_paths.extend(
+                        file_path for file_path in manifest.files
+                        if Path(file_path).is_relative_to(path)
+                    )
             
-            for i, chunk in enumerate(chunks):
-                # 生成唯一ID
-                chunk_id = self._generate_chunk_id(doc_path, i, chunk)
-                
-                # 创建元数据
-                metadata = DocumentMetadata(
-                    filename=doc_path.name,
-                    file_path=str(doc_path),
-                    chunk_index=i,
-                    total_chunks=len(chunks),
-                    content_type=self._get_content_type(doc_path),
-                    last_updated=datetime.now(),
-                    tags=self._extract_tags(doc_path, chunk)
+            documents = sorted(set(documents))
+            pipeline = IngestPipeline(self, vector_store, manifest, incremental=True)
+            stats = await pipeline.run(documents)
+            await self._remove_documents(
+                sorted(set(removed_paths)), vector_store, pipeline.deduplicator, stats
+            )
+            
+            manifest.save()
+        
+        logger.info(
+            f"已同步 {len(paths)} 个变更路径: 新增 {stats['added']}, 更新 {stats['updated']}, "
+            f"删除 {stats['removed']}, 未变 {stats['unchanged']}"
+        )
+        return stats
+    
+    async def _remove_documents(
+        self, 
+        file_paths: List[str], 
+        vector_store: VectorStore, 
+        deduplicator: ChunkDeduplicator, 
+        stats: Dict[str, Any]
+    ):
+        """删除已移除文件的分块并更新清单(仍被其他文件引用的分块只移除来源)"""
+        manifest = deduplicator.manifest
+        stats["removed"] = 0
+        for file_path in file_paths:
+            record = manifest.get(file_path)
+            if record is None:
+                continue
+            try:
+                deleted, updated = deduplicator.release(file_path, record.chunk_ids)
+                await vector_store.update_metadatas(
+                    updated, [deduplicator.source_metadata(chunk_id) for chunk_id in updated]
                 )
-                
-                documents.append(chunk)
-                metadatas.append(metadata.dict())
-                ids.append(chunk_id)
+                await vector_store.delete_documents(deleted)
+                manifest.remove(file_path)
+                vector_store.remove_document(file_path)
+                stats["removed"] += 1
+                stats["chunks_deleted"] += len(deleted)
+                logger.info(f"已移除文档: {file_path} ({len(deleted)} 个分块)")
+            except Exception as e:
+                stats["failed_paths"].append(file_path)
+                logger.error(f"移除文档分块失败 {file_path}: {e}")
+    
+    async def process_document(
+        self, 
+        doc_path: Path, 
+        vector_store: VectorStore,
+        manifest: Optional[IndexManifest] = None
+    ) -> List[str]:
+        """
+        处理单个文档
+        
+        与已索引分块近似重复的内容不会重复写入，只在规范分块的sources中登记本文件
+        
+        Returns:
+            文档引用的规范分块ID列表
+        """
+        try:
+            save_manifest = manifest is None
+            if manifest is None:
+                manifest = IndexManifest.for_collection(vector_store.collection_name)
+            
+            pipeline = IngestPipeline(self, vector_store, manifest)
+            await pipeline.run([doc_path])
             
-            # 批量添加到向量数据库
-            if documents:
-                await vector_store.add_documents(documents, metadatas, ids)
+            if save_manifest:
+                manifest.save()
             
-            return chunks
+            record = manifest.get(str(doc_path))
+            if record is None:
+                logger.warning(f"文档内容为空: {doc_path}")
+                return []
+            return record.chunk_ids
             
         except Exception as e:
             logger.error(f"处理文档失败 {doc_path}: {e}")
             raise
     
+    def _find_documents(self, knowledge_path: Path) -> List[Path]:
+        """查找所有支持的文档"""
+        documents = []
+        for ext in self.supported_extensions:
+            documents.extend(knowledge_path.rglob(f"*{ext}"))
+        return sorted(documents)
+    
+    def _read_raw_document(self, doc_path: Path) -> bytes:
+        """读取文档原始字节"""
+        try:
+            return doc_path.read_bytes()
+        except Exception as e:
+            logger.error(f"读取文档失败 {doc_path}: {e}")
+            raise
+    
     def _read_document(self, doc_path: Path) -> str:
         """读取文档内容"""
         try:
-            with open(doc_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_raw_document(doc_path).decode('utf-8')
             
             # 基本清理
-            content = self._clean_content(content)
+            content = self.chunker.clean_content(content)
             return content
             
         except Exception as e:
             logger.error(f"读取文档失败 {doc_path}: {e}")
             raise
     
-    def _clean_content(self, content: str) -> str:
-        """清理文档内容"""
-        # 移除多余的空白行
-        content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
-        
-        # 移除行尾空格
-        content = re.sub(r' +\n', '\n', content)
-        
-        # 统一换行符
-        content = content.replace('\r\n', '\n').replace('\r', '\n')
-        
-        return content.strip()
-    
-    def _chunk_document(self, content: str) -> List[str]:
-        """文档分块"""
-        # 按段落分割
-        paragraphs = content.split('\n\n')
-        
-        chunks = []
-        current_chunk = ""
-        current_size = 0
-        
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
-                continue
-            
-            # 计算段落token数(估算)
-            para_tokens = len(paragraph.split()) * 1.3  # 粗略估算
-            
-            # 如果当前分块加上这个段落会超过限制
-            if current_size + para_tokens > settings.CHUNK_SIZE and current_chunk:
-                chunks.append(current_chunk.strip())
-                current_chunk = paragraph
-                current_size = para_tokens
-            else:
-                # 添加到当前分块
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
-                current_size += para_tokens
+    async def reindex_documents(self, knowledge_path: Path, vector_store: VectorStore) -> Dict[str, Any]:
+        """
+        重新索引文档(零停机)
         
-        # 添加最后一个分块
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        先在影子集合中全量重建，期间当前集合继续提供检索；
+        重建完成后原子切换到新集合并回收旧集合
         
-        # 处理过长的分块
-        final_chunks = []
-        for chunk in chunks:
-            if len(chunk.split()) * 1.3 > settings.CHUNK_SIZE:
-                # 进一步分割长分块
-                sub_chunks = self._split_long_chunk(chunk)
-                final_chunks.extend(sub_chunks)
-            else:
-                final_chunks.append(chunk)
-        
-        return final_chunks
-    
-    def _split_long_chunk(self, chunk: str) -> List[str]:
-        """分割过长的分块"""
-        sentences = re.split(r'[.!?。！？]\s+', chunk)
-        
-        sub_chunks = []
-        current_chunk = ""
-        current_size = 0
+        Returns:
+            流水线统计信息
+        """
+        logger.info("开始重新索引文档...")
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
+        # 与增量同步互斥，避免监听器在切换前写入即将被替换的集合
+        async with _index_lock:
+            shadow = await vector_store.create_shadow()
             
-            sentence_tokens = len(sentence.split()) * 1.3
+            try:
+                stats = await self.load_documents(knowledge_path, shadow)
+            except Exception as e:
+                logger.error(f"重建影子集合失败，保留当前集合: {e}")
+                await vector_store.drop_collection(shadow.collection_name)
+                raise
             
-            if current_size + sentence_tokens > settings.CHUNK_SIZE and current_chunk:
-                sub_chunks.append(current_chunk.strip())
-                current_chunk = sentence
-                current_size = sentence_tokens
-            else:
-                if current_chunk:
-                    current_chunk += ". " + sentence
-                else:
-                    current_chunk = sentence
-                current_size += sentence_tokens
-        
-        if current_chunk.strip():
-            sub_chunks.append(current_chunk.strip())
-        
-        return sub_chunks
-    
-    def _generate_chunk_id(self, doc_path: Path, chunk_index: int, chunk: str) -> str:
-        """生成分块的唯一ID"""
-        # 使用文件路径、索引和内容哈希生成ID
-        content_hash = hashlib.md5(chunk.encode('utf-8')).hexdigest()[:8]
-        return f"{doc_path.stem}_{chunk_index}_{content_hash}"
-    
-    def _get_content_type(self, doc_path: Path) -> str:
-        """获取内容类型"""
-        filename = doc_path.name.lower()
+            await vector_store.swap_collection(shadow)
         
-        if "skill" in filename or "技能" in filename:
-            return "skills"
-        elif "project" in filename or "项目" in filename:
-            return "projects"
-        elif "experience" in filename or "经历" in filename:
-            return "experience"
-        elif "education" in filename or "教育" in filename:
-            return "education"
-        elif "about" in filename or "关于" in filename:
-            return "about"
-        elif "contact" in filename or "联系" in filename:
-            return "contact"
-        else:
-            return "general"
+        logger.info("文档重新索引完成")
+        return stats
     
-    def _extract_tags(self, doc_path: Path, chunk: str) -> List[str]:
-        """从文档路径和内容中提取标签"""
-        tags = []
-        
-        # 从文件名提取标签
-        filename = doc_path.name.lower()
-        if "frontend" in filename or "前端" in filename:
-            tags.append("frontend")
-        if "backend" in filename or "后端" in filename:
-            tags.append("backend")
-        if "react" in filename:
-            tags.append("react")
-        if "python" in filename:
-            tags.append("python")
-        if "javascript" in filename:
-            tags.append("javascript")
-        
-        # 从内容中提取技术关键词
-        content_lower = chunk.lower()
-        tech_keywords = [
-            "react", "vue", "angular", "javascript", "typescript",
-            "python", "java", "go", "rust", "node.js", "django",
-            "fastapi", "docker", "kubernetes", "aws", "azure",
-            "postgresql", "mongodb", "redis", "nginx"
-        ]
+    async def migrate_embeddings(self, vector_store: VectorStore) -> Dict[str, Any]:
+        """
+        把当前集合迁移到新的嵌入模型(旧集合在迁移期间继续提供检索)
         
-        for keyword in tech_keywords:
-            if keyword in content_lower:
-                tags.append(keyword)
+        与同步和重建互斥，迁移期间的知识库变化在迁移完成后的下一次同步中处理
         
-        return list(set(tags))  # 去重
-    
-    async def reindex_documents(self, knowledge_path: Path, vector_store: VectorStore):
-        """重新索引文档(清空后重建)"""
-        logger.info("开始重新索引文档...")
-        
-        # 删除现有集合
-        await vector_store.delete_collection()
-        
-        # 重新初始化
-        await vector_store.initialize()
-        
-        # 重新加载文档
-        await self.load_documents(knowledge_path, vector_store)
-        
-        logger.info("文档重新索引完成")
+        Returns:
+            迁移统计信息
+        """
+        async with _index_lock:
+            if not vector_store.needs_rebuild:
+                return {}
+            return await EmbeddingMigration(vector_store).run()
     
     def validate_document(self, doc_path: Path) -> bool:
         """验证文档是否有效"""
@@ -308,4 +317,5 @@ class DocumentProcessor:
             
         except Exception as e:
             logger.error(f"验证文档失败 {doc_path}: {e}")
-            return False
\ No newline at end of file
+            return False
+
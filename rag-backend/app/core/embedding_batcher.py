@@ -0,0 +1,163 @@
+"""
+嵌入批处理器
+把来自多个文档的分块按token预算打包，通过create_embeddings_batch并发请求嵌入
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+import asyncio
+
+from app.config import settings
+from app.core.openai_client import OpenAIClient, get_openai_client
+from app.core.embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+class EmbeddingBatcher:
+    """按token预算打包的嵌入批处理器"""
+
+    def __init__(self, openai_client: Optional[OpenAIClient] = None):
+        self.openai_client = openai_client or get_openai_client()
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_inputs = settings.EMBEDDING_BATCH_MAX_INPUTS
+        self.max_input_tokens = settings.EMBEDDING_MAX_INPUT_TOKENS
+        self._semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "cached": 0,
+            "tokens": 0,
+            "truncated": 0
+        }
+
+    def count_tokens(self, text: str) -> int:
+        """计算文本在嵌入模型下的token数"""
+        return self.openai_client.count_embedding_tokens(text)
+
+    def pack(self, token_counts: List[int]) -> List[List[int]]:
+        """
+        按token预算和单次请求输入数上限打包
+
+        Args:
+            token_counts: 每个文本的token数(已截断到单输入上限)
+
+        Returns:
+            每个批次包含的文本下标
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, tokens in enumerate(token_counts):
+            if current and (
+                current_tokens + tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_inputs
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成嵌入，结果顺序与输入一致
+
+        先查询持久化缓存，相同文本只请求一次
+
+        Args:
+            texts: 输入文本列表(可来自多个文档)
+
+        Returns:
+            嵌入向量列表
+        """
+        if not texts:
+            return []
+
+        # 每次调用时获取缓存实例(缓存可能已被关闭或重新打开)
+        cache = get_embedding_cache()
+        model = self.openai_client.embedding_cache_key
+        dimensions = self.openai_client.embedding_dimensions
+        hashes = [EmbeddingCache.hash_text(text) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+        if cache:
+            vectors = await asyncio.to_thread(cache.get_many, model, dimensions, hashes)
+
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            embeddings = await self._embed_uncached(list(missing.values()))
+            fresh = dict(zip(missing.keys(), embeddings))
+            if cache:
+                await asyncio.to_thread(cache.put_many, model, dimensions, fresh)
+            vectors.update(fresh)
+
+        self._stats["texts"] += len(texts)
+        self._stats["cached"] += len(texts) - len(missing)
+        return [vectors[text_hash] for text_hash in hashes]
+
+    async def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """按批次并发请求嵌入API"""
+        inputs = []
+        token_counts = []
+        for text in texts:
+            text, tokens = self._clip(text)
+            inputs.append(text)
+            token_counts.append(tokens)
+
+        batches = self.pack(token_counts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        async def run_batch(indices: List[int]):
+            async with self._semaphore:
+                embeddings = await self.openai_client.create_embeddings_batch(
+                    [inputs[i] for i in indices]
+                )
+            for i, embedding in zip(indices, embeddings):
+                results[i] = embedding
+            self._stats["requests"] += 1
+            self._stats["tokens"] += sum(token_counts[i] for i in indices)
+
+        await asyncio.gather(*(run_batch(indices) for indices in batches))
+
+        logger.debug(f"已生成 {len(texts)} 个嵌入 ({len(batches)} 次请求)")
+        return results
+
+    def _clip(self, text: str) -> Tuple[str, int]:
+        """截断超过单输入上限的文本"""
+        tokens = self.openai_client.embedding_encoding.encode(text)
+        if len(tokens) <= self.max_input_tokens:
+            return text, len(tokens)
+
+        self._stats["truncated"] += 1
+        logger.warning(f"分块超过嵌入模型输入上限({len(tokens)} tokens)，已截断")
+        clipped = tokens[:self.max_input_tokens]
+        return self.openai_client.embedding_encoding.decode(clipped), len(clipped)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        stats = dict(self._stats)
+        embedded = stats["texts"] - stats["cached"]
+        stats["avg_texts_per_request"] = (
+            round(embedded / stats["requests"], 2) if stats["requests"] else 0
+        )
+        return stats
+
+
+# 全局嵌入批处理器实例
+embedding_batcher_instance = None
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """获取嵌入批处理器实例"""
+    global embedding_batcher_instance
+    if embedding_batcher_instance is None:
+        embedding_batcher_instance = EmbeddingBatcher()
+    return embedding_batcher_instance
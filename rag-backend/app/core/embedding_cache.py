@@ -0,0 +1,211 @@
+"""
+嵌入向量持久化缓存
+以 (嵌入模型标识, 维度, 文本sha256) 为键把向量存入SQLite(本地模型的标识带模型文件哈希)，
+重建索引、调整分块大小或恢复被清空的chroma_db时可以直接复用已付费的向量
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+from array import array
+from loguru import logger
+import hashlib
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+
+
+class EmbeddingCache:
+    """基于SQLite的内容寻址嵌入缓存(按大小LRU淘汰)"""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        self._total_bytes = int(row[0])
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """计算文本哈希"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        text_hashes: Iterable[str]
+    ) -> Dict[str, List[float]]:
+        """批量查询缓存，返回命中的 哈希 → 向量"""
+        text_hashes = list(dict.fromkeys(text_hashes))
+        if not text_hashes:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite单条语句的参数数量有限，分段查询
+            for start in range(0, len(text_hashes), 500):
+                part = text_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dimensions or 0, *part]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? "
+                    "WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dimensions or 0, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+
+            self._hits += len(found)
+            self._misses += len(text_hashes) - len(found)
+
+        return found
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        vectors: Dict[str, List[float]]
+    ):
+        """批量写入缓存，超出容量时淘汰最久未访问的向量"""
+        if not vectors:
+            return
+
+        now = time.time()
+        rows = []
+        for text_hash, vector in vectors.items():
+            blob = array('f', vector).tobytes()
+            rows.append((model, dimensions or 0, text_hash, blob, len(blob), now))
+
+        with self._lock:
+            # 覆盖写入时先扣除旧条目大小
+            for start in range(0, len(rows), 500):
+                part = [row[2] for row in rows[start:start + 500]]
+                placeholders = ",".join("?" * len(part))
+                existing = self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dimensions or 0, *part]
+                ).fetchone()
+                self._total_bytes -= int(existing[0])
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, dimensions, text_hash, vector, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._total_bytes += sum(row[4] for row in rows)
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        """按最近访问时间淘汰，直到低于容量的90%"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT model, dimensions, text_hash, size FROM embeddings "
+                "ORDER BY last_access ASC LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+
+            removed = []
+            for model, dimensions, text_hash, size in rows:
+                removed.append((model, dimensions, text_hash))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                removed
+            )
+            self._evictions += len(removed)
+
+        logger.info(f"嵌入缓存已淘汰至 {self._total_bytes / (1024 * 1024):.1f}MB")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+# 全局嵌入缓存实例
+embedding_cache_instance = None
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取嵌入缓存实例(未启用时返回None)"""
+    global embedding_cache_instance
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if embedding_cache_instance is None:
+        embedding_cache_instance = EmbeddingCache(
+            Path(settings.EMBEDDING_CACHE_PATH),
+            settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+        )
+    return embedding_cache_instance
+
+def close_embedding_cache():
+    """关闭嵌入缓存(应用退出时调用)"""
+    global embedding_cache_instance
+    if embedding_cache_instance is not None:
+        embedding_cache_instance.close()
+        embedding_cache_instance = None
@@ -0,0 +1,277 @@
+"""
+嵌入模型迁移
+嵌入模型/维度变化后，在后台把当前集合的分块用新模型重新向量化写入影子集合，期间旧集合继续用旧模型提供检索；
+按每分钟token预算限速，进度记录在检查点文件中，进程中断后从影子集合已有的分块继续；
+可选地对每次检索同时查询影子集合，统计两者结果的重合度和延迟；全部完成后原子切换到影子集合
+"""
+
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, TYPE_CHECKING
+from loguru import logger
+import asyncio
+import json
+import os
+import time
+
+from app.config import settings
+from app.core.embedding_batcher import get_embedding_batcher
+from app.core.index_manifest import IndexManifest
+from app.core.vector_executor import LatencyHistogram, get_vector_executor
+
+if TYPE_CHECKING:
+    from app.core.vector_store import VectorStore
+    from app.models import RetrievalResult
+
+CHECKPOINT_FILE = "embedding_migration.json"
+
+
+class TokenBucket:
+    """每分钟token预算(令牌桶，容量为一分钟的预算)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int):
+        """等待直到预算足够(超过容量的请求按容量计)"""
+        if self.rate <= 0:
+            return
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            wait = (tokens - self._tokens) / self.rate
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class MigrationCheckpoint:
+    """迁移检查点(进程中断后据此找回影子集合继续迁移)"""
+    source_collection: str
+    shadow_collection: str
+    embedding_model: str
+    embedding_dimensions: int
+    total: int = 0
+    migrated: int = 0
+    tokens: int = 0
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = ""
+
+    @property
+    def signature(self) -> Dict[str, Any]:
+        """目标嵌入签名"""
+        return {
+            "embedding_model": self.embedding_model,
+            "embedding_dimensions": self.embedding_dimensions
+        }
+
+    @staticmethod
+    def path() -> Path:
+        """检查点文件路径"""
+        return Path(settings.CHROMA_PERSIST_DIRECTORY) / CHECKPOINT_FILE
+
+    @classmethod
+    def load(cls) -> Optional["MigrationCheckpoint"]:
+        """读取检查点，不存在或损坏时返回None"""
+        path = cls.path()
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(**json.load(f))
+        except Exception as e:
+            logger.warning(f"读取迁移检查点失败，忽略: {e}")
+            return None
+
+    def save(self):
+        """原子写入检查点"""
+        self.updated_at = datetime.now().isoformat()
+        path = self.path()
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def delete(cls):
+        """删除检查点"""
+        path = cls.path()
+        if path.exists():
+            path.unlink()
+
+
+class EmbeddingMigration:
+    """把当前集合迁移到新的嵌入模型"""
+
+    def __init__(self, vector_store: "VectorStore"):
+        self.vector_store = vector_store
+        self.shadow: Optional["VectorStore"] = None
+        self.checkpoint: Optional[MigrationCheckpoint] = None
+        self.bucket = TokenBucket(settings.EMBEDDING_MIGRATION_TOKENS_PER_MINUTE)
+        self.state = "pending"
+        # 影子查询统计
+        self._shadow_tasks: Set[asyncio.Task] = set()
+        self._shadow_queries = 0
+        self._overlap_sum = 0.0
+        self.primary_latency = LatencyHistogram()
+        self.shadow_latency = LatencyHistogram()
+
+    async def _open_shadow(self) -> Set[str]:
+        """
+        打开影子集合
+
+        检查点与当前集合和目标签名一致时继续上次的影子集合，返回其中已迁移的分块ID；
+        否则丢弃旧的影子集合重新开始
+        """
+        expected = self.vector_store._expected_signature()
+        checkpoint = MigrationCheckpoint.load()
+        if (
+            checkpoint is not None
+            and checkpoint.source_collection == self.vector_store.collection_name
+            and checkpoint.signature == expected
+        ):
+            shadow = await self.vector_store.open_shadow(checkpoint.shadow_collection)
+            if shadow is not None:
+                self.shadow, self.checkpoint = shadow, checkpoint
+                done = set(await get_vector_executor().run_read(
+                    lambda: [chunk_id for chunk_id, _, _ in shadow.collection.scan()]
+                ))
+                logger.info(f"继续嵌入迁移: {checkpoint.shadow_collection} (已迁移 {len(done)} 个分块)")
+                return done
+
+        if checkpoint is not None and checkpoint.shadow_collection != self.vector_store.collection_name:
+            await self.vector_store.drop_collection(checkpoint.shadow_collection)
+
+        self.shadow = await self.vector_store.create_shadow()
+        self.checkpoint = MigrationCheckpoint(
+            source_collection=self.vector_store.collection_name,
+            shadow_collection=self.shadow.collection_name,
+            embedding_model=expected["embedding_model"],
+            embedding_dimensions=expected["embedding_dimensions"]
+        )
+        self.checkpoint.save()
+        logger.info(f"开始嵌入迁移: {self.checkpoint.source_collection} -> {self.checkpoint.shadow_collection}")
+        return set()
+
+    async def run(self) -> Dict[str, Any]:
+        """执行迁移并在完成后切换集合"""
+        self.state = "running"
+        self.vector_store.migration = self
+        try:
+            done = await self._open_shadow()
+            batcher = get_embedding_batcher()
+
+            async with self.vector_store._read_collection() as collection:
+                records = await get_vector_executor().run_read(lambda: list(collection.scan()))
+            pending = [record for record in records if record[0] not in done]
+            self.checkpoint.total = len(records)
+            self.checkpoint.migrated = len(records) - len(pending)
+
+            batch_size = settings.EMBEDDING_MIGRATION_BATCH_SIZE
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                ids = [chunk_id for chunk_id, _, _ in batch]
+                documents = [document for _, document, _ in batch]
+                metadatas = [metadata for _, _, metadata in batch]
+
+                tokens = sum(
+                    min(batcher.count_tokens(document), batcher.max_input_tokens)
+                    for document in documents
+                )
+                await self.bucket.acquire(tokens)
+
+                embeddings = await batcher.embed(documents)
+                await self.shadow.upsert_documents(documents, metadatas, ids, embeddings=embeddings)
+
+                self.checkpoint.migrated += len(batch)
+                self.checkpoint.tokens += tokens
+                self.checkpoint.save()
+                logger.info(f"嵌入迁移进度: {self.checkpoint.migrated}/{self.checkpoint.total}")
+
+            # 索引清单和文件质心随集合一起迁移，切换后的增量同步只处理有变化的文件
+            manifest = IndexManifest.for_collection(self.vector_store.collection_name)
+            manifest.path = IndexManifest.for_collection(self.shadow.collection_name).path
+            manifest.save()
+            await self.shadow._build_document_index()
+
+            await asyncio.gather(*self._shadow_tasks, return_exceptions=True)
+            await self.vector_store.swap_collection(self.shadow)
+            MigrationCheckpoint.delete()
+            self.state = "completed"
+
+            stats = self.get_stats()
+            logger.info(f"嵌入迁移完成: {stats}")
+            return stats
+
+        except Exception as e:
+            self.state = "failed"
+            logger.error(f"嵌入迁移失败(已保存检查点，下次同步时继续): {e}")
+            raise
+        finally:
+            self.vector_store.migration = None
+
+    def shadow_query(
+        self,
+        query: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        results: List["RetrievalResult"],
+        elapsed: float
+    ):
+        """在后台用新模型查询影子集合，记录与当前结果的重合度和两边的延迟"""
+        self.primary_latency.observe(elapsed)
+        if not settings.EMBEDDING_MIGRATION_SHADOW_QUERIES or self.shadow is None or self.state != "running":
+            return
+
+        async def compare():
+            started = time.perf_counter()
+            try:
+                shadow_results = await self.shadow.search(query, n_results=n_results, where=where)
+            except Exception as e:
+                logger.debug(f"影子查询失败: {e}")
+                return
+            self.shadow_latency.observe(time.perf_counter() - started)
+
+            primary = {result.content for result in results}
+            shadow = {result.content for result in shadow_results}
+            self._shadow_queries += 1
+            self._overlap_sum += len(primary & shadow) / max(len(primary | shadow), 1)
+
+        task = asyncio.create_task(compare())
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取迁移进度与影子查询统计"""
+        checkpoint = self.checkpoint
+        stats = {
+            "state": self.state,
+            "tokens_per_minute": settings.EMBEDDING_MIGRATION_TOKENS_PER_MINUTE,
+            "throttled_seconds": round(self.bucket.waited_seconds, 2),
+            "shadow_queries": self._shadow_queries,
+            "avg_overlap": round(self._overlap_sum / self._shadow_queries, 4) if self._shadow_queries else None,
+            "primary_latency": self.primary_latency.snapshot(),
+            "shadow_latency": self.shadow_latency.snapshot()
+        }
+        if checkpoint is not None:
+            stats.update({
+                "source_collection": checkpoint.source_collection,
+                "shadow_collection": checkpoint.shadow_collection,
+                "target_model": checkpoint.embedding_model,
+                "target_dimensions": checkpoint.embedding_dimensions,
+                "migrated": checkpoint.migrated,
+                "total": checkpoint.total,
+                "progress": round(checkpoint.migrated / checkpoint.total, 4) if checkpoint.total else 1.0,
+                "tokens": checkpoint.tokens
+            })
+        return stats
@@ -0,0 +1,49 @@
+"""
+嵌入提供方
+通过EMBEDDING_PROVIDER选择: openai(默认)、hashing(本地哈希向量化) 或 onnx(本地句向量模型)
+"""
+
+from pathlib import Path
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.core.embedding_providers.base import EmbeddingProvider, LocalEmbeddingProvider
+
+
+def create_embedding_provider(client: AsyncOpenAI) -> EmbeddingProvider:
+    """按配置创建嵌入提供方(按需导入，未使用的提供方不需要安装依赖)"""
+    provider = settings.EMBEDDING_PROVIDER.lower()
+    if provider == "openai":
+        from app.core.embedding_providers.openai_provider import OpenAIEmbeddingProvider
+        return OpenAIEmbeddingProvider(client, settings.OPENAI_EMBEDDING_MODEL, settings.OPENAI_EMBEDDING_DIMENSIONS)
+    if provider == "hashing":
+        from app.core.embedding_providers.hashing_provider import HashingEmbeddingProvider
+        return HashingEmbeddingProvider(settings.EMBEDDING_LOCAL_DIMENSIONS)
+    if provider == "onnx":
+        from app.core.embedding_providers.onnx_provider import OnnxEmbeddingProvider
+        return OnnxEmbeddingProvider(Path(settings.EMBEDDING_ONNX_MODEL_PATH))
+    raise ValueError(f"未知的嵌入提供方: {settings.EMBEDDING_PROVIDER}")
+
+
+def create_provider_for_signature(client: AsyncOpenAI, model: str, dimensions: int) -> Optional[EmbeddingProvider]:
+    """
+    按集合记录的嵌入签名创建提供方(用于迁移期间继续用旧模型查询旧索引)
+
+    本地ONNX模型只能在模型目录未变化时重建；无法重建时返回None
+    """
+    if model == "local-hashing":
+        from app.core.embedding_providers.hashing_provider import HashingEmbeddingProvider
+        return HashingEmbeddingProvider(dimensions)
+    if model.startswith("onnx:"):
+        model_path = Path(settings.EMBEDDING_ONNX_MODEL_PATH)
+        if f"onnx:{model_path.name}" != model:
+            return None
+        from app.core.embedding_providers.onnx_provider import OnnxEmbeddingProvider
+        return OnnxEmbeddingProvider(model_path)
+    from app.core.embedding_providers.openai_provider import OpenAIEmbeddingProvider
+    return OpenAIEmbeddingProvider(client, model, dimensions or None)
+
+
+__all__ = ["EmbeddingProvider", "LocalEmbeddingProvider", "create_embedding_provider", "create_provider_for_signature"]
@@ -0,0 +1,69 @@
+"""
+嵌入提供方接口
+OpenAIClient的嵌入方法委托给提供方；本地提供方在专用线程池中按批计算，不阻塞事件循环
+"""
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+
+import numpy as np
+
+from app.config import settings
+
+
+class EmbeddingProvider(ABC):
+    """嵌入提供方"""
+
+    name: str
+    # 写入索引签名的模型名称
+    model: str
+    # 输出维度(None表示模型默认维度)
+    dimensions: Optional[int] = None
+
+    @property
+    def cache_key(self) -> str:
+        """嵌入缓存中的模型标识(必须唯一确定模型权重，默认为模型名称)"""
+        return self.model
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """批量生成嵌入，结果顺序与输入一致"""
+
+    def close(self):
+        """释放资源"""
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """在线程池中运行的CPU嵌入提供方"""
+
+    def __init__(self):
+        self.batch_size = max(1, settings.EMBEDDING_LOCAL_BATCH_SIZE)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.EMBEDDING_LOCAL_THREADS),
+            thread_name_prefix=f"embed-{self.name}"
+        )
+
+    @abstractmethod
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        """同步计算一批嵌入(在线程池中执行)，返回已归一化的矩阵"""
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._embed_sync, texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ))
+        return np.concatenate(batches).tolist()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """L2归一化"""
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,36 @@
+"""
+哈希向量化嵌入提供方
+无需模型文件和网络：词项(英文单词、中日韩二元组)经带符号特征哈希映射到固定维度，
+结果确定且跨进程一致，适合离线开发和测试；语义能力有限，仅能匹配词面相近的文本
+"""
+
+from collections import Counter
+from typing import List
+import hashlib
+import math
+
+import numpy as np
+
+from app.core.embedding_providers.base import LocalEmbeddingProvider
+from app.core.lexical_index import tokenize
+
+
+class HashingEmbeddingProvider(LocalEmbeddingProvider):
+    """带符号特征哈希(sublinear tf)"""
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int):
+        self.model = "local-hashing"
+        self.dimensions = dimensions
+        super().__init__()
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, count in Counter(tokenize(text)).items():
+                # 不使用内置hash()，其结果随进程变化
+                digest = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest >> 63 else -1.0
+                matrix[row, digest % self.dimensions] += sign * (1.0 + math.log(count))
+        return self._normalize(matrix)
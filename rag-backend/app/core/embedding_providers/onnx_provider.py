@@ -0,0 +1,84 @@
+"""
+ONNX句向量嵌入提供方
+加载导出为ONNX的小型句向量模型(如all-MiniLM-L6-v2、bge-small-zh)，CPU推理后做均值池化；
+模型目录需包含model.onnx和tokenizer.json，依赖onnxruntime和tokenizers(按需安装)
+"""
+
+from pathlib import Path
+from typing import List
+import hashlib
+
+import numpy as np
+
+from app.core.embedding_providers.base import LocalEmbeddingProvider
+
+MODEL_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+# 超出部分截断(小型句向量模型一般按512以内的长度训练)
+MAX_SEQUENCE_LENGTH = 512
+
+
+class OnnxEmbeddingProvider(LocalEmbeddingProvider):
+    """ONNX Runtime CPU推理"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: Path):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDING_PROVIDER=onnx 需要安装 onnxruntime 和 tokenizers") from e
+
+        if not (model_dir / MODEL_FILE).exists() or not (model_dir / TOKENIZER_FILE).exists():
+            raise FileNotFoundError(f"ONNX模型目录缺少 {MODEL_FILE} 或 {TOKENIZER_FILE}: {model_dir}")
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+
+        # 并行度由线程池控制，单个会话只用一个线程
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self.session.get_inputs()}
+
+        self.model = f"onnx:{model_dir.name}"
+        # 目录名相同的不同模型不能共用缓存的向量，缓存键带上模型和分词器文件的哈希
+        self._digest = self._file_digest([model_dir / MODEL_FILE, model_dir / TOKENIZER_FILE])
+        super().__init__()
+        self.dimensions = int(self._embed_sync(["dimension probe"]).shape[1])
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.model}@{self._digest}"
+
+    @staticmethod
+    def _file_digest(paths: List[Path]) -> str:
+        """计算模型文件内容哈希(分段读取，不把模型整个读入内存)"""
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        return digest.hexdigest()[:16]
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        output = self.session.run(None, feeds)[0]
+        if output.ndim == 3:
+            # 按注意力掩码对token向量做均值池化
+            mask = attention_mask[:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return self._normalize(output.astype(np.float32))
@@ -0,0 +1,36 @@
+"""
+OpenAI嵌入提供方
+"""
+
+from typing import List, Dict, Any, Optional
+
+from openai import AsyncOpenAI
+
+from app.core.embedding_providers.base import EmbeddingProvider
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI嵌入API"""
+
+    name = "openai"
+
+    def __init__(self, client: AsyncOpenAI, model: str, dimensions: Optional[int] = None):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+
+    def _options(self) -> Dict[str, Any]:
+        """嵌入请求的可选参数(text-embedding-3-*支持降维)"""
+        if self.dimensions:
+            return {"dimensions": self.dimensions}
+        return {}
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=texts,
+            **self._options()
+        )
+        # 按输入顺序返回
+        data = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in data]
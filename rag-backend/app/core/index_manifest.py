@@ -0,0 +1,127 @@
+"""
+知识库索引清单
+记录 文件路径 → mtime/size/内容哈希 → 分块ID 的映射，用于增量同步；
+以及每个规范分块的SimHash指纹和来源文件(近似重复分块按来源引用计数)
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, asdict, field
+from loguru import logger
+import hashlib
+import json
+import os
+
+from app.config import settings
+
+MANIFEST_VERSION = 2
+
+
+@dataclass
+class FileRecord:
+    """单个源文件的索引记录"""
+    mtime: float
+    size: int
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        """mtime和大小都未变化时视为未修改(无需读取文件)"""
+        return self.mtime == stat.st_mtime and self.size == stat.st_size
+
+
+@dataclass
+class ChunkRecord:
+    """向量库中单个规范分块的记录"""
+    fingerprint: str
+    sources: List[str] = field(default_factory=list)
+    # 来源文件 → 该文件中分块的来源元数据(内容类型、章节路径、位置和标签)
+    provenance: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+class IndexManifest:
+    """索引清单(每个集合一份，持久化为JSON)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, FileRecord] = {}
+        self.chunks: Dict[str, ChunkRecord] = {}
+
+    @classmethod
+    def for_collection(cls, collection_name: str) -> "IndexManifest":
+        """获取指定集合的清单(清单与向量数据放在同一持久化目录下)"""
+        path = Path(settings.CHROMA_PERSIST_DIRECTORY) / "manifests" / f"{collection_name}.json"
+        manifest = cls(path)
+        manifest.load()
+        return manifest
+
+    @staticmethod
+    def hash_content(raw: bytes) -> str:
+        """计算文件内容哈希"""
+        return hashlib.sha256(raw).hexdigest()
+
+    def load(self):
+        """从磁盘加载清单，文件不存在或损坏时从空清单开始"""
+        self.files = {}
+        self.chunks = {}
+        if not self.path.exists():
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get("version") != MANIFEST_VERSION:
+                logger.warning(f"索引清单版本不匹配，忽略: {self.path}")
+                return
+
+            self.files = {
+                file_path: FileRecord(**record)
+                for file_path, record in data.get("files", {}).items()
+            }
+            self.chunks = {
+                chunk_id: ChunkRecord(**record)
+                for chunk_id, record in data.get("chunks", {}).items()
+            }
+        except Exception as e:
+            logger.warning(f"加载索引清单失败，将按全量处理 {self.path}: {e}")
+            self.files = {}
+            self.chunks = {}
+
+    def save(self):
+        """原子写入清单(先写临时文件再替换)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "files": {file_path: asdict(record) for file_path, record in self.files.items()},
+            "chunks": {chunk_id: asdict(record) for chunk_id, record in self.chunks.items()}
+        }
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_path: str) -> Optional[FileRecord]:
+        """获取文件记录"""
+        return self.files.get(file_path)
+
+    def set(self, file_path: str, record: FileRecord):
+        """写入文件记录"""
+        self.files[file_path] = record
+
+    def remove(self, file_path: str) -> Optional[FileRecord]:
+        """移除文件记录"""
+        return self.files.pop(file_path, None)
+
+    def clear(self):
+        """清空清单"""
+        self.files = {}
+        self.chunks = {}
+
+    def delete(self):
+        """清空并删除清单文件"""
+        self.files = {}
+        self.chunks = {}
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,166 @@
+"""
+索引快照
+把集合导出为可移植的目录，离线构建一次后随镜像或制品分发；新副本启动时以内存映射方式读取，
+直接写入空集合，不调用嵌入接口即可提供检索
+
+目录结构:
+    snapshot.json        快照信息(格式版本、分块数、向量维度、嵌入模型和维度配置)
+    vectors.npy          float32向量矩阵，第i行对应chunks.jsonl的第i行
+    chunks.jsonl         分块记录(ID、文本、元数据)
+    index_manifest.json  知识库索引清单(导入后增量同步只处理有变化的文件)
+"""
+
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from loguru import logger
+import json
+import os
+import shutil
+
+import numpy as np
+
+from app.core.index_manifest import IndexManifest
+from app.core.vector_backends import VectorCollection
+
+SNAPSHOT_VERSION = 1
+INFO_FILE = "snapshot.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+INDEX_MANIFEST_FILE = "index_manifest.json"
+# 导出时每次读取向量的分块数
+EXPORT_BATCH_SIZE = 1000
+
+
+@dataclass
+class SnapshotInfo:
+    """快照信息"""
+    version: int
+    created_at: str
+    count: int
+    dimensions: int
+    embedding_model: str
+    # 嵌入维度配置(0表示模型默认维度)，与集合记录的嵌入签名一致
+    embedding_dimensions: int
+    source_collection: str
+
+    @property
+    def signature(self) -> Dict[str, Any]:
+        """快照的嵌入签名"""
+        return {
+            "embedding_model": self.embedding_model,
+            "embedding_dimensions": self.embedding_dimensions
+        }
+
+
+def read_snapshot_info(path: Path) -> Optional[SnapshotInfo]:
+    """读取快照信息，目录不是有效快照时返回None"""
+    info_path = path / INFO_FILE
+    if not info_path.exists():
+        return None
+    with open(info_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"快照格式版本不匹配，忽略: {path}")
+        return None
+    return SnapshotInfo(**data)
+
+
+def export_snapshot(
+    collection: VectorCollection,
+    manifest: IndexManifest,
+    path: Path,
+    signature: Dict[str, Any]
+) -> SnapshotInfo:
+    """
+    导出集合(同步调用)
+
+    先写入临时目录再替换，导出中断不会留下不完整的快照
+    """
+    records = list(collection.scan())
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    dimensions = 0
+    vectors = None
+    with open(tmp_path / CHUNKS_FILE, 'w', encoding='utf-8') as f:
+        for start in range(0, len(records), EXPORT_BATCH_SIZE):
+            batch = records[start:start + EXPORT_BATCH_SIZE]
+            embeddings = collection.get_embeddings([chunk_id for chunk_id, _, _ in batch])
+            if vectors is None:
+                dimensions = embeddings.shape[1]
+                vectors = np.lib.format.open_memmap(
+                    tmp_path / VECTORS_FILE, mode="w+", dtype=np.float32, shape=(len(records), dimensions)
+                )
+            vectors[start:start + len(batch)] = embeddings
+            for chunk_id, document, metadata in batch:
+                f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False))
+                f.write("\n")
+
+    if vectors is None:
+        np.save(tmp_path / VECTORS_FILE, np.zeros((0, 0), dtype=np.float32))
+    else:
+        vectors.flush()
+        del vectors
+
+    snapshot_manifest = IndexManifest(tmp_path / INDEX_MANIFEST_FILE)
+    snapshot_manifest.files = manifest.files
+    snapshot_manifest.chunks = manifest.chunks
+    snapshot_manifest.save()
+
+    info = SnapshotInfo(
+        version=SNAPSHOT_VERSION,
+        created_at=datetime.now().isoformat(),
+        count=len(records),
+        dimensions=dimensions,
+        embedding_model=signature["embedding_model"],
+        embedding_dimensions=signature["embedding_dimensions"],
+        source_collection=collection.name
+    )
+    with open(tmp_path / INFO_FILE, 'w', encoding='utf-8') as f:
+        json.dump(asdict(info), f, ensure_ascii=False, indent=2)
+
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return info
+
+
+def iter_snapshot_batches(
+    path: Path,
+    batch_size: int
+) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]:
+    """
+    按批读取快照(ID, 向量, 文本, 元数据)
+
+    向量矩阵以只读内存映射打开，每批只读入当前批次的行
+    """
+    vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+    ids, documents, metadatas = [], [], []
+    row = 0
+    with open(path / CHUNKS_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            ids.append(record["id"])
+            documents.append(record["document"])
+            metadatas.append(record["metadata"])
+            if len(ids) == batch_size:
+                yield ids, np.asarray(vectors[row:row + len(ids)]), documents, metadatas
+                row += len(ids)
+                ids, documents, metadatas = [], [], []
+    if ids:
+        yield ids, np.asarray(vectors[row:row + len(ids)]), documents, metadatas
+        row += len(ids)
+
+    if row != vectors.shape[0]:
+        raise ValueError(f"快照不完整: 向量 {vectors.shape[0]} 行，分块记录 {row} 条")
+
+
+def load_snapshot_manifest(path: Path) -> IndexManifest:
+    """读取快照中的索引清单"""
+    manifest = IndexManifest(path / INDEX_MANIFEST_FILE)
+    manifest.load()
+    return manifest
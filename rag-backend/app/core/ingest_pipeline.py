@@ -0,0 +1,532 @@
+"""
+文档摄取流水线
+read → clean → chunk → tag → embed → write 各阶段之间通过有界队列连接，
+文件I/O、CPU分块和网络嵌入可以重叠执行，队列满时上游阶段自动等待(背压)
+
+并行模式(INGEST_PROCESS_WORKERS > 0)下 clean/chunk/tag 合并为 prepare 阶段，
+按文件分发到进程池执行，结果流式送入 embed/write 阶段；进程池在应用生命周期内复用
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple, Callable, Awaitable, TYPE_CHECKING
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from loguru import logger
+import asyncio
+import multiprocessing
+import os
+import time
+
+from app.config import settings
+from app.core.index_manifest import IndexManifest, FileRecord
+from app.core.embedding_batcher import get_embedding_batcher
+from app.core.chunk_dedup import ChunkDeduplicator, DedupPlan
+from app.core.document_chunker import prepare_document_in_worker
+
+if TYPE_CHECKING:
+    from app.core.document_processor import DocumentProcessor
+    from app.core.vector_store import VectorStore
+
+# 队列结束标记
+_STOP = object()
+
+
+@dataclass
+class IngestItem:
+    """流水线中流转的单个文档"""
+    doc_path: Path
+    stat: Optional[os.stat_result] = None
+    raw: bytes = b""
+    content_hash: str = ""
+    content: str = ""
+    chunks: List[Tuple[str, str]] = field(default_factory=list)
+    documents: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    # 需要向量化并写入的分块下标；其余分块只更新元数据
+    upsert_idx: List[int] = field(default_factory=list)
+    kept_idx: List[int] = field(default_factory=list)
+    stale_ids: List[str] = field(default_factory=list)
+    # 文件引用的规范分块(含与其他文件合并的近似重复分块)，以及来源有变化的规范分块
+    refs: List[str] = field(default_factory=list)
+    source_ids: List[str] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+    previous: Optional[FileRecord] = None
+    # 去重计划(写入完成前保留，用于失败时撤销对清单的修改)以及新分块是否可能已写入向量库
+    plan: Optional[DedupPlan] = None
+    upserted: bool = False
+
+
+@dataclass
+class StageStats:
+    """阶段统计"""
+    name: str
+    workers: int
+    processed: int = 0
+    dropped: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        """转换为可序列化的统计信息"""
+        elapsed = max(elapsed, 1e-9)
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "items_per_second": round(self.processed / elapsed, 2),
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3)
+        }
+
+
+StageHandler = Callable[[IngestItem], Awaitable[Optional[IngestItem]]]
+BatchStageHandler = Callable[[List[IngestItem]], Awaitable[List[IngestItem]]]
+
+
+class IngestPipeline:
+    """流式文档摄取流水线"""
+
+    STAGES = ["read", "clean", "chunk", "tag", "embed", "write"]
+    PARALLEL_STAGES = ["read", "prepare", "embed", "write"]
+    # 跨文档合并处理的阶段
+    BATCHED_STAGES = {"embed"}
+
+    def __init__(
+        self,
+        processor: "DocumentProcessor",
+        vector_store: "VectorStore",
+        manifest: IndexManifest,
+        incremental: bool = False
+    ):
+        self.processor = processor
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.incremental = incremental
+        self.embedding_batcher = get_embedding_batcher()
+        self.deduplicator = ChunkDeduplicator(manifest)
+        # 已规划但尚未写入向量库的规范分块
+        self._unwritten: Set[str] = set()
+        self.process_workers = max(0, settings.INGEST_PROCESS_WORKERS)
+        self.stages = self.PARALLEL_STAGES if self.process_workers else self.STAGES
+        self.queue_size = max(1, settings.INGEST_QUEUE_SIZE)
+        self.stats: Dict[str, StageStats] = {}
+        # 处理失败的文件(调用方可据此重试)
+        self.failed_paths: List[str] = []
+        self.totals = {
+            "added": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "chunks_upserted": 0,
+            "chunks_deleted": 0,
+            "chunks_merged": 0
+        }
+
+    def _stage_workers(self, name: str) -> int:
+        """获取阶段并发数"""
+        if name == "prepare":
+            return self.process_workers
+        return max(1, int(settings.INGEST_STAGE_WORKERS.get(name, 1)))
+
+    async def run(self, doc_paths: List[Path]) -> Dict[str, Any]:
+        """运行流水线直到所有文档处理完成"""
+        handlers: Dict[str, Any] = {
+            "read": self._read,
+            "clean": self._clean,
+            "chunk": self._chunk,
+            "tag": self._tag,
+            "prepare": self._prepare,
+            "embed": self._embed,
+            "write": self._write
+        }
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        queues.append(None)  # 最后一个阶段没有下游
+
+        self.stats = {
+            name: StageStats(name=name, workers=self._stage_workers(name))
+            for name in self.stages
+        }
+
+        start_time = time.perf_counter()
+
+        stage_tasks = []
+        for i, name in enumerate(self.stages):
+            stage_tasks.append(asyncio.create_task(
+                self._run_stage(name, handlers[name], queues[i], queues[i + 1])
+            ))
+
+        try:
+            # 生产者：把文档路径送入第一个队列
+            for doc_path in doc_paths:
+                await queues[0].put(IngestItem(doc_path=doc_path))
+            for _ in range(self.stats["read"].workers):
+                await queues[0].put(_STOP)
+
+            await asyncio.gather(*stage_tasks)
+        except BaseException:
+            for task in stage_tasks:
+                task.cancel()
+            raise
+
+        elapsed = time.perf_counter() - start_time
+        report = {
+            "elapsed_seconds": round(elapsed, 3),
+            "documents": len(doc_paths),
+            **self.totals,
+            "failed_paths": list(self.failed_paths),
+            "stages": {name: stat.to_dict(elapsed) for name, stat in self.stats.items()}
+        }
+        self._log_report(report)
+        return report
+
+    async def _run_stage(
+        self,
+        name: str,
+        handler: StageHandler,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue]
+    ):
+        """启动阶段的所有worker，全部结束后通知下游阶段"""
+        stat = self.stats[name]
+        worker = self._batch_worker if name in self.BATCHED_STAGES else self._worker
+        workers = [
+            asyncio.create_task(worker(stat, handler, in_queue, out_queue))
+            for _ in range(stat.workers)
+        ]
+        await asyncio.gather(*workers)
+
+        if out_queue is not None:
+            next_stage = self.stages[self.stages.index(name) + 1]
+            for _ in range(self.stats[next_stage].workers):
+                await out_queue.put(_STOP)
+
+    async def _worker(
+        self,
+        stat: StageStats,
+        handler: StageHandler,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue]
+    ):
+        """阶段worker：从上游取出文档，处理后放入下游"""
+        while True:
+            item = await in_queue.get()
+            if item is _STOP:
+                return
+
+            started = time.perf_counter()
+            try:
+                result = await handler(item)
+            except Exception as e:
+                stat.failed += 1
+                self.failed_paths.append(str(item.doc_path))
+                logger.error(f"摄取阶段 {stat.name} 处理失败 {item.doc_path}: {e}")
+                await self._abort(item)
+                continue
+            finally:
+                stat.busy_seconds += time.perf_counter() - started
+
+            if result is None:
+                stat.dropped += 1
+                continue
+
+            stat.processed += 1
+            if out_queue is not None:
+                blocked_since = time.perf_counter()
+                await out_queue.put(result)
+                stat.blocked_seconds += time.perf_counter() - blocked_since
+
+    async def _batch_worker(
+        self,
+        stat: StageStats,
+        handler: BatchStageHandler,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue]
+    ):
+        """批处理worker：合并多个文档直到达到嵌入token预算后一起处理"""
+        stopped = False
+        while not stopped:
+            item = await in_queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            batch_tokens = self._pending_tokens(item)
+
+            # 在短暂等待窗口内尽量多取文档，凑满一个批次
+            while batch_tokens < self.embedding_batcher.max_batch_tokens:
+                try:
+                    next_item = await asyncio.wait_for(
+                        in_queue.get(), timeout=settings.EMBEDDING_BATCH_LINGER_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if next_item is _STOP:
+                    stopped = True
+                    break
+                batch.append(next_item)
+                batch_tokens += self._pending_tokens(next_item)
+
+            started = time.perf_counter()
+            try:
+                results = await handler(batch)
+            except Exception as e:
+                stat.failed += len(batch)
+                names = ", ".join(item.doc_path.name for item in batch)
+                logger.error(f"摄取阶段 {stat.name} 处理失败 [{names}]: {e}")
+                for failed in batch:
+                    self.failed_paths.append(str(failed.doc_path))
+                    await self._abort(failed)
+                continue
+            finally:
+                stat.busy_seconds += time.perf_counter() - started
+
+            stat.processed += len(results)
+            stat.dropped += len(batch) - len(results)
+            if out_queue is not None:
+                blocked_since = time.perf_counter()
+                for result in results:
+                    await out_queue.put(result)
+                stat.blocked_seconds += time.perf_counter() - blocked_since
+
+    def _pending_tokens(self, item: IngestItem) -> int:
+        """文档待向量化分块的token数"""
+        return sum(self.embedding_batcher.count_tokens(item.documents[i]) for i in item.upsert_idx)
+
+    async def _read(self, item: IngestItem) -> Optional[IngestItem]:
+        """读取文件(增量模式下跳过未修改的文件)"""
+        item.stat = await asyncio.to_thread(item.doc_path.stat)
+        item.previous = self.manifest.get(str(item.doc_path))
+
+        if self.incremental and item.previous and item.previous.matches_stat(item.stat):
+            self.totals["unchanged"] += 1
+            return None
+
+        item.raw = await asyncio.to_thread(self.processor._read_raw_document, item.doc_path)
+        item.content_hash = IndexManifest.hash_content(item.raw)
+
+        # 仅mtime变化(如touch)，内容未变
+        if self.incremental and item.previous and item.previous.sha256 == item.content_hash:
+            item.previous.mtime = item.stat.st_mtime
+            item.previous.size = item.stat.st_size
+            self.totals["unchanged"] += 1
+            return None
+
+        return item
+
+    async def _clean(self, item: IngestItem) -> Optional[IngestItem]:
+        """清理文档内容"""
+        item.content = self.processor.chunker.clean_content(item.raw.decode('utf-8'))
+        item.raw = b""
+        if not item.content.strip() and not item.previous:
+            logger.warning(f"文档内容为空: {item.doc_path}")
+            return None
+        return item
+
+    async def _chunk(self, item: IngestItem) -> Optional[IngestItem]:
+        """文档分块"""
+        item.chunks = (
+            self.processor.chunker.chunk_document(item.content, item.doc_path) if item.content.strip() else []
+        )
+        item.content = ""
+        return item
+
+    async def _tag(self, item: IngestItem) -> Optional[IngestItem]:
+        """生成分块ID、元数据和标签，并计算与上次索引的差异"""
+        item.documents, item.metadatas, item.ids = self.processor.chunker.build_chunk_records(
+            item.doc_path, item.chunks
+        )
+        item.chunks = []
+        self._plan_changes(item)
+        return item
+
+    async def _prepare(self, item: IngestItem) -> Optional[IngestItem]:
+        """在进程池中完成清理、分块和打标签"""
+        try:
+            item.documents, item.metadatas, item.ids = await asyncio.get_running_loop().run_in_executor(
+                get_process_pool(self.process_workers),
+                prepare_document_in_worker,
+                str(item.doc_path),
+                item.raw
+            )
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，下次使用时重建
+            shutdown_process_pool()
+            raise
+        item.raw = b""
+
+        if not item.ids and not item.previous:
+            logger.warning(f"文档内容为空: {item.doc_path}")
+            return None
+
+        self._plan_changes(item)
+        return item
+
+    def _plan_changes(self, item: IngestItem):
+        """
+        计算与上次索引的差异并做近似去重
+
+        新分块需要向量化；已有分块只需更新元数据(索引位置可能变化)；
+        与其他规范分块近似重复的分块只登记来源。
+        本方法不含await，在事件循环中串行执行，多个文档的去重不会互相交错
+        """
+        file_path = str(item.doc_path)
+        previous_ids = item.previous.chunk_ids if item.previous else []
+
+        plan = self.deduplicator.assign(
+            file_path, item.documents, item.ids, previous_ids, item.metadatas
+        )
+        item.upsert_idx = plan.new_idx
+        item.kept_idx = plan.kept_idx
+        item.refs = plan.refs
+
+        # 不再引用的旧分块：无其他来源时删除，否则只更新来源
+        refs = set(plan.refs)
+        item.stale_ids, released = self.deduplicator.release(
+            file_path, [chunk_id for chunk_id in previous_ids if chunk_id not in refs], plan
+        )
+        item.source_ids = plan.merged_ids + released
+        item.plan = plan
+
+        self._unwritten.update(item.ids[i] for i in item.upsert_idx)
+        self.totals["chunks_merged"] += len(item.ids) - len(plan.new_idx) - len(plan.kept_idx)
+
+    def _with_sources(self, item: IngestItem, index: int) -> Dict[str, Any]:
+        """分块元数据加上写入时最新的来源列表"""
+        return {**item.metadatas[index], **self.deduplicator.source_metadata(item.ids[index])}
+
+    async def _embed(self, items: List[IngestItem]) -> List[IngestItem]:
+        """跨文档批量生成嵌入向量"""
+        texts = []
+        for item in items:
+            texts.extend(item.documents[i] for i in item.upsert_idx)
+
+        embeddings = await self.embedding_batcher.embed(texts)
+
+        # 按文档拆分回去
+        offset = 0
+        for item in items:
+            count = len(item.upsert_idx)
+            item.embeddings = embeddings[offset:offset + count]
+            offset += count
+        return items
+
+    async def _write(self, item: IngestItem) -> Optional[IngestItem]:
+        """写入向量数据库并更新索引清单"""
+        # 合并目标所属的文件写入失败时，目标分块已从清单撤销
+        missing = [chunk_id for chunk_id in item.refs if chunk_id not in self.manifest.chunks]
+        if missing:
+            raise ValueError(f"合并的近似重复分块未能写入，下次同步时重新处理: {missing}")
+
+        # 先写入新分块再删除旧分块，避免检索时出现空窗
+        upsert_ids = [item.ids[i] for i in item.upsert_idx]
+        item.upserted = True
+        await self.vector_store.upsert_documents(
+            [item.documents[i] for i in item.upsert_idx],
+            [self._with_sources(item, i) for i in item.upsert_idx],
+            upsert_ids,
+            embeddings=item.embeddings
+        )
+        self._unwritten.difference_update(upsert_ids)
+
+        await self.vector_store.update_metadatas(
+            [item.ids[i] for i in item.kept_idx],
+            [self._with_sources(item, i) for i in item.kept_idx]
+        )
+
+        # 尚未写入的规范分块会在写入时带上最新来源
+        source_ids = [
+            chunk_id for chunk_id in item.source_ids
+            if chunk_id not in self._unwritten and chunk_id in self.manifest.chunks
+        ]
+        await self.vector_store.update_metadatas(
+            source_ids,
+            [self.deduplicator.source_metadata(chunk_id) for chunk_id in source_ids]
+        )
+        await self.vector_store.delete_documents(item.stale_ids)
+        # 向量库已与清单一致，之后不再撤销
+        item.plan = None
+
+        self.manifest.set(str(item.doc_path), FileRecord(
+            mtime=item.stat.st_mtime,
+            size=item.stat.st_size,
+            sha256=item.content_hash,
+            chunk_ids=item.refs
+        ))
+        await self.vector_store.index_document(str(item.doc_path), item.refs)
+
+        self.totals["updated" if item.previous else "added"] += 1
+        self.totals["chunks_upserted"] += len(item.upsert_idx)
+        self.totals["chunks_deleted"] += len(item.stale_ids)
+        logger.info(
+            f"已处理文档: {item.doc_path.name} "
+            f"(新增 {len(item.upsert_idx)}, 保留 {len(item.kept_idx)}, "
+            f"合并 {len(item.refs) - len(item.upsert_idx) - len(item.kept_idx)}, "
+            f"删除 {len(item.stale_ids)} 个分块)"
+        )
+        return item
+
+    async def _abort(self, item: IngestItem):
+        """
+        撤销失败文档对清单的修改
+
+        已写入向量库的新分块一并删除；已按合并结果写入、引用了被撤销分块的其他文件清空其记录的哈希，下次同步时重新处理
+        """
+        if item.plan is None:
+            return
+        plan, item.plan = item.plan, None
+        orphaned = self.deduplicator.rollback(str(item.doc_path), plan)
+        self._unwritten.difference_update(plan.created)
+
+        if item.upserted and plan.created:
+            try:
+                await self.vector_store.delete_documents(plan.created)
+            except Exception as e:
+                logger.error(f"删除未登记的分块失败 {item.doc_path}: {e}")
+
+        for chunk_id, sources in orphaned.items():
+            for source in sources:
+                record = self.manifest.get(source)
+                if record is not None and chunk_id in record.chunk_ids:
+                    record.mtime = 0.0
+                    record.sha256 = ""
+                    logger.warning(f"合并目标分块已撤销，下次同步时重新处理: {Path(source).name}")
+
+    def _log_report(self, report: Dict[str, Any]):
+        """输出各阶段吞吐量"""
+        logger.info(
+            f"摄取流水线完成: {report['documents']} 个文档, "
+            f"耗时 {report['elapsed_seconds']}s"
+        )
+        for name, stage in report["stages"].items():
+            logger.info(
+                f"  阶段 {name}: workers={stage['workers']}, "
+                f"processed={stage['processed']}, failed={stage['failed']}, "
+                f"{stage['items_per_second']} docs/s, utilization={stage['utilization']}"
+            )
+
+
+# 全局分块进程池实例
+process_pool_instance: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """获取分块进程池(首次使用时创建，子进程只启动一次)"""
+    global process_pool_instance
+    if process_pool_instance is None:
+        # spawn避免在持有线程(事件循环、ChromaDB)的进程中fork
+        process_pool_instance = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return process_pool_instance
+
+def shutdown_process_pool():
+    """关闭分块进程池(应用退出时调用)"""
+    global process_pool_instance
+    if process_pool_instance is not None:
+        process_pool_instance.shutdown(wait=False, cancel_futures=True)
+        process_pool_instance = None
@@ -0,0 +1,287 @@
+"""
+知识库文件监听器
+监听knowledge_base目录的变更，合并短时间内的连续保存后只对变更的文件做增量同步；
+同步失败的路径放回队列，按指数退避重试
+"""
+
+from pathlib import Path
+from typing import Dict, Any, Optional, Set
+from loguru import logger
+import asyncio
+import time
+
+from app.config import settings
+from app.core.document_processor import DocumentProcessor
+from app.core.vector_store import VectorStore
+
+try:
+    # inotify(Linux)等原生文件事件，随uvicorn[standard]安装
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover - 未安装时退回轮询
+    awatch = None
+
+
+class KnowledgeBaseWatcher:
+    """知识库文件监听器"""
+
+    def __init__(
+        self,
+        knowledge_path: Path,
+        processor: DocumentProcessor,
+        vector_store: VectorStore
+    ):
+        self.knowledge_path = knowledge_path
+        self.processor = processor
+        self.vector_store = vector_store
+        self.backend = "native" if awatch and not settings.KB_WATCH_FORCE_POLLING else "polling"
+
+        # 待同步的路径 → 首次发现变更的时间
+        self._pending: Dict[Path, float] = {}
+        self._last_event_at = 0.0
+        # 连续失败次数和下次允许同步的时间(退避)
+        self._failures = 0
+        self._retry_at = 0.0
+        self._changed = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._tasks = []
+
+        self._stats = {
+            "syncs": 0,
+            "synced_files": 0,
+            "errors": 0,
+            "retries": 0,
+            "last_sync_at": None,
+            "last_sync_seconds": None,
+            "last_sync_lag_seconds": None
+        }
+
+    def start(self):
+        """启动监听和同步任务"""
+        if self._tasks:
+            return
+
+        self._stop.clear()
+        watch_loop = self._watch_native if self.backend == "native" else self._watch_polling
+        self._tasks = [
+            asyncio.create_task(watch_loop()),
+            asyncio.create_task(self._sync_loop())
+        ]
+        logger.info(f"知识库监听已启动: {self.knowledge_path} (backend={self.backend})")
+
+    async def stop(self):
+        """停止监听"""
+        self._stop.set()
+        self._changed.set()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        logger.info("知识库监听已停止")
+
+    def _enqueue(self, paths: Set[Path]):
+        """记录变更路径"""
+        now = time.monotonic()
+        for path in paths:
+            self._pending.setdefault(path, now)
+        self._last_event_at = now
+        self._changed.set()
+
+    def _normalize(self, path: str) -> Optional[Path]:
+        """把事件路径转换为与索引清单一致的形式(knowledge_path/相对路径)"""
+        try:
+            relative = Path(path).resolve().relative_to(self.knowledge_path.resolve())
+        except ValueError:
+            return None
+        return self.knowledge_path / relative
+
+    def _is_relevant(self, path: Path) -> bool:
+        """
+        只关心支持的文档类型
+
+        删除的路径无法判断类型，也需要处理；移入或复制进来的目录只产生一个目录事件，
+        同步时展开为其下的文档
+        """
+        return (
+            path.suffix.lower() in self.processor.supported_extensions
+            or not path.exists()
+            or path.is_dir()
+        )
+
+    async def _watch_native(self):
+        """基于原生文件事件监听(失败时退回轮询)"""
+        try:
+            async for changes in awatch(
+                self.knowledge_path,
+                stop_event=self._stop,
+                debounce=200,
+                recursive=True
+            ):
+                paths = set()
+                for _, raw_path in changes:
+                    path = self._normalize(raw_path)
+                    if path is not None and self._is_relevant(path):
+                        paths.add(path)
+                if paths:
+                    self._enqueue(paths)
+        except Exception as e:
+            # 例如inotify监听数量达到上限
+            logger.warning(f"原生文件监听失败，改为轮询: {e}")
+            self.backend = "polling"
+            await self._watch_polling()
+
+    def _snapshot(self) -> Dict[Path, tuple]:
+        """获取知识库文件的mtime/大小快照"""
+        snapshot = {}
+        if not self.knowledge_path.exists():
+            return snapshot
+        for path in self.processor._find_documents(self.knowledge_path):
+            try:
+                stat = path.stat()
+                snapshot[path] = (stat.st_mtime, stat.st_size)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    async def _watch_polling(self):
+        """轮询mtime监听(无原生事件支持时使用)"""
+        previous = await asyncio.to_thread(self._snapshot)
+        while not self._stop.is_set():
+            await asyncio.sleep(settings.KB_WATCH_POLL_INTERVAL_SECONDS)
+            current = await asyncio.to_thread(self._snapshot)
+            changed = {
+                path for path in previous.keys() | current.keys()
+                if previous.get(path) != current.get(path)
+            }
+            previous = current
+            if changed:
+                self._enqueue(changed)
+
+    async def _sync_loop(self):
+        """去抖后把变更路径交给增量同步"""
+        debounce = settings.KB_WATCH_DEBOUNCE_SECONDS
+        max_delay = max(settings.KB_WATCH_MAX_DELAY_SECONDS, debounce)
+
+        # 先补上服务停止期间的变更(期间的新事件会进入队列)，失败时退避重试
+        while not self._stop.is_set():
+            try:
+                stats = await self.processor.sync_documents(self.knowledge_path, self.vector_store)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"知识库启动同步失败: {e}")
+                await asyncio.sleep(self._backoff())
+                continue
+            self._retry_failed({Path(path): time.monotonic() for path in stats.get("failed_paths", [])})
+            break
+
+        while not self._stop.is_set():
+            await self._changed.wait()
+            self._changed.clear()
+            if self._stop.is_set():
+                return
+
+            # 等待保存风暴结束：距最后一次事件超过debounce，或最早的变更已等待max_delay；
+            # 上次同步失败时还要等到退避结束
+            while self._pending:
+                now = time.monotonic()
+                if now < self._retry_at:
+                    await asyncio.sleep(self._retry_at - now)
+                    continue
+                quiet_for = now - self._last_event_at
+                oldest = min(self._pending.values())
+                if quiet_for >= debounce or now - oldest >= max_delay:
+                    break
+                await asyncio.sleep(min(debounce - quiet_for, max_delay - (now - oldest)))
+
+            if not self._pending:
+                continue
+
+            batch = self._pending
+            self._pending = {}
+            oldest = min(batch.values())
+            started = time.monotonic()
+
+            try:
+                stats = await self.processor.sync_paths(sorted(batch), self.vector_store)
+                self._stats["syncs"] += 1
+                self._stats["synced_files"] += len(batch)
+                failed = {
+                    Path(path): batch.get(Path(path), started)
+                    for path in stats.get("failed_paths", [])
+                }
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"知识库增量同步失败: {e}")
+                failed = batch
+            self._retry_failed(failed)
+
+            finished = time.monotonic()
+            self._stats["last_sync_at"] = time.time()
+            self._stats["last_sync_seconds"] = round(finished - started, 3)
+            self._stats["last_sync_lag_seconds"] = round(finished - oldest, 3)
+
+    def _backoff(self) -> float:
+        """记录一次失败，返回下次重试前的等待时间(指数退避)"""
+        self._failures += 1
+        delay = min(
+            settings.KB_WATCH_RETRY_SECONDS * 2 ** (self._failures - 1),
+            settings.KB_WATCH_RETRY_MAX_SECONDS
+        )
+        self._retry_at = time.monotonic() + delay
+        return delay
+
+    def _retry_failed(self, failed: Dict[Path, float]):
+        """把同步失败的路径放回队列(保留首次变更时间)，全部成功时重置退避"""
+        if not failed:
+            self._failures = 0
+            self._retry_at = 0.0
+            return
+
+        delay = self._backoff()
+        self._stats["retries"] += 1
+        for path, first_seen in failed.items():
+            self._pending[path] = min(first_seen, self._pending.get(path, first_seen))
+        self._changed.set()
+        logger.warning(f"{len(failed)} 个路径同步失败，{delay:.1f}s 后重试")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监听状态(队列深度和延迟)"""
+        now = time.monotonic()
+        oldest = min(self._pending.values()) if self._pending else None
+        return {
+            "running": bool(self._tasks) and not self._stop.is_set(),
+            "backend": self.backend,
+            "knowledge_path": str(self.knowledge_path),
+            "queue_depth": len(self._pending),
+            "retry_in_seconds": round(max(self._retry_at - now, 0.0), 3),
+            "current_lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            **self._stats
+        }
+
+
+# 全局监听器实例
+kb_watcher_instance: Optional[KnowledgeBaseWatcher] = None
+
+def get_knowledge_base_watcher() -> Optional[KnowledgeBaseWatcher]:
+    """获取知识库监听器实例(未启动时返回None)"""
+    return kb_watcher_instance
+
+def start_knowledge_base_watcher(vector_store: VectorStore) -> KnowledgeBaseWatcher:
+    """创建并启动知识库监听器(启动后先在后台做一次增量同步)"""
+    global kb_watcher_instance
+    if kb_watcher_instance is None:
+        knowledge_path = Path(settings.KNOWLEDGE_BASE_PATH)
+        knowledge_path.mkdir(parents=True, exist_ok=True)
+        kb_watcher_instance = KnowledgeBaseWatcher(knowledge_path, DocumentProcessor(), vector_store)
+        kb_watcher_instance.start()
+    return kb_watcher_instance
+
+async def stop_knowledge_base_watcher():
+    """停止知识库监听器"""
+    global kb_watcher_instance
+    if kb_watcher_instance is not None:
+        await kb_watcher_instance.stop()
+        kb_watcher_instance = None
@@ -0,0 +1,131 @@
+"""
+关键词标签器
+从可配置的关键词/别名文件编译单个正则(按前缀树组织)，一次扫描即可为分块打上所有标签
+"""
+
+from pathlib import Path
+from typing import List, Dict, Set, Optional
+from loguru import logger
+import json
+import re
+
+from app.config import settings
+
+# 随包提供的默认关键词文件
+DEFAULT_KEYWORDS_FILE = Path(__file__).resolve().parent.parent / "data" / "tag_keywords.json"
+
+# 仅在ASCII字母数字处判断词边界：
+# "go"不会匹配"google"/"good"，但"Go语言"、"用Python开发"这类中英混排仍能命中
+_BOUNDARY_BEFORE = r"(?<![A-Za-z0-9])"
+_BOUNDARY_AFTER = r"(?![A-Za-z0-9])"
+
+
+class KeywordMatcher:
+    """多模式关键词匹配器"""
+
+    def __init__(self, aliases: Dict[str, List[str]]):
+        # 别名(小写) → 标签
+        self.alias_to_tag: Dict[str, str] = {}
+        for tag, words in aliases.items():
+            for word in [tag, *words]:
+                word = word.strip().lower()
+                if word:
+                    self.alias_to_tag[word] = tag
+
+        self.pattern: Optional[re.Pattern] = None
+        if self.alias_to_tag:
+            trie_pattern = self._build_trie_pattern(list(self.alias_to_tag))
+            self.pattern = re.compile(
+                f"{_BOUNDARY_BEFORE}(?:{trie_pattern}){_BOUNDARY_AFTER}",
+                re.IGNORECASE
+            )
+
+    @staticmethod
+    def _build_trie_pattern(words: List[str]) -> str:
+        """
+        把关键词列表编译为前缀树形式的正则
+
+        共享前缀只比较一次，关键词数量增加时单个位置的匹配代价基本不变；
+        子分支排在"到此结束"之前，优先匹配更长的关键词(如node.js优先于node)
+        """
+        trie: Dict = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = True
+
+        def to_pattern(node: Dict) -> str:
+            branches = []
+            for char in sorted(k for k in node if k):
+                branches.append(re.escape(char) + to_pattern(node[char]))
+
+            is_end = "" in node
+            if not branches:
+                return ""
+            if len(branches) == 1 and not is_end:
+                return branches[0]
+
+            alternation = "|".join(branches)
+            return f"(?:{alternation})?" if is_end else f"(?:{alternation})"
+
+        return to_pattern(trie)
+
+    def match(self, text: str) -> Set[str]:
+        """扫描一次文本，返回命中的标签"""
+        if not self.pattern or not text:
+            return set()
+        return {
+            self.alias_to_tag[m.group(0).lower()]
+            for m in self.pattern.finditer(text)
+            if m.group(0).lower() in self.alias_to_tag
+        }
+
+
+class KeywordTagger:
+    """文件名、分块内容和用户问题的标签器"""
+
+    def __init__(self, keywords_file: Path):
+        self.keywords_file = keywords_file
+
+        with open(keywords_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        self.filename_matcher = KeywordMatcher(config.get("filename_tags", {}))
+        self.content_matcher = KeywordMatcher(config.get("content_tags", {}))
+        # 问题 → 内容类型(用于查询路由)
+        self.query_type_matcher = KeywordMatcher(config.get("query_content_types", {}))
+
+        logger.info(
+            f"已加载标签关键词: {keywords_file} "
+            f"(文件名 {len(self.filename_matcher.alias_to_tag)} 个, "
+            f"内容 {len(self.content_matcher.alias_to_tag)} 个, "
+            f"问题类型 {len(self.query_type_matcher.alias_to_tag)} 个)"
+        )
+
+    def tag_filename(self, filename: str) -> Set[str]:
+        """从文件名提取标签"""
+        return self.filename_matcher.match(filename)
+
+    def tag_content(self, content: str) -> Set[str]:
+        """从内容提取标签"""
+        return self.content_matcher.match(content)
+
+    def tag_query_content_types(self, query: str) -> Set[str]:
+        """从问题推断相关的内容类型"""
+        return self.query_type_matcher.match(query)
+
+
+# 全局标签器实例
+keyword_tagger_instance = None
+
+def get_keyword_tagger() -> KeywordTagger:
+    """获取标签器实例"""
+    global keyword_tagger_instance
+    if keyword_tagger_instance is None:
+        keywords_file = Path(settings.TAG_KEYWORDS_FILE) if settings.TAG_KEYWORDS_FILE else DEFAULT_KEYWORDS_FILE
+        if not keywords_file.exists():
+            logger.warning(f"标签关键词文件不存在，使用默认文件: {keywords_file}")
+            keywords_file = DEFAULT_KEYWORDS_FILE
+        keyword_tagger_instance = KeywordTagger(keywords_file)
+    return keyword_tagger_instance
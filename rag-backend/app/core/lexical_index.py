@@ -0,0 +1,187 @@
+"""
+BM25词法索引
+内存倒排索引(只保存词频和元数据，不保存分块文本)，与VectorStore的写入保持同步：精确词查询(如"FastAPI"、项目名)不依赖嵌入也能命中；
+英文/数字按单词切分，中日韩文字按二元组(bigram)切分
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import heapq
+import math
+import re
+import unicodedata
+
+from app.core.vector_backends import match_where
+
+# 英文/数字单词，或连续的中日韩文字
+TOKEN_PATTERN = re.compile(
+    r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """切分词项(全角转半角、忽略大小写，中日韩文字切为相邻二元组)"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if word[0].isascii():
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+@dataclass
+class LexicalHit:
+    """词法检索结果"""
+    id: str
+    metadata: Dict[str, Any]
+    # BM25分数
+    score: float
+    # 命中的查询词项IDF占比(0-1)，1表示所有查询词都出现在文档中
+    coverage: float
+
+
+class LexicalIndex:
+    """BM25倒排索引"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # 词项 → {分块ID: 词频}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # 分块ID → 词频(删除时用来清理倒排表)
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._doc_terms
+
+    def add(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """插入或覆盖分块"""
+        self.remove(ids)
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            terms = Counter(tokenize(document))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            self._doc_terms[chunk_id] = terms
+            self._doc_lengths[chunk_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[chunk_id]
+            self._metadatas[chunk_id] = dict(metadata)
+
+    def build(self, records: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """从(ID, 文本, 元数据)重建索引"""
+        self.clear()
+        for chunk_id, document, metadata in records:
+            self.add([chunk_id], [document], [metadata])
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """合并更新元数据(与后端一致，只覆盖给出的字段)"""
+        for chunk_id, metadata in zip(ids, metadatas):
+            if chunk_id in self._metadatas:
+                self._metadatas[chunk_id].update(metadata)
+
+    def remove(self, ids: List[str]):
+        """删除分块"""
+        for chunk_id in ids:
+            terms = self._doc_terms.pop(chunk_id, None)
+            if terms is None:
+                continue
+            for term in terms:
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(chunk_id)
+            self._metadatas.pop(chunk_id, None)
+
+    def clear(self):
+        """清空索引"""
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._metadatas = {}
+        self._total_length = 0
+
+    def _idf(self, term: str) -> float:
+        """BM25 IDF(未出现的词项取最大值)"""
+        df = len(self._postings.get(term, ()))
+        n = len(self._doc_terms)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(
+        self,
+        query: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[LexicalHit]:
+        """按BM25分数返回top-k"""
+        terms = set(tokenize(query))
+        if not terms or not self._doc_terms:
+            return []
+
+        avg_length = self._total_length / len(self._doc_terms)
+        idf = {term: self._idf(term) for term in terms}
+        total_idf = sum(idf.values())
+
+        scores: Dict[str, float] = {}
+        matched_idf: Dict[str, float] = {}
+        for term in terms:
+            for chunk_id, tf in self._postings.get(term, {}).items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+                matched_idf[chunk_id] = matched_idf.get(chunk_id, 0.0) + idf[term]
+
+        if where:
+            scores = {
+                chunk_id: score for chunk_id, score in scores.items()
+                if match_where(self._metadatas[chunk_id], where)
+            }
+
+        top = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        return [
+            LexicalHit(
+                id=chunk_id,
+                metadata=dict(self._metadatas[chunk_id]),
+                score=score,
+                coverage=min(matched_idf[chunk_id] / total_idf, 1.0) if total_idf else 0.0
+            )
+            for chunk_id, score in top
+        ]
+
+    def query_term_count(self, query: str) -> int:
+        """查询中不同词项的数量"""
+        return len(set(tokenize(query)))
+
+    def partition_sizes(self, field: str) -> Dict[Any, int]:
+        """按元数据统计字段各取值的分块数(列表字段按元素统计)"""
+        sizes: Counter = Counter()
+        for metadata in self._metadatas.values():
+            value = metadata.get(field)
+            if isinstance(value, (list, tuple)):
+                sizes.update(value)
+            elif value is not None and not isinstance(value, dict):
+                sizes[value] += 1
+        return dict(sizes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        return {
+            "documents": len(self._doc_terms),
+            "terms": len(self._postings),
+            "avg_document_length": round(self._total_length / len(self._doc_terms), 1) if self._doc_terms else 0.0
+        }
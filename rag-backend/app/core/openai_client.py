@@ -11,6 +11,7 @@ from datetime import datetime
 
 from app.config import settings
 from app.models import ChatMessage, MessageRole
+from app.core.embedding_providers import EmbeddingProvider, create_embedding_provider
 
 class OpenAIClient:
     """OpenAI API客户端"""
@@ -19,7 +20,31 @@ class OpenAIClient:
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.encoding = tiktoken.encoding_for_model("gpt-4.1-mini")
         self._model = settings.OPENAI_MODEL
-        self._embedding_model = settings.OPENAI_EMBEDDING_MODEL
+        # 嵌入由可插拔的提供方生成(OpenAI或本地CPU模型)
+        self.embedding_provider: EmbeddingProvider = create_embedding_provider(self.client)
+        self.embedding_encoding = self._load_embedding_encoding()
+    
+    @property
+    def embedding_model(self) -> str:
+        """当前嵌入模型名称"""
+        return self.embedding_provider.model
+    
+    @property
+    def embedding_cache_key(self) -> str:
+        """嵌入缓存中的模型标识(本地模型带上模型文件哈希)"""
+        return self.embedding_provider.cache_key
+    
+    @property
+    def embedding_dimensions(self) -> Optional[int]:
+        """嵌入输出维度(None表示模型默认维度)"""
+        return self.embedding_provider.dimensions
+    
+    def _load_embedding_encoding(self) -> tiktoken.Encoding:
+        """加载嵌入模型对应的编码(用于嵌入请求的token预算)"""
+        try:
+            return tiktoken.encoding_for_model(self.embedding_model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
     
     async def chat_completion(
         self,
@@ -105,12 +130,7 @@ class OpenAIClient:
             嵌入向量
         """
         try:
-            response = await self.client.embeddings.create(
-                model=self._embedding_model,
-                input=text
-            )
-            
-            return response.data[0].embedding
+            return (await self.embedding_provider.embed([text]))[0]
             
         except Exception as e:
             logger.error(f"创建嵌入失败: {e}")
@@ -127,12 +147,7 @@ class OpenAIClient:
             嵌入向量列表
         """
         try:
-            response = await self.client.embeddings.create(
-                model=self._embedding_model,
-                input=texts
-            )
-            
-            return [item.embedding for item in response.data]
+            return await self.embedding_provider.embed(texts)
             
         except Exception as e:
             logger.error(f"批量创建嵌入失败: {e}")
@@ -142,6 +157,10 @@ class OpenAIClient:
         """计算文本的token数量"""
         return len(self.encoding.encode(text))
     
+    def count_embedding_tokens(self, text: str) -> int:
+        """计算文本在嵌入模型下的token数量"""
+        return len(self.embedding_encoding.encode(text))
+    
     def _truncate_messages(
         self, 
         messages: List[Dict[str, str]], 
@@ -205,4 +224,12 @@ def get_openai_client() -> OpenAIClient:
     global openai_client_instance
     if openai_client_instance is None:
         openai_client_instance = OpenAIClient()
-    return openai_client_instance
\ No newline at end of file
+    return openai_client_instance
+
+async def close_openai_client():
+    """关闭OpenAI客户端和嵌入提供方(应用退出时调用)"""
+    global openai_client_instance
+    if openai_client_instance is not None:
+        openai_client_instance.embedding_provider.close()
+        await openai_client_instance.client.close()
+        openai_client_instance = None
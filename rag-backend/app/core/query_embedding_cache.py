@@ -0,0 +1,113 @@
+"""
+查询向量缓存
+访客经常重复同样的问题，把 规范化后的查询文本 → 嵌入向量 缓存在内存中(LRU + TTL)，
+命中时省去一次嵌入API往返；与具体的向量存储后端无关
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from cachetools import TTLCache
+from loguru import logger
+import asyncio
+import re
+import unicodedata
+
+from app.config import settings
+from app.core.embedding_batcher import EmbeddingBatcher, get_embedding_batcher
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# NFKC不会处理的中文标点
+CJK_PUNCTUATION = str.maketrans({"。": ".", "、": ",", "「": '"', "」": '"', "『": '"', "』": '"'})
+# 句末标点不影响语义
+TRAILING_PUNCTUATION = ".?!,;:~ "
+
+
+class QueryEmbeddingCache:
+    """查询向量LRU+TTL缓存"""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        batcher: Optional[EmbeddingBatcher] = None
+    ):
+        self.batcher = batcher or get_embedding_batcher()
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # 同一查询并发未命中时只请求一次
+        self._inflight: Dict[Tuple[str, Optional[int], str], asyncio.Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        规范化查询文本
+
+        全角转半角(NFKC)、统一中文标点、合并空白、忽略大小写和句末标点
+        """
+        text = unicodedata.normalize("NFKC", text).translate(CJK_PUNCTUATION)
+        text = WHITESPACE_PATTERN.sub(" ", text).strip().casefold()
+        return text.rstrip(TRAILING_PUNCTUATION) or text
+
+    async def embed(self, query: str) -> List[float]:
+        """获取查询向量(优先读缓存)"""
+        openai_client = self.batcher.openai_client
+        key = (openai_client.embedding_model, openai_client.embedding_dimensions, self.normalize(query))
+
+        embedding = self._cache.get(key)
+        if embedding is not None:
+            self._hits += 1
+            return embedding
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            embedding = (await self.batcher.embed([query]))[0]
+            self._cache[key] = embedding
+            future.set_result(embedding)
+            return embedding
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"exception was never retrieved"警告
+            future.exception()
+            logger.error(f"查询向量生成失败: {e}")
+            raise
+        finally:
+            del self._inflight[key]
+
+    def clear(self):
+        """清空缓存"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "size": len(self._cache),
+            "max_size": int(self._cache.maxsize),
+            "ttl_seconds": self._cache.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "hit_rate": round((self._hits + self._coalesced) / lookups, 4) if lookups else 0.0
+        }
+
+
+# 全局查询向量缓存实例
+query_embedding_cache_instance = None
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """获取查询向量缓存实例"""
+    global query_embedding_cache_instance
+    if query_embedding_cache_instance is None:
+        query_embedding_cache_instance = QueryEmbeddingCache(
+            maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+    return query_embedding_cache_instance
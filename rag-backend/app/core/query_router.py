@@ -0,0 +1,93 @@
+"""
+查询路由
+复用KeywordTagger把问题映射到相关的内容类型和标签：内容类型作为分区过滤条件，检索时只扫描这些分区，
+分区内结果不足时由调用方回退到全量检索；标签只用于排序加权，不过滤结果
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable
+from loguru import logger
+
+from app.config import settings
+from app.core.keyword_tagger import KeywordTagger, get_keyword_tagger
+
+
+@dataclass
+class RouteDecision:
+    """路由结果"""
+    content_types: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+
+    @property
+    def where(self) -> Optional[Dict[str, Any]]:
+        """转换为向量存储的过滤条件(只按内容类型过滤，标签作为加权)"""
+        if not self.content_types:
+            return None
+        return {"content_type": {"$in": self.content_types}}
+
+
+class QueryRouter:
+    """基于关键词的轻量查询路由器"""
+
+    def __init__(self, tagger: Optional[KeywordTagger] = None):
+        self.tagger = tagger or get_keyword_tagger()
+        self._routed = 0
+        self._unrouted = 0
+        self._fallbacks = 0
+        self._partition_counts: Counter = Counter()
+
+    def route(
+        self,
+        query: str,
+        partition_sizes: Optional[Callable[[str], Dict[Any, int]]] = None
+    ) -> RouteDecision:
+        """
+        推断问题相关的分区
+
+        Args:
+            partition_sizes: 字段 → 各取值的分块数；给出时只路由到非空的分区
+        """
+        content_types = self.tagger.tag_query_content_types(query)
+        tags = self.tagger.tag_content(query)
+        if partition_sizes is not None:
+            if content_types:
+                content_types = content_types & set(partition_sizes("content_type"))
+            if tags:
+                tags = tags & set(partition_sizes("tags"))
+        decision = RouteDecision(content_types=sorted(content_types), tags=sorted(tags))
+
+        if not decision.content_types and not decision.tags:
+            self._unrouted += 1
+        else:
+            self._routed += 1
+            self._partition_counts.update(f"content_type:{t}" for t in decision.content_types)
+            self._partition_counts.update(f"tag:{t}" for t in decision.tags)
+            logger.debug(f"查询路由: content_types={decision.content_types}, tags={decision.tags}")
+        return decision
+
+    def record_fallback(self):
+        """记录一次分区结果不足、回退到全量检索"""
+        self._fallbacks += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由统计"""
+        return {
+            "routed": self._routed,
+            "unrouted": self._unrouted,
+            "fallbacks": self._fallbacks,
+            "top_partitions": dict(self._partition_counts.most_common(10))
+        }
+
+
+# 全局查询路由器实例
+query_router_instance = None
+
+def get_query_router() -> Optional[QueryRouter]:
+    """获取查询路由器实例(未启用时返回None)"""
+    global query_router_instance
+    if not settings.QUERY_ROUTER_ENABLED:
+        return None
+    if query_router_instance is None:
+        query_router_instance = QueryRouter()
+    return query_router_instance
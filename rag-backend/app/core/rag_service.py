@@ -9,6 +9,9 @@ from datetime import datetime
 
 from app.core.vector_store import get_vector_store
 from app.core.openai_client import get_openai_client
+from app.core.query_embedding_cache import get_query_embedding_cache
+from app.core.answer_cache import get_answer_cache
+from app.core.query_router import get_query_router
 from app.models import ChatMessage, RetrievalResult
 from app.config import settings
 
@@ -49,6 +52,30 @@ class RAGService:
         try:
             logger.info(f"处理聊天请求: session_id={session_id}, language={language}")
             
+            # 0. 无上下文的提问先查语义回答缓存(有上下文时回答依赖对话历史，不缓存)；
+            #    关键词查询走词法快速路径，不为查缓存而调用嵌入API
+            answer_cache = get_answer_cache() if not context else None
+            if answer_cache and self.vector_store.answers_lexically(message):
+                answer_cache = None
+            query_embedding = None
+            index_version = self.vector_store.index_version
+            if answer_cache:
+                try:
+                    query_embedding = await get_query_embedding_cache().embed(message)
+                except Exception as e:
+                    logger.warning(f"查询向量生成失败，跳过回答缓存: {e}")
+                
+                cached = answer_cache.lookup(query_embedding, language, index_version) if query_embedding else None
+                if cached:
+                    cached_response, similarity = cached
+                    logger.info(f"命中回答缓存: similarity={similarity:.4f}")
+                    return {
+                        **cached_response,
+                        "token_usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        "cache_hit": True,
+                        "timestamp": datetime.now().isoformat()
+                    }
+            
             # 1. 检索相关文档
             retrieval_results = await self._retrieve_relevant_docs(message)
             
@@ -79,6 +106,13 @@ class RAGService:
                 "timestamp": datetime.now().isoformat()
             }
             
+            # 生成期间知识库有更新时丢弃该回答(回答基于检索前的索引版本)
+            if answer_cache and query_embedding:
+                if self.vector_store.index_version == index_version:
+                    answer_cache.store(message, query_embedding, language, index_version, response)
+                else:
+                    logger.info("生成期间知识库已更新，不缓存该回答")
+            
             logger.info(f"聊天完成: tokens={llm_response['token_usage']['total_tokens']}")
             return response
             
@@ -87,13 +121,39 @@ class RAGService:
             raise
     
     async def _retrieve_relevant_docs(self, query: str) -> List[RetrievalResult]:
-        """检索相关文档"""
+        """检索相关文档(优先在问题相关的分区内检索，结果不足时补充全量检索结果)"""
         try:
-            # 检索相关文档
-            results = await self.vector_store.search(
-                query=query,
-                n_results=settings.TOP_K_RESULTS
-            )
+            results: List[RetrievalResult] = []
+            
+            router = get_query_router()
+            decision = router.route(query, self.vector_store.partition_sizes) if router else None
+            where = decision.where if decision else None
+            boost_tags = decision.tags if decision else None
+            if where:
+                results = await self.vector_store.search(
+                    query=query,
+                    n_results=settings.TOP_K_RESULTS,
+                    where=where,
+                    boost_tags=boost_tags
+                )
+                if len(results) < settings.QUERY_ROUTER_MIN_RESULTS:
+                    logger.info(f"分区检索结果不足({len(results)})，补充全量检索")
+                    router.record_fallback()
+                    where = None
+            
+            if where is None:
+                # 分区结果排在前面，全量结果去重后补足
+                seen = {result.content for result in results}
+                for result in await self.vector_store.search(
+                    query=query,
+                    n_results=settings.TOP_K_RESULTS,
+                    boost_tags=boost_tags
+                ):
+                    if len(results) >= settings.TOP_K_RESULTS:
+                        break
+                    if result.content not in seen:
+                        seen.add(result.content)
+                        results.append(result)
             
             logger.info(f"检索到 {len(results)} 个相关文档")
             return results
@@ -233,10 +293,13 @@ Please provide a helpful response. If you need specific information that isn't a
         """获取服务统计信息"""
         try:
             vector_stats = await self.vector_store.get_stats()
+            answer_cache = get_answer_cache()
             
             return {
                 "service_status": "active",
                 "vector_store": vector_stats,
+                "answer_cache": answer_cache.get_stats() if answer_cache else None,
+                "query_router": get_query_router().get_stats() if settings.QUERY_ROUTER_ENABLED else None,
                 "configuration": {
                     "chunk_size": settings.CHUNK_SIZE,
                     "top_k_results": settings.TOP_K_RESULTS,
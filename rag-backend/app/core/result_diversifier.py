@@ -0,0 +1,153 @@
+"""
+检索结果后处理
+在候选集上(NumPy数组)做自适应截断和最大边际相关性(MMR)去冗余：
+先在排序分数的最大断崖处截断，再按MMR从剩余候选中选出互相不重复的分块，减少送入提示词的分块数
+"""
+
+from typing import List, Dict, Any
+import numpy as np
+
+from app.config import settings
+
+
+def adaptive_cutoff(scores: np.ndarray, min_keep: int, min_gap: float) -> int:
+    """
+    在降序分数的最大相邻差处截断
+
+    Args:
+        scores: 降序排列的分数
+        min_keep: 至少保留的数量
+        min_gap: 最大差值低于该值(相对于最高分)时不截断
+
+    Returns:
+        保留的数量
+    """
+    count = len(scores)
+    if count <= min_keep:
+        return count
+
+    top = float(scores[0])
+    if top <= 0:
+        return count
+
+    # 只在min_keep之后的位置截断
+    gaps = (scores[min_keep - 1:-1] - scores[min_keep:]) / top
+    cut = int(np.argmax(gaps))
+    if gaps[cut] < min_gap:
+        return count
+    return min_keep + cut
+
+
+def mmr_select(
+    vectors: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    lambda_mult: float
+) -> List[int]:
+    """
+    最大边际相关性选择
+
+    每一步选 λ·相关性 - (1-λ)·与已选结果的最大相似度 最高的候选；
+    与已选结果的最大相似度按列增量更新，每步只需一次矩阵-向量乘积
+
+    Args:
+        vectors: 候选向量矩阵(每行一个候选)
+        relevance: 候选的相关性分数(已归一化到0-1)
+        k: 选择数量
+        lambda_mult: 相关性权重(1表示不去冗余)
+
+    Returns:
+        按选择顺序排列的候选下标
+    """
+    count = len(vectors)
+    k = min(k, count)
+    if k <= 0:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+
+    selected: List[int] = []
+    available = np.ones(count, dtype=bool)
+    max_similarity = np.zeros(count, dtype=np.float32)
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores = np.where(available, scores, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+    return selected
+
+
+class ResultDiversifier:
+    """检索结果截断与去冗余"""
+
+    def __init__(self):
+        self._requests = 0
+        self._candidates = 0
+        self._after_cutoff = 0
+        self._returned = 0
+
+    def select(
+        self,
+        vectors: np.ndarray,
+        scores: np.ndarray,
+        n_results: int
+    ) -> List[int]:
+        """
+        从候选中选出最终结果
+
+        Args:
+            vectors: 候选向量矩阵
+            scores: 候选的相似度(0-1，与vectors行对应，降序排列)
+            n_results: 最多返回的数量
+
+        Returns:
+            选中候选的下标(按MMR选择顺序)
+        """
+        keep = len(scores)
+        if settings.ADAPTIVE_CUTOFF_ENABLED:
+            keep = adaptive_cutoff(
+                scores,
+                min_keep=min(settings.ADAPTIVE_CUTOFF_MIN_RESULTS, n_results),
+                min_gap=settings.ADAPTIVE_CUTOFF_MIN_GAP
+            )
+
+        if settings.MMR_ENABLED:
+            relevance = scores[:keep] / max(float(scores[:keep].max()), 1e-12) if keep else scores[:0]
+            selected = mmr_select(
+                vectors[:keep],
+                relevance,
+                n_results,
+                settings.MMR_LAMBDA
+            )
+        else:
+            selected = list(range(min(keep, n_results)))
+
+        self._requests += 1
+        self._candidates += len(scores)
+        self._after_cutoff += keep
+        self._returned += len(selected)
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取后处理统计(平均每次检索的候选数、截断后数量和返回数量)"""
+        requests = max(self._requests, 1)
+        return {
+            "requests": self._requests,
+            "avg_candidates": round(self._candidates / requests, 2),
+            "avg_after_cutoff": round(self._after_cutoff / requests, 2),
+            "avg_returned": round(self._returned / requests, 2)
+        }
+
+
+# 全局结果后处理实例
+result_diversifier_instance = None
+
+def get_result_diversifier() -> ResultDiversifier:
+    """获取检索结果后处理实例"""
+    global result_diversifier_instance
+    if result_diversifier_instance is None:
+        result_diversifier_instance = ResultDiversifier()
+    return result_diversifier_instance
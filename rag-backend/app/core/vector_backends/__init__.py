@@ -0,0 +1,31 @@
+"""
+向量存储后端
+通过VECTOR_BACKEND选择: chroma(ChromaDB，默认) 或 numpy(内存映射矩阵)
+"""
+
+from pathlib import Path
+from loguru import logger
+
+from app.config import settings
+from app.core.vector_backends.base import VectorBackend, VectorCollection, SearchHit, match_where
+
+
+def create_backend(persist_dir: Path) -> VectorBackend:
+    """按配置创建向量存储后端(按需导入，未使用的后端不需要安装依赖)"""
+    backend = settings.VECTOR_BACKEND.lower()
+    if backend == "numpy":
+        from app.core.vector_backends.numpy_backend import NumpyBackend
+        if (persist_dir / "chroma.sqlite3").exists() and not (persist_dir / "numpy").exists():
+            logger.warning(
+                f"持久化目录 {persist_dir} 中已有Chroma数据，NumPy后端不会读取它，将重新向量化整个知识库；"
+                f"如需复用已有向量，先用 VECTOR_BACKEND=chroma python build_snapshot.py export 导出快照，"
+                f"再以 VECTOR_BACKEND=numpy 执行 import"
+            )
+        return NumpyBackend(persist_dir)
+    if backend == "chroma":
+        from app.core.vector_backends.chroma_backend import ChromaBackend
+        return ChromaBackend(persist_dir)
+    raise ValueError(f"未知的向量存储后端: {settings.VECTOR_BACKEND}")
+
+
+__all__ = ["VectorBackend", "VectorCollection", "SearchHit", "match_where", "create_backend"]
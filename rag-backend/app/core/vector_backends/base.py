@@ -0,0 +1,154 @@
+"""
+向量存储后端接口
+VectorStore负责嵌入、影子集合切换和线程调度，后端只负责按集合存取向量
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+
+def match_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """按ChromaDB的where语法匹配元数据"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_where(metadata, clause) for clause in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for op, expected in condition.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            elif op == "$contains":
+                ok = value is not None and expected in value
+            elif op == "$not_contains":
+                ok = value is None or expected not in value
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": value > expected,
+                    "$gte": value >= expected,
+                    "$lt": value < expected,
+                    "$lte": value <= expected
+                }[op]
+            else:
+                raise ValueError(f"不支持的过滤操作符: {op}")
+            if not ok:
+                return False
+    return True
+
+
+@dataclass
+class SearchHit:
+    """单条检索结果(similarity为余弦相似度，不含分块文本，由get_documents按需读取)"""
+    id: str
+    metadata: Dict[str, Any]
+    similarity: float
+
+
+class VectorCollection(ABC):
+    """单个集合"""
+
+    name: str
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """插入或覆盖分块"""
+
+    @abstractmethod
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """合并更新元数据(只覆盖给出的字段)"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """按ID删除分块"""
+
+    @abstractmethod
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[SearchHit]:
+        """按余弦相似度返回top-k，where使用ChromaDB的过滤语法，给出ids时只在这些分块中检索"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """分块数量"""
+
+    @abstractmethod
+    def get_embedding_signature(self) -> Optional[Dict[str, Any]]:
+        """集合记录的嵌入模型和维度，未记录时返回None"""
+
+    @abstractmethod
+    def set_embedding_signature(self, model: str, dimensions: int):
+        """记录嵌入模型和维度(0表示模型默认维度)"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """后端相关的索引统计"""
+        return {}
+
+    def partition_sizes(self, field: str) -> Optional[Dict[Any, int]]:
+        """各分区取值的分块数，后端不维护分区时返回None"""
+        return None
+
+    @abstractmethod
+    def scan(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """遍历所有分块的(ID, 文本, 元数据)，用于重建内存索引"""
+
+    @abstractmethod
+    def get_documents(self, ids: List[str]) -> Dict[str, str]:
+        """按ID读取分块文本(不存在的ID不出现在结果中)"""
+
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        """按给定ID顺序返回向量(float32矩阵)，用于导出快照"""
+
+
+class VectorBackend(ABC):
+    """向量存储后端"""
+
+    name: str
+
+    @abstractmethod
+    def get_collection(self, name: str) -> Optional[VectorCollection]:
+        """获取已存在的集合，不存在时返回None"""
+
+    @abstractmethod
+    def create_collection(self, name: str) -> VectorCollection:
+        """创建集合"""
+
+    @abstractmethod
+    def delete_collection(self, name: str):
+        """删除集合"""
+
+    @abstractmethod
+    def list_collections(self) -> List[str]:
+        """列出所有集合名称"""
+
+    def close(self):
+        """释放资源"""
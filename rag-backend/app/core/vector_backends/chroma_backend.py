@@ -0,0 +1,168 @@
+"""
+ChromaDB向量存储后端
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from app.core.vector_backends.base import VectorBackend, VectorCollection, SearchHit
+
+# 遍历集合时每页的分块数
+SCAN_PAGE_SIZE = 1000
+
+
+class ChromaCollection(VectorCollection):
+    """ChromaDB集合(向量由VectorStore提供，不配置嵌入函数)"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+        # 旧集合可能使用l2距离，统一换算为余弦相似度
+        configuration = getattr(collection, "configuration_json", None) or {}
+        space = (configuration.get("hnsw") or {}).get("space")
+        self.space = space or (collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _similarity(self, distance: float) -> float:
+        """距离转换为余弦相似度(向量已归一化)"""
+        if self.space == "l2":
+            # 归一化向量的平方欧氏距离 = 2 - 2cos
+            return 1.0 - distance / 2.0
+        return 1.0 - distance
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        self.collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[SearchHit]:
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            ids=ids,
+            n_results=n_results,
+            where=where,
+            include=["metadatas", "distances"]
+        )
+        if not results["ids"] or not results["ids"][0]:
+            return []
+
+        return [
+            SearchHit(
+                id=chunk_id,
+                metadata=metadata or {},
+                similarity=self._similarity(distance)
+            )
+            for chunk_id, metadata, distance in zip(
+                results["ids"][0],
+                results["metadatas"][0],
+                results["distances"][0]
+            )
+        ]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get_embedding_signature(self) -> Optional[Dict[str, Any]]:
+        metadata = self.collection.metadata or {}
+        if "embedding_model" not in metadata:
+            return None
+        return {
+            "embedding_model": metadata["embedding_model"],
+            "embedding_dimensions": int(metadata.get("embedding_dimensions", 0))
+        }
+
+    def set_embedding_signature(self, model: str, dimensions: int):
+        # modify会整体替换元数据，保留已有字段
+        self.collection.modify(metadata={
+            **(self.collection.metadata or {}),
+            "embedding_model": model,
+            "embedding_dimensions": dimensions
+        })
+
+    def scan(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas"],
+                limit=SCAN_PAGE_SIZE,
+                offset=offset
+            )
+            if not page["ids"]:
+                return
+            for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                yield chunk_id, document or "", metadata or {}
+            offset += len(page["ids"])
+
+    def get_documents(self, ids: List[str]) -> Dict[str, str]:
+        if not ids:
+            return {}
+        page = self.collection.get(ids=ids, include=["documents"])
+        return {chunk_id: document or "" for chunk_id, document in zip(page["ids"], page["documents"])}
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        if not ids:
+            return np.zeros((0, 0), dtype=np.float32)
+        page = self.collection.get(ids=ids, include=["embeddings"])
+        # get不保证按请求顺序返回
+        by_id = dict(zip(page["ids"], page["embeddings"]))
+        return np.asarray([by_id[chunk_id] for chunk_id in ids], dtype=np.float32)
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB持久化后端"""
+
+    name = "chroma"
+
+    def __init__(self, persist_dir: Path):
+        self.client = chromadb.PersistentClient(
+            path=str(persist_dir),
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+    def get_collection(self, name: str) -> Optional[ChromaCollection]:
+        try:
+            return ChromaCollection(self.client.get_collection(name=name, embedding_function=None))
+        except Exception:
+            return None
+
+    def create_collection(self, name: str) -> ChromaCollection:
+        return ChromaCollection(self.client.create_collection(
+            name=name,
+            embedding_function=None,
+            configuration={"hnsw": {"space": "cosine"}},
+            metadata={"description": "Personal knowledge base for RAG chatbot"}
+        ))
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
+
+    def list_collections(self) -> List[str]:
+        return [
+            item if isinstance(item, str) else item.name
+            for item in self.client.list_collections()
+        ]
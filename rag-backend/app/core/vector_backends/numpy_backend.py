@@ -0,0 +1,644 @@
+"""
+NumPy向量存储后端
+向量保存在内存映射的float32矩阵文件中(按行存放、已归一化)，ID/元数据保存在SQLite中并常驻内存；
+分块文本以zlib压缩后只存放在SQLite中，查询结果不含文本，由调用方按需读取最终结果的文本；
+默认精确检索(矩阵-向量乘积 + argpartition)，大语料可开启IVF近似检索；
+开启int8量化时内存中只保留量化副本，候选结果再从磁盘读取全精度向量重排
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from loguru import logger
+import json
+import shutil
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from app.config import settings
+from app.core.vector_backends.base import VectorBackend, VectorCollection, SearchHit, match_where
+
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "chunks.db"
+# 矩阵扩容时的最小行数
+MIN_CAPACITY = 256
+# 量化打分时每次反量化的行数(限制临时内存)
+QUANTIZED_BLOCK_ROWS = 8192
+# 建立位图分区的元数据字段: 单值字段支持$eq/$in，列表字段支持$contains
+PARTITION_FIELDS = ("content_type",)
+LIST_PARTITION_FIELDS = ("tags",)
+
+
+def _pack_text(text: str) -> bytes:
+    """压缩分块文本"""
+    return zlib.compress(text.encode("utf-8"))
+
+
+def _unpack_text(value) -> str:
+    """解压分块文本(旧版本写入的是未压缩的字符串)"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+class NumpyCollection(VectorCollection):
+    """
+    单个集合
+
+    写入新向量时只使用已提交为空闲的行，已提交的行在SQLite事务提交前不会被覆盖，
+    进程中途退出时矩阵文件与记录仍保持一致
+
+    写操作之间由写锁串行化；写入矩阵文件、提交SQLite和训练IVF都在写锁内完成，
+    只有把新行发布到内存映射(ID、位图、IVF列表)时才短暂持有查询使用的锁，写入期间查询不被阻塞
+    """
+
+    def __init__(self, directory: Path, quantization: Optional[str] = None):
+        self.directory = directory
+        self.name = directory.name
+        # 保护内存中的行映射、位图和IVF索引(查询期间持有)
+        self._lock = threading.RLock()
+        # 串行化写操作
+        self._write_lock = threading.Lock()
+        # 读取分块文本使用独立连接(WAL模式下不等待写事务)
+        self._read_lock = threading.Lock()
+        self.quantization = quantization or settings.NUMPY_QUANTIZATION
+        self.rerank_factor = max(1, settings.NUMPY_RERANK_FACTOR)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(directory / RECORDS_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                slot INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._read_conn = sqlite3.connect(str(directory / RECORDS_FILE), check_same_thread=False)
+
+        self.dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._capacity = 0
+        # 行号 → ID(空闲行为None)，以及ID → 行号
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # int8量化副本及每行的缩放系数(常驻内存)，全精度向量只在重排时从磁盘读取
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        # 已提交的空闲行，可以安全复用
+        self._free: List[int] = []
+        # 分区位图: 字段 → {取值: 行掩码}，按content_type/tags过滤时不必逐条匹配元数据
+        self._partitions: Dict[str, Dict[Any, np.ndarray]] = {
+            field: {} for field in PARTITION_FIELDS + LIST_PARTITION_FIELDS
+        }
+
+        # IVF近似索引(内存中，按需训练)
+        self._ivf_centroids: Optional[np.ndarray] = None
+        self._ivf_lists: List[List[int]] = []
+        self._ivf_trained_count = 0
+
+        self._load()
+
+    def _load(self):
+        """加载记录并映射向量文件"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row is None:
+            return
+
+        self.dim = int(row[0])
+        self._open_matrix()
+        self._resize_codes()
+
+        self._ids = [None] * self._capacity
+        for slot, chunk_id, metadata in self._conn.execute(
+            "SELECT slot, id, metadata FROM chunks"
+        ):
+            if slot >= self._capacity:
+                logger.warning(f"向量文件缺少第 {slot} 行，忽略分块: {chunk_id}")
+                continue
+            self._ids[slot] = chunk_id
+            self._slots[chunk_id] = slot
+            self._metadatas[chunk_id] = json.loads(metadata)
+
+        self._alive = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+        self._free = [slot for slot in range(self._capacity - 1, -1, -1) if self._ids[slot] is None]
+        for chunk_id, slot in self._slots.items():
+            self._index_partitions(slot, self._metadatas[chunk_id])
+        if self._codes is not None:
+            alive = np.flatnonzero(self._alive)
+            for start in range(0, alive.size, QUANTIZED_BLOCK_ROWS):
+                block = alive[start:start + QUANTIZED_BLOCK_ROWS]
+                self._codes[block], self._scales[block] = self._quantize(np.asarray(self._matrix[block]))
+        self._maybe_train_ivf()
+
+    def _open_matrix(self):
+        """内存映射向量文件"""
+        path = self.directory / VECTORS_FILE
+        row_bytes = self.dim * 4
+        size = path.stat().st_size if path.exists() else 0
+        self._capacity = size // row_bytes
+        self._matrix = (
+            np.memmap(path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+            if self._capacity else None
+        )
+
+    def _grow(self, needed: int):
+        """扩容矩阵文件(只追加，不移动已有的行)"""
+        capacity = max(MIN_CAPACITY, self._capacity * 2)
+        while capacity < needed:
+            capacity *= 2
+
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+
+        path = self.directory / VECTORS_FILE
+        with open(path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+
+        old_capacity = self._capacity
+        self._open_matrix()
+        self._resize_codes()
+        self._ids.extend([None] * (self._capacity - old_capacity))
+        self._alive = np.concatenate([self._alive, np.zeros(self._capacity - old_capacity, dtype=bool)])
+        for bitmaps in self._partitions.values():
+            for value, bitmap in bitmaps.items():
+                bitmaps[value] = np.concatenate([bitmap, np.zeros(self._capacity - old_capacity, dtype=bool)])
+        self._free.extend(range(self._capacity - 1, old_capacity - 1, -1))
+
+    def _resize_codes(self):
+        """按矩阵容量分配(或扩展)量化副本"""
+        if self.quantization != "int8" or self.dim is None:
+            return
+        codes = np.zeros((self._capacity, self.dim), dtype=np.int8)
+        scales = np.zeros(self._capacity, dtype=np.float32)
+        if self._codes is not None:
+            codes[:len(self._codes)] = self._codes
+            scales[:len(self._scales)] = self._scales
+        self._codes, self._scales = codes, scales
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """对称int8量化，每行一个缩放系数"""
+        scales = np.abs(vectors).max(axis=-1) / 127.0
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def _approx_scores(self, slots: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """用量化副本计算近似得分(分块反量化)"""
+        scores = np.empty(slots.size, dtype=np.float32)
+        for start in range(0, slots.size, QUANTIZED_BLOCK_ROWS):
+            block = slots[start:start + QUANTIZED_BLOCK_ROWS]
+            scores[start:start + block.size] = (self._codes[block].astype(np.float32) @ query) * self._scales[block]
+        return scores
+
+    @staticmethod
+    def _partition_values(field: str, metadata: Dict[str, Any]) -> List[Any]:
+        """元数据中参与分区的取值"""
+        value = metadata.get(field)
+        if value is None:
+            return []
+        if field in LIST_PARTITION_FIELDS:
+            return list(value) if isinstance(value, (list, tuple)) else []
+        return [value] if not isinstance(value, (list, tuple, dict)) else []
+
+    def partition_sizes(self, field: str) -> Optional[Dict[Any, int]]:
+        """按分区位图统计各取值的分块数(位图只标记有效行)"""
+        bitmaps = self._partitions.get(field)
+        if bitmaps is None:
+            return None
+        with self._lock:
+            sizes = {value: int(np.count_nonzero(bitmap)) for value, bitmap in bitmaps.items()}
+        return {value: size for value, size in sizes.items() if size}
+
+    def _index_partitions(self, slot: int, metadata: Dict[str, Any]):
+        """把行加入分区位图"""
+        for field, bitmaps in self._partitions.items():
+            for value in self._partition_values(field, metadata):
+                bitmap = bitmaps.get(value)
+                if bitmap is None:
+                    bitmap = bitmaps[value] = np.zeros(self._capacity, dtype=bool)
+                bitmap[slot] = True
+
+    def _unindex_partitions(self, slot: int, metadata: Dict[str, Any]):
+        """把行移出分区位图"""
+        for field, bitmaps in self._partitions.items():
+            for value in self._partition_values(field, metadata):
+                bitmap = bitmaps.get(value)
+                if bitmap is not None:
+                    bitmap[slot] = False
+
+    def _where_mask(self, where: Dict[str, Any]) -> Optional[np.ndarray]:
+        """用分区位图计算过滤条件，包含位图无法表达的条件时返回None"""
+        masks = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                clauses = [self._where_mask(clause) for clause in condition]
+                if not clauses or any(mask is None for mask in clauses):
+                    return None
+                reduce = np.logical_and.reduce if key == "$and" else np.logical_or.reduce
+                masks.append(reduce(clauses))
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if key in PARTITION_FIELDS and op == "$eq":
+                    values = [expected]
+                elif key in PARTITION_FIELDS and op == "$in":
+                    values = list(expected)
+                elif key in LIST_PARTITION_FIELDS and op == "$contains":
+                    values = [expected]
+                else:
+                    return None
+
+                mask = np.zeros(self._capacity, dtype=bool)
+                for value in values:
+                    bitmap = self._partitions[key].get(value)
+                    if bitmap is not None:
+                        mask |= bitmap
+                masks.append(mask)
+
+        return np.logical_and.reduce(masks) if masks else None
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2归一化，使点积等于余弦相似度"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        if not ids:
+            return
+
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        # 同一批中重复的ID以最后一次为准
+        latest = list({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+
+        with self._write_lock:
+            with self._lock:
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),)
+                    )
+                elif vectors.shape[1] != self.dim:
+                    raise ValueError(f"向量维度不匹配: 集合为{self.dim}维，写入{vectors.shape[1]}维")
+
+                if len(self._free) < len(latest):
+                    self._grow(self._capacity - len(self._free) + len(latest))
+
+            # 新向量写入空闲行，查询只访问有效行，发布前不会读到这些行
+            slots = [self._free.pop() for _ in latest]
+            self._matrix[slots] = vectors[latest]
+            if self._codes is not None:
+                self._codes[slots], self._scales[slots] = self._quantize(vectors[latest])
+
+            rows = [
+                (slot, ids[i], _pack_text(documents[i]), json.dumps(metadatas[i], ensure_ascii=False))
+                for slot, i in zip(slots, latest)
+            ]
+            self._matrix.flush()
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(row[1],) for row in rows])
+            self._conn.executemany("INSERT INTO chunks (slot, id, document, metadata) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+            # 提交后发布新行，覆盖写入的旧行此时才能复用
+            released = []
+            with self._lock:
+                for slot, i in zip(slots, latest):
+                    chunk_id = ids[i]
+                    old_slot = self._slots.get(chunk_id)
+                    if old_slot is not None:
+                        self._ids[old_slot] = None
+                        self._alive[old_slot] = False
+                        self._unindex_partitions(old_slot, self._metadatas[chunk_id])
+                        released.append(old_slot)
+
+                    self._ids[slot] = chunk_id
+                    self._slots[chunk_id] = slot
+                    self._alive[slot] = True
+                    self._metadatas[chunk_id] = dict(metadatas[i])
+                    self._index_partitions(slot, metadatas[i])
+
+                self._ivf_add(slots)
+            self._free.extend(released)
+
+            self._maybe_train_ivf()
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._write_lock:
+            rows = []
+            with self._lock:
+                for chunk_id, metadata in zip(ids, metadatas):
+                    current = self._metadatas.get(chunk_id)
+                    if current is None:
+                        logger.warning(f"更新元数据时分块不存在: {chunk_id}")
+                        continue
+                    slot = self._slots[chunk_id]
+                    self._unindex_partitions(slot, current)
+                    for key, value in metadata.items():
+                        if value is None:
+                            current.pop(key, None)
+                        else:
+                            current[key] = value
+                    self._index_partitions(slot, current)
+                    rows.append((json.dumps(current, ensure_ascii=False), chunk_id))
+
+            self._conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", rows)
+            self._conn.commit()
+
+    def delete(self, ids: List[str]):
+        with self._write_lock:
+            released = []
+            with self._lock:
+                for chunk_id in ids:
+                    slot = self._slots.pop(chunk_id, None)
+                    if slot is None:
+                        continue
+                    self._ids[slot] = None
+                    self._alive[slot] = False
+                    self._unindex_partitions(slot, self._metadatas[chunk_id])
+                    self._metadatas.pop(chunk_id, None)
+                    released.append(slot)
+
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+            self._conn.commit()
+            self._free.extend(released)
+
+    def _candidate_slots(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """满足过滤条件的行号"""
+        if not where:
+            return np.flatnonzero(self._alive)
+        mask = self._where_mask(where)
+        if mask is not None:
+            return np.flatnonzero(mask & self._alive)
+        return np.array(
+            [slot for chunk_id, slot in self._slots.items() if match_where(self._metadatas[chunk_id], where)],
+            dtype=np.int64
+        )
+
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[SearchHit]:
+        with self._lock:
+            if not self._slots:
+                return []
+
+            query = self._normalize(np.asarray(embedding, dtype=np.float32))
+            if query.shape[0] != self.dim:
+                raise ValueError(f"查询向量维度不匹配: 集合为{self.dim}维，查询{query.shape[0]}维")
+
+            if ids is not None:
+                # 限定分块时直接精确检索这些行
+                slots = np.unique(np.array([self._slots[c] for c in ids if c in self._slots], dtype=np.int64))
+                if where:
+                    slots = np.intersect1d(slots, self._candidate_slots(where), assume_unique=True)
+            elif self._ivf_centroids is not None:
+                slots = self._ivf_probe(query)
+                if where:
+                    slots = np.intersect1d(slots, self._candidate_slots(where), assume_unique=True)
+            else:
+                slots = self._candidate_slots(where)
+
+            if slots.size == 0:
+                return []
+
+            k = min(n_results, slots.size)
+            if self._codes is not None:
+                # 先用量化副本粗排，再按行号顺序读取候选的全精度向量重排
+                approx = self._approx_scores(slots, query)
+                n_candidates = min(slots.size, k * self.rerank_factor)
+                candidates = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+                slots = np.sort(slots[candidates])
+                scores = self._matrix[slots] @ query
+            elif slots.size == self._capacity:
+                scores = self._matrix @ query
+            else:
+                scores = self._matrix[slots] @ query
+
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            hits = []
+            for i in top:
+                chunk_id = self._ids[slots[i]]
+                hits.append(SearchHit(
+                    id=chunk_id,
+                    metadata=dict(self._metadatas[chunk_id]),
+                    similarity=float(scores[i])
+                ))
+            return hits
+
+    def count(self) -> int:
+        return len(self._slots)
+
+    def get_embedding_signature(self) -> Optional[Dict[str, Any]]:
+        with self._read_lock:
+            rows = dict(self._read_conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('embedding_model', 'embedding_dimensions')"
+            ).fetchall())
+        if "embedding_model" not in rows:
+            return None
+        return {
+            "embedding_model": rows["embedding_model"],
+            "embedding_dimensions": int(rows.get("embedding_dimensions", 0))
+        }
+
+    def set_embedding_signature(self, model: str, dimensions: int):
+        with self._write_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("embedding_model", model), ("embedding_dimensions", str(dimensions))]
+            )
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        # 未量化时每次查询都要扫描整个矩阵，常驻内存按矩阵大小计
+        full_bytes = self._capacity * (self.dim or 0) * 4
+        resident_bytes = self._codes.nbytes + self._scales.nbytes if self._codes is not None else full_bytes
+        return {
+            "quantization": self.quantization,
+            "dimensions": self.dim,
+            "capacity": self._capacity,
+            "ivf_trained": self._ivf_centroids is not None,
+            "resident_vector_mb": round(resident_bytes / (1024 * 1024), 2),
+            "full_precision_mb": round(full_bytes / (1024 * 1024), 2)
+        }
+
+    def scan(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        with self._lock:
+            metadatas = {chunk_id: dict(metadata) for chunk_id, metadata in self._metadatas.items()}
+        with self._read_lock:
+            rows = self._read_conn.execute("SELECT id, document FROM chunks ORDER BY slot").fetchall()
+        records = [
+            (chunk_id, _unpack_text(document), metadatas[chunk_id])
+            for chunk_id, document in rows
+            if chunk_id in metadatas
+        ]
+        return iter(records)
+
+    def get_documents(self, ids: List[str]) -> Dict[str, str]:
+        if not ids:
+            return {}
+        with self._read_lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self._read_conn.execute(
+                f"SELECT id, document FROM chunks WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {chunk_id: _unpack_text(document) for chunk_id, document in rows}
+
+    def get_embeddings(self, ids: List[str]) -> np.ndarray:
+        with self._lock:
+            slots = [self._slots[chunk_id] for chunk_id in ids]
+            if not slots:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            return np.asarray(self._matrix[slots], dtype=np.float32)
+
+    def _maybe_train_ivf(self):
+        """语料足够大时训练(或在规模翻倍后重新训练)IVF索引"""
+        if settings.NUMPY_INDEX_MODE != "ivf":
+            return
+
+        count = len(self._slots)
+        if count < settings.NUMPY_IVF_MIN_VECTORS:
+            with self._lock:
+                self._ivf_centroids = None
+            return
+        if self._ivf_centroids is not None and count < self._ivf_trained_count * 2:
+            return
+
+        # 在写锁内训练(期间没有其他写入)，查询继续使用旧索引，训练完成后再替换
+        with self._lock:
+            slots = np.flatnonzero(self._alive)
+        nlist = settings.NUMPY_IVF_NLIST or int(np.sqrt(count))
+        nlist = max(1, min(nlist, count))
+
+        # 球面k-means(在采样上训练)
+        rng = np.random.default_rng(0)
+        sample = slots if slots.size <= nlist * 64 else rng.choice(slots, nlist * 64, replace=False)
+        data = np.asarray(self._matrix[np.sort(sample)])
+        centroids = data[rng.choice(len(data), nlist, replace=False)]
+        for _ in range(10):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assignment == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+
+        lists: List[List[int]] = [[] for _ in range(nlist)]
+        for start in range(0, slots.size, QUANTIZED_BLOCK_ROWS):
+            block = slots[start:start + QUANTIZED_BLOCK_ROWS]
+            assignment = np.argmax(np.asarray(self._matrix[block]) @ centroids.T, axis=1)
+            for slot, c in zip(block.tolist(), assignment):
+                lists[c].append(slot)
+
+        with self._lock:
+            self._ivf_centroids = centroids
+            self._ivf_lists = lists
+            self._ivf_trained_count = count
+        logger.info(f"已训练IVF索引: {self.name} ({count} 个向量, {nlist} 个列表)")
+
+    def _ivf_add(self, slots: List[int]):
+        """把新写入的行分配到最近的IVF列表"""
+        if self._ivf_centroids is None or not slots:
+            return
+        vectors = np.asarray(self._matrix[slots])
+        assignment = np.argmax(vectors @ self._ivf_centroids.T, axis=1)
+        for slot, c in zip(slots, assignment):
+            self._ivf_lists[c].append(slot)
+
+    def _ivf_probe(self, query: np.ndarray) -> np.ndarray:
+        """查询最近的nprobe个列表中仍然有效的行"""
+        nprobe = max(1, min(settings.NUMPY_IVF_NPROBE, len(self._ivf_lists)))
+        nearest = np.argpartition(-(self._ivf_centroids @ query), nprobe - 1)[:nprobe]
+        slots = np.unique(np.concatenate([
+            np.asarray(self._ivf_lists[c], dtype=np.int64) for c in nearest
+        ]))
+        # 行被删除或复用后旧的分配会失效，按当前有效性过滤
+        return slots[self._alive[slots]] if slots.size else slots
+
+    def close(self):
+        """关闭记录库并释放内存映射"""
+        with self._write_lock, self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._conn.close()
+            with self._read_lock:
+                self._read_conn.close()
+
+
+class NumpyBackend(VectorBackend):
+    """基于内存映射矩阵的轻量后端"""
+
+    name = "numpy"
+
+    def __init__(self, persist_dir: Path):
+        self.root = persist_dir / "numpy"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(self, name: str) -> Optional[NumpyCollection]:
+        with self._lock:
+            if name in self._collections:
+                return self._collections[name]
+            directory = self.root / name
+            if not (directory / RECORDS_FILE).exists():
+                return None
+            collection = NumpyCollection(directory)
+            self._collections[name] = collection
+            return collection
+
+    def create_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            directory = self.root / name
+            if (directory / RECORDS_FILE).exists():
+                raise ValueError(f"集合已存在: {name}")
+            collection = NumpyCollection(directory)
+            self._collections[name] = collection
+            return collection
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            directory = self.root / name
+            if not directory.exists():
+                raise ValueError(f"集合不存在: {name}")
+            shutil.rmtree(directory)
+
+    def list_collections(self) -> List[str]:
+        return sorted(
+            path.name for path in self.root.iterdir()
+            if (path / RECORDS_FILE).exists()
+        )
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections = {}
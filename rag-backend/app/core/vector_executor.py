@@ -0,0 +1,178 @@
+"""
+向量存储专用线程池
+后端的同步调用不再占用默认线程池：读(检索/统计)和写(写入/删除/建集合)分为两条独立的通道，
+摄取高峰只会占满写通道，不会让检索排队；每条通道记录排队等待和执行耗时的直方图
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, TypeVar
+import asyncio
+import bisect
+import functools
+import threading
+import time
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# 直方图桶上界(毫秒)
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    """固定桶的耗时直方图(线程安全)"""
+
+    def __init__(self, buckets_ms: List[float] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        # 最后一个桶记录超过最大上界的样本
+        self._counts = [0] * (len(buckets_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """记录一个样本"""
+        ms = seconds * 1000
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self._count += 1
+            self._sum_ms += ms
+            self._max_ms = max(self._max_ms, ms)
+
+    def _quantile(self, q: float) -> float:
+        """按桶上界估算分位数"""
+        if not self._count:
+            return 0.0
+        target = q * self._count
+        cumulative = 0
+        for i, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self._max_ms
+        return self._max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出直方图(各桶为非累计计数)"""
+        with self._lock:
+            labels = [f"le_{bound}ms" for bound in self.buckets_ms] + ["inf"]
+            return {
+                "count": self._count,
+                "avg_ms": round(self._sum_ms / self._count, 3) if self._count else 0.0,
+                "p50_ms": self._quantile(0.5),
+                "p95_ms": self._quantile(0.95),
+                "p99_ms": self._quantile(0.99),
+                "max_ms": round(self._max_ms, 3),
+                "buckets": dict(zip(labels, self._counts))
+            }
+
+
+class ExecutorLane:
+    """固定大小的线程池通道"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix=f"vector-{name}"
+        )
+        self.queue_wait = LatencyHistogram()
+        self.run_time = LatencyHistogram()
+        self._queued = 0
+        self._active = 0
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def _call(self, submitted_at: float, fn: Callable[..., T]) -> T:
+        """在工作线程中执行并记录耗时"""
+        started = time.perf_counter()
+        self.queue_wait.observe(started - submitted_at)
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return fn()
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            self.run_time.observe(time.perf_counter() - started)
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在通道中执行同步函数"""
+        with self._lock:
+            self._queued += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            self._call,
+            time.perf_counter(),
+            functools.partial(fn, *args, **kwargs)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取通道统计"""
+        with self._lock:
+            stats = {
+                "workers": self.workers,
+                "queued": self._queued,
+                "active": self._active,
+                "errors": self._errors
+            }
+        stats["queue_wait"] = self.queue_wait.snapshot()
+        stats["run_time"] = self.run_time.snapshot()
+        return stats
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
+
+
+class VectorExecutor:
+    """向量存储读写通道"""
+
+    def __init__(self, read_workers: int, write_workers: int):
+        self.read = ExecutorLane("read", read_workers)
+        self.write = ExecutorLane("write", write_workers)
+
+    async def run_read(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在读通道执行(检索、计数、遍历)"""
+        return await self.read.run(fn, *args, **kwargs)
+
+    async def run_write(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在写通道执行(写入、删除、创建/删除集合)"""
+        return await self.write.run(fn, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各通道统计"""
+        return {"read": self.read.get_stats(), "write": self.write.get_stats()}
+
+    def shutdown(self):
+        """关闭所有通道"""
+        self.read.shutdown()
+        self.write.shutdown()
+
+
+# 全局向量存储线程池实例
+vector_executor_instance = None
+
+def get_vector_executor() -> VectorExecutor:
+    """获取向量存储线程池实例"""
+    global vector_executor_instance
+    if vector_executor_instance is None:
+        vector_executor_instance = VectorExecutor(
+            read_workers=settings.VECTOR_READ_WORKERS,
+            write_workers=settings.VECTOR_WRITE_WORKERS
+        )
+    return vector_executor_instance
+
+def shutdown_vector_executor():
+    """关闭向量存储线程池(应用退出时调用)"""
+    global vector_executor_instance
+    if vector_executor_instance is not None:
+        vector_executor_instance.shutdown()
+        vector_executor_instance = None
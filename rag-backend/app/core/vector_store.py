@@ -1,31 +1,113 @@
 """
-ChromaDB向量数据库封装
-处理文档向量化存储和检索
+向量数据库封装
+处理文档向量化存储和检索，具体存储由vector_backends中的后端实现(NumPy或ChromaDB)
 """
 
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from contextlib import asynccontextmanager
+from collections import defaultdict
 from loguru import logger
 import asyncio
+import json
+import os
+import time
 from datetime import datetime
 
+import numpy as np
+
 from app.config import settings
 from app.models import RetrievalResult, VectorStoreStats
+from app.core.embedding_cache import get_embedding_cache
+from app.core.embedding_batcher import get_embedding_batcher
+from app.core.query_embedding_cache import get_query_embedding_cache
+from app.core.openai_client import get_openai_client
+from app.core.embedding_providers import EmbeddingProvider, create_provider_for_signature
+from app.core.embedding_migration import EmbeddingMigration, MigrationCheckpoint
+from app.core.index_manifest import IndexManifest
+from app.core.index_snapshot import (
+    SnapshotInfo, export_snapshot, read_snapshot_info, iter_snapshot_batches, load_snapshot_manifest
+)
+from app.core.lexical_index import LexicalIndex, LexicalHit
+from app.core.document_index import DocumentIndex, centroid
+from app.core.vector_executor import get_vector_executor
+from app.core.result_diversifier import get_result_diversifier
+from app.core.vector_backends import VectorBackend, VectorCollection, SearchHit, create_backend
+
+# 影子集合名称分隔符: personal_knowledge__20250809103000123456
+SHADOW_SEPARATOR = "__"
+# 混合检索时每路召回的候选数(相对于n_results的倍数)
+HYBRID_CANDIDATE_FACTOR = 2
+# 导入快照时每批写入的分块数
+SNAPSHOT_IMPORT_BATCH_SIZE = 2048
 
 class VectorStore:
     """向量数据库管理器"""
     
-    def __init__(self):
-        self.client = None
-        self.collection = None
-        self.embedding_function = None
+    def __init__(self, collection_name: Optional[str] = None):
+        self.backend: Optional[VectorBackend] = None
+        self.collection: Optional[VectorCollection] = None
         self._initialized = False
+        # 为None时从活动集合指针文件解析
+        self._collection_name = collection_name
+        # 各集合正在进行的读操作数，旧集合在读操作结束后才会被回收
+        self._readers: Dict[str, int] = defaultdict(int)
+        # 写入计数，每次写入或切换集合后递增
+        self._write_generation = 0
+        # 与集合同步的BM25索引(内存中，启动时从集合重建)
+        self.lexical_index = LexicalIndex()
+        # 文件级质心索引(两阶段检索，启动时按索引清单重建)
+        self.document_index = DocumentIndex()
+        # 集合记录的嵌入模型/维度与当前配置不一致，需要全量重建
+        self.needs_rebuild = False
+        # 迁移期间用集合记录的旧模型生成查询向量(无法重建旧模型时为None，只走词法检索)
+        self._legacy_provider: Optional[EmbeddingProvider] = None
+        # 正在进行的嵌入模型迁移
+        self.migration: Optional[EmbeddingMigration] = None
+        # 最近一次BM25召回 (查询, 候选数, 过滤条件, 索引版本) → 结果，检索前的快速路径判断与随后的检索共用
+        self._last_lexical: Optional[Tuple[tuple, List[LexicalHit]]] = None
+        # 字段 → (索引版本, 各分区分块数)
+        self._partition_sizes: Dict[str, Tuple[str, Dict[Any, int]]] = {}
+    
+    @property
+    def collection_name(self) -> str:
+        """当前使用的集合名称"""
+        return self._collection_name or settings.CHROMA_COLLECTION_NAME
+    
+    @property
+    def index_version(self) -> str:
+        """索引版本(集合名称+写入计数)，内容变化后即不同，用于使依赖检索结果的缓存失效"""
+        return f"{self.collection_name}:{self._write_generation}"
+    
+    @staticmethod
+    def _active_pointer_path() -> Path:
+        """活动集合指针文件路径"""
+        return Path(settings.CHROMA_PERSIST_DIRECTORY) / "active_collection.json"
+    
+    def _read_active_pointer(self) -> str:
+        """读取活动集合名称"""
+        pointer_path = self._active_pointer_path()
+        if pointer_path.exists():
+            try:
+                with open(pointer_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)["collection"]
+            except Exception as e:
+                logger.warning(f"读取活动集合指针失败，使用默认集合: {e}")
+        return settings.CHROMA_COLLECTION_NAME
+    
+    def _write_active_pointer(self, collection_name: str):
+        """原子写入活动集合名称"""
+        pointer_path = self._active_pointer_path()
+        tmp_path = pointer_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "collection": collection_name,
+                "updated_at": datetime.now().isoformat()
+            }, f)
+        os.replace(tmp_path, pointer_path)
     
     async def initialize(self):
-        """初始化ChromaDB客户端和集合"""
+        """初始化存储后端和集合"""
         if self._initialized:
             return
         
@@ -34,109 +116,542 @@ class VectorStore:
             persist_dir = Path(settings.CHROMA_PERSIST_DIRECTORY)
             persist_dir.mkdir(parents=True, exist_ok=True)
             
-            # 初始化ChromaDB客户端 - 使用官方推荐的简化配置
-            self.client = chromadb.PersistentClient(
-                path=str(persist_dir),
-                settings=Settings(anonymized_telemetry=False)
-            )
+            self.backend = create_backend(persist_dir)
+            
+            # 获取或创建集合
+            if self._collection_name is None:
+                self._collection_name = self._read_active_pointer()
             
-            # 配置OpenAI嵌入函数
-            self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-                api_key=settings.OPENAI_API_KEY,
-                model_name=settings.OPENAI_EMBEDDING_MODEL
+            self.collection = self.backend.get_collection(self.collection_name)
+            if self.collection is not None:
+                logger.info(f"已加载现有集合: {self.collection_name}")
+                self._check_embedding_signature()
+            else:
+                self.collection = self.backend.create_collection(self.collection_name)
+                self._record_embedding_signature(self.collection)
+                # 集合是新建的(如切换了后端)，旧的索引清单已失效，下次同步时全量写入
+                IndexManifest.for_collection(self.collection_name).delete()
+                logger.info(f"已创建新集合: {self.collection_name}")
+            
+            if settings.INDEX_SNAPSHOT_PATH and self.collection.count() == 0:
+                await self._load_startup_snapshot(Path(settings.INDEX_SNAPSHOT_PATH))
+            
+            await self._build_lexical_index()
+            await self._build_document_index()
+            
+            self._initialized = True
+            
+            # 清理上次重建中断遗留的影子集合(仅在指针文件存在、能确定活动集合时)
+            if self._active_pointer_path().exists():
+                await self._drop_orphan_shadows()
+            logger.info(f"向量数据库初始化完成 (backend={self.backend.name})")
+            
+        except Exception as e:
+            logger.error(f"向量数据库初始化失败: {e}")
+            raise
+    
+    @staticmethod
+    def _expected_signature() -> Dict[str, Any]:
+        """当前嵌入提供方的模型和维度(0表示模型默认维度)"""
+        openai_client = get_openai_client()
+        return {
+            "embedding_model": openai_client.embedding_model,
+            "embedding_dimensions": openai_client.embedding_dimensions or 0
+        }
+    
+    def _record_embedding_signature(self, collection: VectorCollection):
+        """在集合上记录当前的嵌入模型和维度"""
+        signature = self._expected_signature()
+        collection.set_embedding_signature(signature["embedding_model"], signature["embedding_dimensions"])
+    
+    def _check_embedding_signature(self):
+        """
+        检查集合的嵌入模型/维度是否与配置一致
+        
+        不一致时向量检索暂停(只走词法检索)，由下一次同步触发全量重建
+        """
+        expected = self._expected_signature()
+        recorded = self.collection.get_embedding_signature()
+        if recorded is None:
+            # 旧版本创建的集合没有记录，按当时的默认维度处理
+            recorded = {**expected, "embedding_dimensions": 0} if self.collection.count() else expected
+            self.collection.set_embedding_signature(recorded["embedding_model"], recorded["embedding_dimensions"])
+        
+        self.needs_rebuild = recorded != expected
+        if self.needs_rebuild:
+            logger.warning(
+                f"集合 {self.collection_name} 的嵌入配置与当前配置不一致，需要重建索引: "
+                f"{recorded} -> {expected}"
             )
+            if settings.EMBEDDING_MIGRATION_ENABLED:
+                self._legacy_provider = create_provider_for_signature(
+                    get_openai_client().client, recorded["embedding_model"], recorded["embedding_dimensions"]
+                )
+                if self._legacy_provider is None:
+                    logger.warning(f"无法加载旧嵌入模型 {recorded['embedding_model']}，迁移期间只使用词法检索")
+    
+    async def _build_lexical_index(self):
+        """从当前集合重建BM25索引"""
+        collection = self.collection
+        await get_vector_executor().run_read(
+            lambda: self.lexical_index.build(collection.scan())
+        )
+        logger.info(f"BM25索引已重建: {len(self.lexical_index)} 个分块")
+    
+    def _document_entry(self, collection: VectorCollection, file_path: str, chunk_ids: List[str]) -> tuple:
+        """计算文件的质心(同步调用，只使用集合中已存在的分块)"""
+        present = [chunk_id for chunk_id in chunk_ids if chunk_id in self.lexical_index]
+        return file_path, centroid(collection.get_embeddings(present)), chunk_ids
+    
+    async def _build_document_index(self):
+        """按索引清单重建文件级质心索引"""
+        collection = self.collection
+        manifest = IndexManifest.for_collection(self.collection_name)
+        entries = await get_vector_executor().run_read(
+            lambda: [
+                self._document_entry(collection, file_path, record.chunk_ids)
+                for file_path, record in manifest.files.items()
+            ]
+        )
+        self.document_index.build(entries)
+        logger.info(f"文件质心索引已重建: {len(self.document_index)} 个文件")
+    
+    async def index_document(self, file_path: str, chunk_ids: List[str]):
+        """写入文件的分块后更新该文件的质心(由摄取流水线调用)"""
+        if not self._initialized:
+            await self.initialize()
+        
+        entry = await get_vector_executor().run_read(self._document_entry, self.collection, file_path, chunk_ids)
+        self.document_index.set(*entry)
+    
+    def remove_document(self, file_path: str):
+        """移除文件的质心"""
+        self.document_index.remove(file_path)
+    
+    @asynccontextmanager
+    async def _read_collection(self):
+        """
+        获取当前集合用于读操作
+        
+        读操作全程持有开始时的集合引用，期间发生切换也不受影响；
+        旧集合要等所有读操作结束后才会被删除
+        """
+        name, collection = self.collection_name, self.collection
+        self._readers[name] += 1
+        try:
+            yield collection
+        finally:
+            self._readers[name] -= 1
+    
+    async def create_shadow(self) -> "VectorStore":
+        """
+        创建影子集合(用于零停机重建)
+        
+        返回绑定到影子集合的VectorStore，写入影子集合期间当前集合继续提供检索
+        """
+        if not self._initialized:
+            await self.initialize()
+        return await self._new_shadow()
+    
+    async def _new_shadow(self) -> "VectorStore":
+        """在当前后端上新建影子集合"""
+        name = f"{settings.CHROMA_COLLECTION_NAME}{SHADOW_SEPARATOR}{datetime.now():%Y%m%d%H%M%S%f}"
+        
+        shadow = VectorStore(collection_name=name)
+        shadow.backend = self.backend
+        shadow.collection = await get_vector_executor().run_write(
+            self.backend.create_collection,
+            name
+        )
+        shadow._record_embedding_signature(shadow.collection)
+        shadow._initialized = True
+        
+        logger.info(f"已创建影子集合: {name}")
+        return shadow
+    
+    async def open_shadow(self, name: str) -> Optional["VectorStore"]:
+        """打开已存在的影子集合(用于继续中断的迁移)，不存在时返回None"""
+        if not self._initialized:
+            await self.initialize()
+        
+        collection = await get_vector_executor().run_read(self.backend.get_collection, name)
+        if collection is None:
+            return None
+        
+        shadow = VectorStore(collection_name=name)
+        shadow.backend = self.backend
+        shadow.collection = collection
+        await shadow._build_lexical_index()
+        shadow._initialized = True
+        
+        logger.info(f"已打开影子集合: {name}")
+        return shadow
+    
+    async def swap_collection(self, shadow: "VectorStore"):
+        """
+        原子切换到影子集合，并在旧集合的读操作结束后回收旧集合
+        """
+        old_name = self.collection_name
+        
+        # 持久化指针后再切换，两次赋值之间没有await，查询不会看到中间状态
+        self._write_active_pointer(shadow.collection_name)
+        self.collection = shadow.collection
+        self._collection_name = shadow.collection_name
+        self.lexical_index = shadow.lexical_index
+        self.document_index = shadow.document_index
+        self.needs_rebuild = shadow.needs_rebuild
+        self._legacy_provider = shadow._legacy_provider
+        self._write_generation += 1
+        
+        logger.info(f"已切换活动集合: {old_name} -> {self.collection_name}")
+        
+        if old_name != self.collection_name:
+            await self._drop_when_idle(old_name)
+    
+    async def drop_collection(self, name: str):
+        """删除指定集合及其索引清单(不能删除当前集合)"""
+        if name == self.collection_name:
+            raise ValueError(f"不能删除当前活动集合: {name}")
+        
+        try:
+            await get_vector_executor().run_write(
+                self.backend.delete_collection,
+                name
+            )
+            IndexManifest.for_collection(name).delete()
+            self._readers.pop(name, None)
+            logger.info(f"已回收集合: {name}")
+        except Exception as e:
+            logger.error(f"回收集合失败 {name}: {e}")
+    
+    async def _drop_when_idle(self, name: str, timeout: float = 60.0):
+        """等待集合上的读操作结束后删除集合"""
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while self._readers.get(name, 0) > 0:
+            if loop.time() > deadline:
+                logger.warning(f"等待集合 {name} 读操作结束超时，强制回收")
+                break
+            await asyncio.sleep(0.05)
+        
+        await self.drop_collection(name)
+    
+    async def _drop_orphan_shadows(self):
+        """删除不再使用的影子集合和旧的基础集合(保留未完成迁移的影子集合)"""
+        try:
+            keep = {self.collection_name}
+            checkpoint = MigrationCheckpoint.load() if settings.EMBEDDING_MIGRATION_ENABLED else None
+            if checkpoint is not None:
+                keep.add(checkpoint.shadow_collection)
             
-            # 获取或创建集合
-            try:
-                self.collection = self.client.get_collection(
-                    name=settings.CHROMA_COLLECTION_NAME,
-                    embedding_function=self.embedding_function
+            names = await get_vector_executor().run_read(
+                self.backend.list_collections
+            )
+            for name in names:
+                is_ours = (
+                    name == settings.CHROMA_COLLECTION_NAME
+                    or name.startswith(f"{settings.CHROMA_COLLECTION_NAME}{SHADOW_SEPARATOR}")
                 )
-                logger.info(f"已加载现有集合: {settings.CHROMA_COLLECTION_NAME}")
-            except Exception:
-                self.collection = self.client.create_collection(
-                    name=settings.CHROMA_COLLECTION_NAME,
-                    embedding_function=self.embedding_function,
-                    metadata={"description": "Personal knowledge base for RAG chatbot"}
+                if is_ours and name not in keep:
+                    await self.drop_collection(name)
+        except Exception as e:
+            logger.warning(f"清理遗留影子集合失败: {e}")
+    
+    async def _load_startup_snapshot(self, path: Path):
+        """
+        集合为空时导入预构建的快照
+        
+        先导入影子集合，完整导入后再切换；失败时丢弃影子集合，保持空集合，由知识库同步正常构建
+        """
+        shadow = await self._new_shadow()
+        try:
+            await shadow.import_snapshot(path)
+        except Exception as e:
+            logger.warning(f"启动时导入索引快照失败，将从知识库构建: {e}")
+            await self.drop_collection(shadow.collection_name)
+            return
+        await self.swap_collection(shadow)
+    
+    async def export_snapshot(self, path: Path) -> SnapshotInfo:
+        """把当前集合导出为快照目录"""
+        if not self._initialized:
+            await self.initialize()
+        
+        try:
+            async with self._read_collection() as collection:
+                manifest = IndexManifest.for_collection(collection.name)
+                info = await get_vector_executor().run_read(
+                    export_snapshot,
+                    collection,
+                    manifest,
+                    path,
+                    self._expected_signature()
                 )
-                logger.info(f"已创建新集合: {settings.CHROMA_COLLECTION_NAME}")
-            
-            self._initialized = True
-            logger.info("ChromaDB初始化完成")
+            logger.info(f"已导出索引快照: {path} ({info.count} 个分块, {info.dimensions} 维)")
+            return info
             
         except Exception as e:
-            logger.error(f"ChromaDB初始化失败: {e}")
+            logger.error(f"导出索引快照失败: {e}")
             raise
     
+    async def import_snapshot(self, path: Path) -> SnapshotInfo:
+        """
+        把快照导入当前集合
+        
+        快照的嵌入模型/维度必须与当前配置一致；向量直接写入，不调用嵌入接口；
+        同时导入快照中的索引清单，之后的增量同步只处理有变化的文件
+        """
+        if self.collection is None:
+            await self.initialize()
+        
+        info = read_snapshot_info(path)
+        if info is None:
+            raise ValueError(f"不是有效的索引快照: {path}")
+        
+        expected = self._expected_signature()
+        if info.signature != expected:
+            raise ValueError(f"快照的嵌入配置与当前配置不一致: {info.signature} -> {expected}")
+        
+        executor = get_vector_executor()
+        batches = iter_snapshot_batches(path, SNAPSHOT_IMPORT_BATCH_SIZE)
+        imported = 0
+        while True:
+            batch = await executor.run_read(next, batches, None)
+            if batch is None:
+                break
+            ids, embeddings, documents, metadatas = batch
+            await executor.run_write(
+                self.collection.upsert,
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+            self.lexical_index.add(ids, documents, metadatas)
+            imported += len(ids)
+        
+        manifest = load_snapshot_manifest(path)
+        manifest.path = IndexManifest.for_collection(self.collection_name).path
+        manifest.save()
+        await self._build_document_index()
+        
+        self._write_generation += 1
+        logger.info(f"已导入索引快照: {path} ({imported} 个分块，构建于 {info.created_at})")
+        return info
+    
     async def add_documents(
         self, 
         documents: List[str], 
         metadatas: List[Dict[str, Any]], 
-        ids: List[str]
+        ids: List[str],
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """添加文档到向量数据库(未提供嵌入时自动生成；与upsert_documents相同，已存在的ID会被覆盖)"""
+        await self.upsert_documents(documents, metadatas, ids, embeddings=embeddings)
+    
+    async def upsert_documents(
+        self, 
+        documents: List[str], 
+        metadatas: List[Dict[str, Any]], 
+        ids: List[str],
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """插入或更新文档(已存在的ID会被覆盖，未提供嵌入时重新向量化)"""
+        if not self._initialized:
+            await self.initialize()
+        
+        if not ids:
+            return
+        
+        try:
+            if not embeddings:
+                embeddings = await get_embedding_batcher().embed(documents)
+            
+            metadatas = [self._sanitize_metadata(m) for m in metadatas]
+            await get_vector_executor().run_write(
+                self.collection.upsert,
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+            self.lexical_index.add(ids, documents, metadatas)
+            
+            self._write_generation += 1
+            logger.info(f"已更新 {len(ids)} 个文档到向量数据库")
+            
+        except Exception as e:
+            logger.error(f"更新文档失败: {e}")
+            raise
+    
+    async def update_metadatas(
+        self, 
+        ids: List[str], 
+        metadatas: List[Dict[str, Any]]
     ):
-        """添加文档到向量数据库"""
+        """仅更新元数据(不会重新向量化)"""
         if not self._initialized:
             await self.initialize()
         
+        if not ids:
+            return
+        
         try:
-            # ChromaDB的add方法是同步的，在异步环境中运行
-            await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.add,
-                documents,
-                metadatas,
-                ids
+            metadatas = [self._sanitize_metadata(m) for m in metadatas]
+            await get_vector_executor().run_write(
+                self.collection.update_metadatas,
+                ids=ids,
+                metadatas=metadatas
             )
+            self.lexical_index.update_metadatas(ids, metadatas)
+            self._write_generation += 1
             
-            logger.info(f"已添加 {len(documents)} 个文档到向量数据库")
+        except Exception as e:
+            logger.error(f"更新元数据失败: {e}")
+            raise
+    
+    async def delete_documents(self, ids: List[str]):
+        """按ID删除文档"""
+        if not self._initialized:
+            await self.initialize()
+        
+        if not ids:
+            return
+        
+        try:
+            await get_vector_executor().run_write(self.collection.delete, ids=ids)
+            self.lexical_index.remove(ids)
+            
+            self._write_generation += 1
+            logger.info(f"已从向量数据库删除 {len(ids)} 个文档")
             
         except Exception as e:
-            logger.error(f"添加文档失败: {e}")
+            logger.error(f"删除文档失败: {e}")
             raise
     
+    @staticmethod
+    def _sanitize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """转换为后端可接受的元数据(不支持datetime、None和空列表)"""
+        sanitized = {}
+        for key, value in metadata.items():
+            if value is None:
+                continue
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, (list, tuple)):
+                if not value:
+                    continue
+                value = list(value)
+            sanitized[key] = value
+        return sanitized
+    
     async def search(
         self, 
         query: str, 
         n_results: Optional[int] = None,
-        where: Optional[Dict[str, Any]] = None
+        where: Optional[Dict[str, Any]] = None,
+        boost_tags: Optional[List[str]] = None
     ) -> List[RetrievalResult]:
-        """搜索相关文档"""
+        """
+        搜索相关文档
+        
+        启用混合检索时同时召回BM25和向量结果并按倒数排名融合(RRF)；
+        关键词查询(词项少且全部命中)直接返回词法结果，不调用嵌入API；
+        文件数较多时向量检索分两阶段，先按文件质心选文件再检索其分块；
+        向量检索的候选再经过自适应截断和MMR去冗余，返回数量可能少于n_results；
+        带有boost_tags中任一标签的候选排序时加权(QUERY_ROUTER_TAG_BOOST)，不过滤其他候选；
+        嵌入模型迁移期间用旧模型查询当前集合，并可在后台查询影子集合做对比
+        """
         if not self._initialized:
             await self.initialize()
         
         n_results = n_results or settings.TOP_K_RESULTS
         
+        started = time.perf_counter()
+        retrieval_results = await self._search(query, n_results, where, boost_tags)
+        if self.migration is not None:
+            self.migration.shadow_query(query, n_results, where, retrieval_results, time.perf_counter() - started)
+        return retrieval_results
+    
+    async def _search(
+        self,
+        query: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        boost_tags: Optional[List[str]] = None
+    ) -> List[RetrievalResult]:
+        """执行检索(说明见search)"""
         try:
-            # 执行查询
-            results = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.query,
-                [query],  # query_texts
-                n_results,  # n_results
-                where  # where clause
-            )
+            lexical_hits: List[LexicalHit] = []
+            candidates = n_results
+            # 嵌入配置变化后、索引重建完成前向量不可比较，无法使用旧模型时只走词法检索
+            lexical_only = self.needs_rebuild and self._legacy_provider is None
+            if settings.HYBRID_SEARCH_ENABLED or lexical_only:
+                candidates = n_results * HYBRID_CANDIDATE_FACTOR
+                lexical_hits = self._lexical_hits(query, candidates, where)
+                
+                if lexical_only or self._is_keyword_query(query, lexical_hits):
+                    ranked = [(hit.id, hit.metadata, hit.coverage, None) for hit in lexical_hits]
+                    if boost_tags:
+                        ranked = self._boost(ranked, self._tag_weights(ranked, boost_tags), key=lambda entry: entry[2])
+                    async with self._read_collection() as collection:
+                        retrieval_results = await self._hydrate(collection, ranked[:n_results])
+                    logger.info(f"词法检索到 {len(retrieval_results)} 个相关文档")
+                    return retrieval_results
             
-            # 转换结果格式
-            retrieval_results = []
-            if results["documents"] and results["documents"][0]:
-                documents = results["documents"][0]
-                metadatas = results["metadatas"][0]
-                distances = results["distances"][0]
+            # 集合、查询模型和质心索引在同一次检索内保持一致(迁移切换可能发生在请求嵌入期间)
+            async with self._read_collection() as collection:
+                legacy_provider = self._legacy_provider if self.needs_rebuild else None
+                document_index = self.document_index
                 
-                for i, doc in enumerate(documents):
-                    # 计算相似度 (距离转换为相似度)
-                    similarity = 1.0 - distances[i]
-                    
-                    # 只返回超过阈值的结果
-                    if similarity >= settings.SIMILARITY_THRESHOLD:
-                        retrieval_results.append(
-                            RetrievalResult(
-                                content=doc,
-                                metadata=metadatas[i],
-                                similarity=similarity,
-                                source=metadatas[i].get("source", "unknown")
-                            )
-                        )
+                # 查询向量(重复的问题直接命中内存缓存，不请求API；迁移期间用旧模型匹配当前集合)
+                if legacy_provider is not None:
+                    embedding = (await legacy_provider.embed([query]))[0]
+                else:
+                    embedding = await get_query_embedding_cache().embed(query)
+                
+                postprocess = settings.MMR_ENABLED or settings.ADAPTIVE_CUTOFF_ENABLED
+                if postprocess:
+                    candidates = max(candidates, n_results * settings.MMR_CANDIDATE_FACTOR)
+                
+                # 文件数足够多时先按质心选出相关文件，只在这些文件的分块中检索
+                chunk_ids = None
+                if (
+                    settings.HIERARCHICAL_SEARCH_ENABLED
+                    and len(document_index) >= settings.HIERARCHICAL_MIN_DOCUMENTS
+                ):
+                    documents = document_index.search(np.asarray(embedding), settings.HIERARCHICAL_TOP_DOCUMENTS)
+                    chunk_ids = document_index.chunk_ids([document for document, _ in documents]) or None
+                
+                # 执行查询
+                hits = await get_vector_executor().run_read(
+                    collection.query,
+                    embedding=embedding,
+                    n_results=candidates,
+                    where=where,
+                    ids=chunk_ids
+                )
+                
+                # 只保留超过阈值的向量结果(相似度为余弦相似度)
+                similarities = np.fromiter((hit.similarity for hit in hits), dtype=np.float32, count=len(hits))
+                dense_hits = [hits[i] for i in np.flatnonzero(similarities >= settings.SIMILARITY_THRESHOLD)]
+                
+                vectors = None
+                if lexical_hits:
+                    ranked, vectors = await self._fuse(collection, embedding, dense_hits, lexical_hits)
+                else:
+                    ranked = [(hit.id, hit.metadata, hit.similarity, None) for hit in dense_hits]
+                
+                weights = self._tag_weights(ranked, boost_tags) if boost_tags else None
+                if postprocess and ranked:
+                    ranked = await self._diversify(collection, ranked, n_results, vectors, weights)
+                elif weights is not None:
+                    ranked = self._boost(
+                        ranked, weights, key=lambda entry: entry[2] if entry[3] is None else entry[3]
+                    )
+                
+                # 只为最终结果读取分块文本
+                retrieval_results = await self._hydrate(collection, ranked[:n_results])
             
             logger.info(f"检索到 {len(retrieval_results)} 个相关文档")
             return retrieval_results
@@ -145,15 +660,194 @@ class VectorStore:
             logger.error(f"文档检索失败: {e}")
             raise
     
+    def _lexical_hits(self, query: str, candidates: int, where: Optional[Dict[str, Any]]) -> List[LexicalHit]:
+        """BM25召回(过滤词项覆盖率过低的结果；与上一次召回的参数和索引版本都相同时直接复用)"""
+        key = (query, candidates, json.dumps(where, sort_keys=True, ensure_ascii=False), self.index_version)
+        last = self._last_lexical
+        if last is not None and last[0] == key:
+            return last[1]
+        
+        hits = [
+            hit for hit in self.lexical_index.search(query, candidates, where)
+            if hit.coverage >= settings.LEXICAL_MIN_COVERAGE
+        ]
+        self._last_lexical = (key, hits)
+        return hits
+    
+    def partition_sizes(self, field: str) -> Dict[Any, int]:
+        """
+        各分区(如content_type、tags的取值)的分块数，供查询路由跳过空分区
+
+        后端维护分区位图时直接统计位图，否则按内存中的词法索引元数据统计；按索引版本缓存
+        """
+        version = self.index_version
+        cached = self._partition_sizes.get(field)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        sizes = self.collection.partition_sizes(field) if self.collection is not None else None
+        if sizes is None:
+            sizes = self.lexical_index.partition_sizes(field)
+        self._partition_sizes[field] = (version, sizes)
+        return sizes
+    
+    def answers_lexically(self, query: str) -> bool:
+        """
+        检索是否只走词法结果、不需要查询向量(关键词快速路径或索引重建期间的纯词法检索)
+
+        按不带过滤条件的检索判断，供调用方在检索前决定是否值得生成查询向量
+        """
+        if self.needs_rebuild and self._legacy_provider is None:
+            return True
+        if not settings.HYBRID_SEARCH_ENABLED:
+            return False
+        candidates = settings.TOP_K_RESULTS * HYBRID_CANDIDATE_FACTOR
+        return self._is_keyword_query(query, self._lexical_hits(query, candidates, None))
+    
+    def _is_keyword_query(self, query: str, lexical_hits: List[LexicalHit]) -> bool:
+        """词项数不超过上限且最佳结果命中全部词项时视为关键词查询"""
+        return (
+            settings.LEXICAL_FAST_PATH_ENABLED
+            and bool(lexical_hits)
+            and lexical_hits[0].coverage >= 1.0 - 1e-9
+            and self.lexical_index.query_term_count(query) <= settings.LEXICAL_FAST_PATH_MAX_TERMS
+        )
+    
+    async def _fuse(
+        self,
+        collection: VectorCollection,
+        embedding: List[float],
+        dense_hits: List[SearchHit],
+        lexical_hits: List[LexicalHit]
+    ) -> Tuple[List[tuple], Optional[np.ndarray]]:
+        """
+        倒数排名融合: score = Σ 1/(k + rank)
+        
+        融合分数只决定排序；相似度统一为与查询向量的余弦相似度，
+        仅被词法召回的分块用其存储的向量计算(词项命中比例与余弦不可比较)
+        
+        Returns:
+            (按融合分数降序的 (ID, 元数据, 相似度, 融合分数), 与之对应的候选向量矩阵)；
+            候选向量缺失(分块刚被删除)时丢弃仅被词法召回的分块，向量矩阵为None
+        """
+        scores: Dict[str, float] = defaultdict(float)
+        metadatas: Dict[str, Dict[str, Any]] = {}
+        similarities = {hit.id: hit.similarity for hit in dense_hits}
+        for hits in (lexical_hits, dense_hits):
+            for rank, hit in enumerate(hits, 1):
+                scores[hit.id] += 1.0 / (settings.HYBRID_RRF_K + rank)
+                metadatas[hit.id] = hit.metadata
+        
+        ids = sorted(scores, key=scores.get, reverse=True)
+        try:
+            vectors = await get_vector_executor().run_read(collection.get_embeddings, ids)
+        except KeyError as e:
+            # 词法索引与集合之间存在短暂的不一致
+            logger.debug(f"候选向量缺失，只保留向量召回的结果: {e}")
+            vectors = None
+            ids = [chunk_id for chunk_id in ids if chunk_id in similarities]
+        
+        if vectors is not None:
+            query = np.asarray(embedding, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * max(float(np.linalg.norm(query)), 1e-12)
+            cosines = (vectors @ query) / np.maximum(norms, 1e-12)
+            for chunk_id, cosine in zip(ids, cosines):
+                similarities.setdefault(chunk_id, float(cosine))
+        
+        ranked = [(chunk_id, metadatas[chunk_id], similarities[chunk_id], scores[chunk_id]) for chunk_id in ids]
+        return ranked, vectors
+    
+    @staticmethod
+    def _tag_weights(ranked: List[tuple], tags: List[str]) -> np.ndarray:
+        """带有任一指定标签的候选权重为 1 + QUERY_ROUTER_TAG_BOOST，其余为1"""
+        wanted = set(tags)
+        return np.array([
+            1.0 + settings.QUERY_ROUTER_TAG_BOOST if wanted.intersection(entry[1].get("tags") or []) else 1.0
+            for entry in ranked
+        ], dtype=np.float32)
+    
+    @staticmethod
+    def _boost(ranked: List[tuple], weights: np.ndarray, key) -> List[tuple]:
+        """按加权后的排序分数重新排序(权重相同时保持原顺序)"""
+        order = sorted(range(len(ranked)), key=lambda i: -key(ranked[i]) * weights[i])
+        return [ranked[i] for i in order]
+    
+    async def _diversify(
+        self,
+        collection: VectorCollection,
+        ranked: List[tuple],
+        n_results: int,
+        vectors: Optional[np.ndarray],
+        weights: Optional[np.ndarray] = None
+    ) -> List[tuple]:
+        """
+        在候选集上做自适应截断和MMR去冗余(候选向量缺失时保持原排序)
+
+        截断和MMR相关性统一使用余弦相似度(混合检索中仅被词法召回的候选也已按向量计算)，
+        而不是排序分数：RRF融合分数只反映名次，同时被两路召回和只被一路召回的结果之间
+        天然相差约一半，会被误判为断崖。候选先按相关性降序排列，相关性相同时保持传入的
+        排序(RRF名次)，MMR选择中得分相同的候选也按这个顺序取舍
+        """
+        if vectors is None:
+            ids = [entry[0] for entry in ranked]
+            try:
+                vectors = await get_vector_executor().run_read(collection.get_embeddings, ids)
+            except KeyError as e:
+                # 词法索引与集合之间存在短暂的不一致(分块刚被删除)
+                logger.debug(f"候选向量缺失，跳过结果去冗余: {e}")
+                return ranked
+        
+        relevance = np.array([entry[2] for entry in ranked], dtype=np.float32)
+        if weights is not None:
+            relevance = relevance * weights
+        
+        order = np.argsort(-relevance, kind="stable")
+        ranked = [ranked[i] for i in order]
+        selected = get_result_diversifier().select(vectors[order], relevance[order], n_results)
+        return [ranked[i] for i in selected]
+    
+    async def _hydrate(self, collection: VectorCollection, ranked: List[tuple]) -> List[RetrievalResult]:
+        """读取最终结果的分块文本并转换为检索结果(期间被删除的分块跳过)"""
+        ids = [entry[0] for entry in ranked]
+        documents = await get_vector_executor().run_read(collection.get_documents, ids)
+        
+        return [
+            self._to_result(documents[chunk_id], metadata, similarity, rrf_score)
+            for chunk_id, metadata, similarity, rrf_score in ranked
+            if chunk_id in documents
+        ]
+    
+    @staticmethod
+    def _to_result(
+        document: str,
+        metadata: Dict[str, Any],
+        similarity: float,
+        rrf_score: Optional[float] = None
+    ) -> RetrievalResult:
+        """转换为检索结果"""
+        return RetrievalResult(
+            content=document,
+            metadata=metadata,
+            similarity=min(max(similarity, 0.0), 1.0),
+            rrf_score=rrf_score,
+            source=metadata.get("source") or metadata.get("filename", "unknown")
+        )
+    
     async def delete_collection(self):
         """删除集合(用于重置)"""
         if not self._initialized:
             return
         
         try:
-            self.client.delete_collection(settings.CHROMA_COLLECTION_NAME)
+            self.backend.delete_collection(self.collection_name)
+            IndexManifest.for_collection(self.collection_name).delete()
             self.collection = None
-            logger.info(f"已删除集合: {settings.CHROMA_COLLECTION_NAME}")
+            self.lexical_index.clear()
+            self.document_index.clear()
+            self._write_generation += 1
+            # 下次initialize时重新创建集合
+            self._initialized = False
+            logger.info(f"已删除集合: {self.collection_name}")
         except Exception as e:
             logger.error(f"删除集合失败: {e}")
             raise
@@ -165,10 +859,8 @@ class VectorStore:
         
         try:
             # 获取集合统计
-            count = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.count
-            )
+            async with self._read_collection() as collection:
+                count = await get_vector_executor().run_read(collection.count)
             
             # 计算索引大小(估算)
             persist_dir = Path(settings.CHROMA_PERSIST_DIRECTORY)
@@ -180,14 +872,30 @@ class VectorStore:
                 index_size_mb = index_size_mb / (1024 * 1024)  # 转换为MB
             
             stats = {
-                "collection_name": settings.CHROMA_COLLECTION_NAME,
+                "collection_name": self.collection_name,
                 "document_count": count,
                 "last_updated": datetime.now().isoformat(),
                 "index_size_mb": round(index_size_mb, 2),
-                "embedding_model": settings.OPENAI_EMBEDDING_MODEL,
+                "backend": self.backend.name,
+                "embedding_provider": get_openai_client().embedding_provider.name,
+                **self._expected_signature(),
+                "needs_rebuild": self.needs_rebuild,
                 "persist_directory": settings.CHROMA_PERSIST_DIRECTORY
             }
             
+            stats["vector_index"] = self.collection.get_stats()
+            stats["lexical_index"] = self.lexical_index.get_stats()
+            stats["document_index"] = self.document_index.get_stats()
+            if self.migration is not None:
+                stats["embedding_migration"] = self.migration.get_stats()
+            stats["result_diversifier"] = get_result_diversifier().get_stats()
+            stats["executor"] = get_vector_executor().get_stats()
+            stats["query_embedding_cache"] = get_query_embedding_cache().get_stats()
+            
+            embedding_cache = get_embedding_cache()
+            if embedding_cache:
+                stats["embedding_cache"] = await get_vector_executor().run_read(embedding_cache.get_stats)
+            
             return stats
             
         except Exception as e:
@@ -201,23 +909,24 @@ class VectorStore:
         
         try:
             # 尝试执行简单查询
-            await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.collection.count
-            )
+            async with self._read_collection() as collection:
+                await get_vector_executor().run_read(collection.count)
             return True
         except Exception as e:
-            logger.error(f"ChromaDB健康检查失败: {e}")
+            logger.error(f"向量数据库健康检查失败: {e}")
             raise
     
     async def close(self):
         """关闭连接"""
-        if self.client:
-            # ChromaDB不需要显式关闭连接
-            self.client = None
+        if self._legacy_provider is not None:
+            self._legacy_provider.close()
+            self._legacy_provider = None
+        if self.backend:
+            self.backend.close()
+            self.backend = None
             self.collection = None
             self._initialized = False
-            logger.info("ChromaDB连接已关闭")
+            logger.info("向量数据库连接已关闭")
 
 # 全局向量数据库实例
 vector_store_instance = None
@@ -228,4 +937,11 @@ async def get_vector_store() -> VectorStore:
     if vector_store_instance is None:
         vector_store_instance = VectorStore()
         await vector_store_instance.initialize()
-    return vector_store_instance
\ No newline at end of file
+    return vector_store_instance
+
+async def close_vector_store():
+    """关闭向量数据库实例(应用退出时调用)"""
+    global vector_store_instance
+    if vector_store_instance is not None:
+        await vector_store_instance.close()
+        vector_store_instance = None
@@ -42,6 +42,7 @@ class RetrievalResult(BaseModel):
     content: str = Field(..., description="文档内容")
     metadata: Dict[str, Any] = Field(..., description="元数据")
     similarity: float = Field(..., ge=0, le=1, description="相似度分数")
+    rrf_score: Optional[float] = Field(default=None, description="混合检索的倒数排名融合分数(决定排序，仅混合检索时有值)")
     source: str = Field(..., description="来源文件")
 
 class ChatResponse(BaseModel):
@@ -117,6 +118,7 @@ class DocumentMetadata(BaseModel):
     chunk_index: int = Field(..., description="分块索引")
     total_chunks: int = Field(..., description="总分块数")
     content_type: str = Field(..., description="内容类型")
+    section_path: str = Field(default="", description="章节路径(Markdown标题层级，以 > 分隔)")
     last_updated: datetime = Field(..., description="最后更新时间")
     tags: List[str] = Field(default=[], description="标签")
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+向量量化基准脚本
+对比NumPy后端float32与int8(全精度重排)两种存储的recall@k、常驻内存和查询延迟
+
+用法:
+    python benchmark_quantization.py                      # 合成数据(聚类分布)
+    python benchmark_quantization.py --collection personal_knowledge   # 使用已有集合的真实向量
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 基准不需要调用OpenAI，但导入配置时要求该变量存在
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from app.config import settings
+from app.core.vector_backends.numpy_backend import NumpyCollection
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """生成聚类分布的单位向量(近似真实嵌入的分布)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def collection_vectors(name: str) -> np.ndarray:
+    """读取已有NumPy集合中的向量"""
+    collection = NumpyCollection(Path(settings.CHROMA_PERSIST_DIRECTORY) / "numpy" / name)
+    try:
+        return np.asarray(collection._matrix[np.flatnonzero(collection._alive)])
+    finally:
+        collection.close()
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """以语料向量加噪声作为查询"""
+    rng = np.random.default_rng(seed + 1)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    queries = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def build(vectors: np.ndarray, quantization: str, directory: Path) -> NumpyCollection:
+    """写入临时集合"""
+    collection = NumpyCollection(directory, quantization=quantization)
+    batch = 2048
+    for start in range(0, len(vectors), batch):
+        end = min(start + batch, len(vectors))
+        ids = [f"v{i}" for i in range(start, end)]
+        collection.upsert(ids, vectors[start:end], [""] * len(ids), [{} for _ in ids])
+    return collection
+
+
+def run(collection: NumpyCollection, queries: np.ndarray, truth: list, k: int):
+    """返回(平均recall@k, 平均延迟ms)"""
+    recalls = []
+    started = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        hits = collection.query(query, n_results=k)
+        recalls.append(len({hit.id for hit in hits} & expected) / k)
+    elapsed = (time.perf_counter() - started) / len(queries) * 1000
+    return float(np.mean(recalls)), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy后端int8量化基准")
+    parser.add_argument("--vectors", type=int, default=20000, help="合成向量数")
+    parser.add_argument("--dim", type=int, default=1536, help="向量维度")
+    parser.add_argument("--clusters", type=int, default=200, help="合成数据的聚类数")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--k", type=int, default=5, help="top-k")
+    parser.add_argument("--rerank-factors", type=str, default="1,2,4,8", help="int8重排倍数(逗号分隔)")
+    parser.add_argument("--collection", type=str, default=None, help="使用已有NumPy集合的向量")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.collection:
+        vectors = collection_vectors(args.collection)
+        print(f"📦 集合 {args.collection}: {len(vectors)} 个向量, {vectors.shape[1]} 维")
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, args.clusters, args.seed)
+        print(f"📦 合成数据: {len(vectors)} 个向量, {args.dim} 维, {args.clusters} 个聚类")
+
+    k = min(args.k, len(vectors))
+    queries = make_queries(vectors, args.queries, args.seed)
+
+    # 真实近邻(float32暴力检索)
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    truth = [{f"v{i}" for i in row} for row in top]
+
+    workdir = Path(tempfile.mkdtemp(prefix="quant_bench_"))
+    try:
+        print(f"\n{'存储':<16}{'recall@' + str(k):>10}{'延迟(ms)':>12}{'常驻内存(MB)':>16}{'磁盘全精度(MB)':>18}")
+        print("-" * 72)
+
+        collection = build(vectors, "none", workdir / "float32")
+        recall, latency = run(collection, queries, truth, k)
+        stats = collection.get_stats()
+        print(f"{'float32':<16}{recall:>10.4f}{latency:>12.2f}{stats['resident_vector_mb']:>16.2f}{stats['full_precision_mb']:>18.2f}")
+        collection.close()
+
+        collection = build(vectors, "int8", workdir / "int8")
+        stats = collection.get_stats()
+        for factor in [int(f) for f in args.rerank_factors.split(",")]:
+            collection.rerank_factor = factor
+            recall, latency = run(collection, queries, truth, k)
+            label = f"int8 (x{factor})"
+            print(f"{label:<16}{recall:>10.4f}{latency:>12.2f}{stats['resident_vector_mb']:>16.2f}{stats['full_precision_mb']:>18.2f}")
+        collection.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
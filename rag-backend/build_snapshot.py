@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+索引快照命令行工具
+离线构建一次索引并导出为快照，部署时通过INDEX_SNAPSHOT_PATH在启动时导入，新副本无需调用嵌入接口
+
+用法:
+    python build_snapshot.py build --output ./index_snapshot     # 在临时目录中从知识库全量构建并导出
+    python build_snapshot.py export --output ./index_snapshot    # 导出当前持久化目录中的活动集合
+    python build_snapshot.py import --input ./index_snapshot     # 导入到当前持久化目录(影子集合构建后切换)
+    python build_snapshot.py info --input ./index_snapshot       # 查看快照信息
+"""
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+
+from app.config import settings
+from app.core.index_snapshot import read_snapshot_info
+
+
+async def build(output: Path, knowledge_path: Path):
+    """在临时持久化目录中构建索引并导出"""
+    from app.core.vector_store import VectorStore
+    from app.core.document_processor import DocumentProcessor
+    from app.core.ingest_pipeline import shutdown_process_pool
+
+    workdir = Path(tempfile.mkdtemp(prefix="index_build_"))
+    settings.CHROMA_PERSIST_DIRECTORY = str(workdir)
+    settings.INDEX_SNAPSHOT_PATH = ""
+    try:
+        vector_store = VectorStore()
+        await vector_store.initialize()
+        stats = await DocumentProcessor().sync_documents(knowledge_path, vector_store)
+        print(f"📚 已索引知识库 {knowledge_path}: 新增 {stats.get('added', 0)} 个分块")
+        info = await vector_store.export_snapshot(output)
+        await vector_store.close()
+    finally:
+        shutdown_process_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return info
+
+
+async def export(output: Path):
+    """导出当前活动集合"""
+    from app.core.vector_store import VectorStore
+
+    vector_store = VectorStore()
+    await vector_store.initialize()
+    try:
+        return await vector_store.export_snapshot(output)
+    finally:
+        await vector_store.close()
+
+
+async def import_(source: Path):
+    """导入快照(写入影子集合后原子切换，当前集合在切换前保持可用)"""
+    from app.core.vector_store import VectorStore
+
+    vector_store = VectorStore()
+    await vector_store.initialize()
+    try:
+        shadow = await vector_store.create_shadow()
+        try:
+            info = await shadow.import_snapshot(source)
+        except Exception:
+            await vector_store.drop_collection(shadow.collection_name)
+            raise
+        await vector_store.swap_collection(shadow)
+        return info
+    finally:
+        await vector_store.close()
+
+
+def print_info(info):
+    print(f"📦 快照: {info.count} 个分块, {info.dimensions} 维")
+    print(f"   嵌入模型: {info.embedding_model} (维度配置 {info.embedding_dimensions or '默认'})")
+    print(f"   来源集合: {info.source_collection}")
+    print(f"   构建时间: {info.created_at}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引快照构建/导出/导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="从知识库全量构建并导出快照")
+    build_parser.add_argument("--output", type=Path, required=True, help="快照输出目录")
+    build_parser.add_argument("--knowledge-base", type=Path, default=Path(settings.KNOWLEDGE_BASE_PATH), help="知识库目录")
+
+    export_parser = subparsers.add_parser("export", help="导出当前活动集合")
+    export_parser.add_argument("--output", type=Path, required=True, help="快照输出目录")
+
+    import_parser = subparsers.add_parser("import", help="导入快照到当前持久化目录")
+    import_parser.add_argument("--input", type=Path, required=True, help="快照目录")
+
+    info_parser = subparsers.add_parser("info", help="查看快照信息")
+    info_parser.add_argument("--input", type=Path, required=True, help="快照目录")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        info = asyncio.run(build(args.output, args.knowledge_base))
+    elif args.command == "export":
+        info = asyncio.run(export(args.output))
+    elif args.command == "import":
+        info = asyncio.run(import_(args.input))
+    else:
+        info = read_snapshot_info(args.input)
+        if info is None:
+            raise SystemExit(f"❌ 不是有效的索引快照: {args.input}")
+
+    print_info(info)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from loguru import logger
+import asyncio
 import sys
 from pathlib import Path
 
@@ -38,10 +39,64 @@ async def lifespan(app: FastAPI):
         logger.error(f"初始化失败: {e}")
         raise
     
+    # 启动知识库监听(失败不影响聊天服务)
+    if settings.KB_WATCH_ENABLED:
+        try:
+            from app.core.vector_store import get_vector_store
+            from app.core.kb_watcher import start_knowledge_base_watcher
+            start_knowledge_base_watcher(await get_vector_store())
+        except Exception as e:
+            logger.error(f"知识库监听启动失败: {e}")
+    else:
+        # 未启用监听时，嵌入配置变化后由这里在后台迁移或重建索引(启用监听时由首次同步完成)
+        try:
+            from app.core.vector_store import get_vector_store
+            vector_store = await get_vector_store()
+            if vector_store.needs_rebuild:
+                from app.core.document_processor import DocumentProcessor
+                processor = DocumentProcessor()
+                app.state.rebuild_task = asyncio.create_task(
+                    processor.migrate_embeddings(vector_store)
+                    if settings.EMBEDDING_MIGRATION_ENABLED
+                    else processor.reindex_documents(Path(settings.KNOWLEDGE_BASE_PATH), vector_store)
+                )
+        except Exception as e:
+            logger.error(f"索引重建启动失败: {e}")
+    
     yield
     
     # 清理资源
     logger.info("正在关闭AI聊天机器人服务...")
+    
+    # 先停止后台迁移/重建任务，避免在写入或保存检查点时关闭线程池(未完成的进度下次启动时继续或重新开始)
+    rebuild_task = getattr(app.state, "rebuild_task", None)
+    if rebuild_task is not None and not rebuild_task.done():
+        rebuild_task.cancel()
+        try:
+            await rebuild_task
+        except asyncio.CancelledError:
+            logger.info("已取消后台索引重建任务")
+        except Exception as e:
+            logger.error(f"后台索引重建任务失败: {e}")
+    
+    from app.core.kb_watcher import stop_knowledge_base_watcher
+    await stop_knowledge_base_watcher()
+    
+    from app.core.ingest_pipeline import shutdown_process_pool
+    shutdown_process_pool()
+    
+    # 关闭向量库(NumPy内存映射和记录库)、嵌入缓存连接和嵌入提供方线程池
+    from app.core.vector_store import close_vector_store
+    await close_vector_store()
+    
+    from app.core.embedding_cache import close_embedding_cache
+    close_embedding_cache()
+    
+    from app.core.openai_client import close_openai_client
+    await close_openai_client()
+    
+    from app.core.vector_executor import shutdown_vector_executor
+    shutdown_vector_executor()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -0,0 +1,22 @@
+"""
+单元测试公共配置
+只覆盖不依赖外部服务的纯逻辑模块；导入app.config前提供必需的环境变量
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+import tiktoken
+
+
+@pytest.fixture(scope="session")
+def byte_encoding() -> tiktoken.Encoding:
+    """逐字节切分的tiktoken编码(测试不下载BPE文件，token数等于UTF-8字节数)"""
+    return tiktoken.Encoding(
+        name="test_bytes",
+        pat_str=r"\s+|\w+|[^\w\s]+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={}
+    )
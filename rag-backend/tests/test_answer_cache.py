@@ -0,0 +1,154 @@
+"""语义回答缓存测试"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.core import answer_cache, rag_service
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.rag_service import RAGService
+
+
+def answer(text: str) -> dict:
+    return {"response": text}
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(maxsize=2, ttl=60, threshold=0.9)
+
+
+def test_hit_above_threshold_and_miss_below(cache):
+    assert cache.lookup([1.0, 0.0], "zh", "v1") is None
+    cache.store("你会什么", [1.0, 0.0], "zh", "v1", answer("Python"))
+
+    response, similarity = cache.lookup([0.99, 0.05], "zh", "v1")
+    assert response == answer("Python") and similarity > 0.9
+    assert cache.lookup([0.5, 0.5], "zh", "v1") is None
+    # 语言不同不复用
+    assert cache.lookup([1.0, 0.0], "en", "v1") is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["top_entries"] == [{"query": "你会什么", "language": "zh", "hits": 1}]
+
+
+def test_ttl_expiry(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache.lookup([1.0, 0.0], "zh", "v1")
+    cache.store("q", [1.0, 0.0], "zh", "v1", answer("a"))
+
+    now[0] += 59
+    assert cache.lookup([1.0, 0.0], "zh", "v1") is not None
+    now[0] += 2
+    assert cache.lookup([1.0, 0.0], "zh", "v1") is None
+    assert cache.get_stats()["size"] == 0
+
+
+def test_evicts_least_recently_used(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache.lookup([1.0, 0.0, 0.0], "zh", "v1")
+    cache.store("a", [1.0, 0.0, 0.0], "zh", "v1", answer("a"))
+    now[0] += 1
+    cache.store("b", [0.0, 1.0, 0.0], "zh", "v1", answer("b"))
+    now[0] += 1
+    cache.lookup([1.0, 0.0, 0.0], "zh", "v1")
+
+    now[0] += 1
+    cache.store("c", [0.0, 0.0, 1.0], "zh", "v1", answer("c"))
+    assert cache.lookup([0.0, 1.0, 0.0], "zh", "v1") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "zh", "v1")[0] == answer("a")
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_lookup_with_new_version_invalidates(cache):
+    cache.lookup([1.0, 0.0], "zh", "v1")
+    cache.store("q", [1.0, 0.0], "zh", "v1", answer("old"))
+
+    assert cache.lookup([1.0, 0.0], "zh", "v2") is None
+    stats = cache.get_stats()
+    assert stats["size"] == 0 and stats["invalidations"] == 1 and stats["index_version"] == "v2"
+
+
+def test_store_with_stale_version_is_discarded(cache):
+    # 请求A在v1下检索并生成；期间请求B以v2查找，缓存推进到v2
+    cache.lookup([1.0, 0.0], "zh", "v1")
+    cache.lookup([0.0, 1.0], "zh", "v2")
+    cache.store("b", [0.0, 1.0], "zh", "v2", answer("new"))
+
+    cache.store("a", [1.0, 0.0], "zh", "v1", answer("stale"))
+    stats = cache.get_stats()
+    assert stats["index_version"] == "v2" and stats["stale_discards"] == 1
+    # 旧回答没有写入，v2的回答也没有被清空
+    assert cache.lookup([1.0, 0.0], "zh", "v2") is None
+    assert cache.lookup([0.0, 1.0], "zh", "v2")[0] == answer("new")
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.index_version = "v1"
+
+    def answers_lexically(self, query: str) -> bool:
+        return False
+
+    async def search(self, query: str, n_results: int = 5, where=None) -> List:
+        return []
+
+
+class FakeOpenAIClient:
+    def __init__(self, store: FakeVectorStore):
+        self.store = store
+        self.update_during_generation = False
+        self.calls = 0
+
+    def get_system_prompt(self, language: str) -> str:
+        return "system"
+
+    async def chat_completion(self, messages, system_prompt, temperature):
+        self.calls += 1
+        if self.update_during_generation:
+            # 生成期间知识库被监听器更新
+            self.store.index_version = f"v{self.calls + 1}"
+        return {
+            "reply": f"reply {self.calls}",
+            "token_usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            "model": "fake"
+        }
+
+
+class FakeQueryEmbeddings:
+    async def embed(self, text: str) -> List[float]:
+        return [1.0, 0.0]
+
+
+@pytest.fixture
+def service(cache, monkeypatch):
+    monkeypatch.setattr(rag_service, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(rag_service, "get_query_embedding_cache", lambda: FakeQueryEmbeddings())
+    monkeypatch.setattr(rag_service, "get_query_router", lambda: None)
+    service = RAGService()
+    service.vector_store = FakeVectorStore()
+    service.openai_client = FakeOpenAIClient(service.vector_store)
+    service._initialized = True
+    return service
+
+
+def test_chat_reuses_cached_answer(service):
+    first = asyncio.run(service.chat("你会什么", "s1"))
+    second = asyncio.run(service.chat("你会什么", "s2"))
+    assert service.openai_client.calls == 1
+    assert second["cache_hit"] is True and second["response"] == first["response"]
+
+
+def test_chat_does_not_cache_answer_when_index_changes_during_generation(service, cache):
+    service.openai_client.update_during_generation = True
+    asyncio.run(service.chat("你会什么", "s1"))
+    assert cache.get_stats()["size"] == 0
+
+    service.openai_client.update_during_generation = False
+    response = asyncio.run(service.chat("你会什么", "s2"))
+    assert "cache_hit" not in response and service.openai_client.calls == 2
+    assert cache.get_stats()["index_version"] == "v2"
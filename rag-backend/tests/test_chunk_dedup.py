@@ -0,0 +1,159 @@
+"""分块近似去重测试"""
+
+import pytest
+
+from app.config import settings
+from app.core.chunk_dedup import ChunkDeduplicator, simhash, hamming_distance
+from app.core.index_manifest import IndexManifest
+
+INTRO = "我是一名全栈开发者，主要使用Python和TypeScript，热爱开源和摄影，" * 3
+
+
+@pytest.fixture
+def dedup(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", True)
+    monkeypatch.setattr(settings, "NEAR_DUP_MAX_DISTANCE", 6)
+    return ChunkDeduplicator(IndexManifest(tmp_path / "manifest.json"))
+
+
+def test_simhash_ignores_headings_whitespace_and_case():
+    base = simhash(INTRO + "Hello World")
+    assert simhash("# 关于我\n## 简介\n" + INTRO + "Hello World") == base
+    assert simhash(INTRO + "hello \n\t world  ") == base
+
+
+def test_simhash_near_and_far_texts():
+    near = simhash(INTRO + "Hello World!")
+    far = simhash("PostgreSQL、Redis和Kubernetes的部署经验，负责过多个后端服务的性能优化")
+    assert hamming_distance(simhash(INTRO + "Hello World"), near) <= 6
+    assert hamming_distance(simhash(INTRO), far) > 6
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b1011) == 0
+    assert hamming_distance(0b1011, 0b0110) == 3
+
+
+def test_assign_merges_near_duplicate_across_files(dedup):
+    first = dedup.assign("a.md", [INTRO], ["a1"], [])
+    assert first.refs == ["a1"] and first.new_idx == [0] and first.created == ["a1"]
+
+    second = dedup.assign("b.md", [INTRO + "。"], ["b1"], [])
+    assert second.refs == ["a1"]
+    assert second.new_idx == [] and second.merged_ids == ["a1"]
+    assert dedup.manifest.chunks["a1"].sources == ["a.md", "b.md"]
+    assert "b1" not in dedup.manifest.chunks
+
+
+def test_assign_disabled_keeps_duplicates(dedup):
+    dedup.enabled = False
+    dedup.assign("a.md", [INTRO], ["a1"], [])
+    plan = dedup.assign("b.md", [INTRO], ["b1"], [])
+    assert plan.refs == ["b1"] and plan.new_idx == [0]
+
+
+def test_assign_keeps_unchanged_chunks(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [])
+    plan = dedup.assign("a.md", [INTRO], ["a1"], ["a1"])
+    assert plan.kept_idx == [0] and plan.new_idx == [] and plan.created == []
+
+
+def test_release_refcounts_sources(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [])
+    dedup.assign("b.md", [INTRO], ["b1"], [])
+
+    deleted, updated = dedup.release("a.md", ["a1"])
+    assert deleted == [] and updated == ["a1"]
+    assert dedup.manifest.chunks["a1"].sources == ["b.md"]
+
+    deleted, updated = dedup.release("b.md", ["a1"])
+    assert deleted == ["a1"] and updated == []
+    assert "a1" not in dedup.manifest.chunks
+    # 已删除的分块不再作为合并目标
+    assert dedup.assign("c.md", [INTRO], ["c1"], []).refs == ["c1"]
+
+
+def test_release_unknown_chunk_is_exclusive(dedup):
+    assert dedup.release("a.md", ["legacy"]) == (["legacy"], [])
+
+
+def test_rollback_restores_released_and_drops_created(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [])
+
+    # a.md 修改后重新摄取失败：新分块撤销，旧分块恢复
+    plan = dedup.assign("a.md", ["完全不同的新内容，讲的是徒步和登山的经历" * 3], ["a2"], ["a1"])
+    dedup.release("a.md", ["a1"], plan=plan)
+    assert "a1" not in dedup.manifest.chunks and "a2" in dedup.manifest.chunks
+
+    orphaned = dedup.rollback("a.md", plan)
+    assert orphaned == {}
+    assert dedup.manifest.chunks["a1"].sources == ["a.md"]
+    assert "a2" not in dedup.manifest.chunks
+    # 恢复的分块重新进入LSH桶
+    assert dedup.assign("b.md", [INTRO], ["b1"], []).refs == ["a1"]
+
+
+def test_rollback_reports_orphaned_sources(dedup):
+    plan = dedup.assign("a.md", [INTRO], ["a1"], [])
+    dedup.assign("b.md", [INTRO], ["b1"], [])
+
+    orphaned = dedup.rollback("a.md", plan)
+    assert orphaned == {"a1": ["b.md"]}
+    assert dedup.manifest.chunks == {}
+
+
+def test_rollback_removes_added_sources(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [])
+    plan = dedup.assign("b.md", [INTRO], ["b1"], [])
+
+    assert dedup.rollback("b.md", plan) == {}
+    assert dedup.manifest.chunks["a1"].sources == ["a.md"]
+
+
+def test_source_metadata(dedup):
+    dedup.assign("docs/a.md", [INTRO], ["a1"], [])
+    dedup.assign("docs/b.md", [INTRO], ["b1"], [])
+    assert dedup.source_metadata("a1") == {
+        "sources": ["docs/a.md", "docs/b.md"],
+        "file_path": "docs/a.md",
+        "filename": "a.md"
+    }
+
+
+def provenance(content_type, section_path, tags):
+    return {"content_type": content_type, "section_path": section_path,
+            "chunk_index": 0, "total_chunks": 1, "tags": tags, "filename": "ignored"}
+
+
+def test_source_metadata_takes_provenance_from_primary_and_merges_tags(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [], [provenance("projects", "项目 > 简介", ["python"])])
+    dedup.assign("b.md", [INTRO], ["b1"], [], [provenance("skills", "技能", ["frontend", "python"])])
+
+    metadata = dedup.source_metadata("a1")
+    assert metadata["file_path"] == "a.md"
+    assert metadata["content_type"] == "projects" and metadata["section_path"] == "项目 > 简介"
+    assert metadata["tags"] == ["frontend", "python"]
+
+    # 主来源释放后，所有来源字段一起切换到新的主来源
+    dedup.release("a.md", ["a1"])
+    metadata = dedup.source_metadata("a1")
+    assert metadata["file_path"] == "b.md" and metadata["filename"] == "b.md"
+    assert metadata["content_type"] == "skills" and metadata["section_path"] == "技能"
+    assert metadata["tags"] == ["frontend", "python"]
+
+
+def test_rollback_restores_provenance(dedup):
+    dedup.assign("a.md", [INTRO], ["a1"], [], [provenance("projects", "旧章节", ["python"])])
+    dedup.assign("b.md", [INTRO], ["b1"], [], [provenance("skills", "技能", ["go"])])
+
+    # a.md 重新摄取(分块未变但章节路径变化)后失败：恢复原来的来源元数据
+    plan = dedup.assign("a.md", [INTRO], ["a1"], ["a1"], [provenance("projects", "新章节", ["rust"])])
+    assert dedup.source_metadata("a1")["section_path"] == "新章节"
+    dedup.rollback("a.md", plan)
+    assert dedup.source_metadata("a1")["section_path"] == "旧章节"
+    assert dedup.source_metadata("a1")["tags"] == ["go", "python"]
+
+    # b.md 撤销加入的来源时同时移除其来源元数据
+    plan = dedup.assign("c.md", [INTRO], ["c1"], [], [provenance("about", "关于", ["java"])])
+    dedup.rollback("c.md", plan)
+    assert set(dedup.manifest.chunks["a1"].provenance) == {"a.md", "b.md"}
@@ -0,0 +1,160 @@
+"""文档分块器测试"""
+
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.core.document_chunker import DocumentChunker
+
+
+@pytest.fixture
+def chunker(byte_encoding, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 120)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 20)
+    return DocumentChunker(byte_encoding)
+
+
+def token_count(chunker: DocumentChunker, text: str) -> int:
+    return len(chunker.encoding.encode(text))
+
+
+def test_short_text_is_single_chunk(chunker):
+    assert chunker.chunk_document("short note", Path("a.txt")) == [("", "short note")]
+    assert chunker.chunk_document("", Path("a.txt")) == []
+
+
+def test_chunks_respect_token_budget(chunker):
+    text = " ".join(f"Sentence number {i} talks about something." for i in range(60))
+    chunks = [chunk for _, chunk in chunker.chunk_document(text, Path("a.txt"))]
+
+    assert len(chunks) > 1
+    assert all(token_count(chunker, chunk) <= settings.CHUNK_SIZE for chunk in chunks)
+    # 所有句子都被覆盖
+    for i in range(60):
+        assert any(f"Sentence number {i} " in chunk for chunk in chunks)
+
+
+def test_cuts_at_sentence_boundaries_with_overlap(chunker, monkeypatch):
+    # 重叠窗口大于一个句子时，重叠部分从句子开头开始
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 40)
+    text = " ".join(f"Sentence number {i:02d} is here." for i in range(40))
+    chunks = [chunk for _, chunk in chunker.chunk_document(text, Path("a.txt"))]
+
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert all(chunk.startswith("Sentence") for chunk in chunks)
+    # 相邻分块有重叠
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split(".")[0] + "." in previous
+
+
+def test_prefers_paragraph_boundaries(chunker):
+    paragraphs = [f"Paragraph {i} " + "word " * 12 for i in range(6)]
+    chunks = [chunk for _, chunk in chunker.chunk_document("\n\n".join(paragraphs), Path("a.txt"))]
+    assert all(chunk.startswith("Paragraph") for chunk in chunks)
+
+
+def test_zero_overlap(chunker, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    text = " ".join(f"Sentence number {i:02d} is here." for i in range(40))
+    chunks = [chunk for _, chunk in chunker.chunk_document(text, Path("a.txt"))]
+    assert " ".join(chunks) == text
+
+
+def test_unbreakable_text_is_cut_exactly(chunker):
+    text = "x" * 1000
+    chunks = [chunk for _, chunk in chunker.chunk_document(text, Path("a.txt"))]
+    assert all(token_count(chunker, chunk) <= settings.CHUNK_SIZE for chunk in chunks)
+    assert chunks[0] == "x" * settings.CHUNK_SIZE
+
+
+def test_multibyte_text_is_not_split_inside_characters(chunker):
+    text = "。".join(f"这是第{i}句中文内容" for i in range(40)) + "。"
+    chunks = [chunk for _, chunk in chunker.chunk_document(text, Path("a.txt"))]
+    assert len(chunks) > 1
+    assert all("�" not in chunk for chunk in chunks)
+    assert all(token_count(chunker, chunk) <= settings.CHUNK_SIZE for chunk in chunks)
+
+
+def test_chunk_records(chunker):
+    documents, metadatas, ids = chunker.build_chunk_records(
+        Path("kb/skills.md"), [("技能", "重复内容"), ("技能", "重复内容"), ("", "Python FastAPI")]
+    )
+    assert documents == ["重复内容", "重复内容", "Python FastAPI"]
+    assert ids[1] == f"{ids[0]}_1" and ids[0].startswith("skills_")
+    assert metadatas[0]["content_type"] == "skills" and metadatas[0]["section_path"] == "技能"
+    assert metadatas[2]["total_chunks"] == 3 and metadatas[2]["chunk_index"] == 2
+
+
+def test_clean_content(chunker):
+    assert chunker.clean_content("a  \n\n\n\nb\r\nc\n") == "a\n\nb\nc"
+
+
+MARKDOWN = """前言段落
+
+# 技能
+## 后端
+Python FastAPI
+
+```
+# 代码中的注释不是标题
+```
+
+## 数据库
+### Redis
+缓存
+#### 细节
+深层标题留在正文中
+
+# 爱好
+摄影
+"""
+
+
+def test_markdown_sections_and_breadcrumbs(chunker):
+    chunks = chunker.chunk_document(MARKDOWN, Path("a.md"))
+    paths = [path for path, _ in chunks]
+    assert paths == ["", "技能 > 后端", "技能 > 数据库 > Redis", "爱好"]
+
+    texts = dict(chunks)
+    assert texts[""] == "前言段落"
+    assert texts["技能 > 后端"].startswith("# 技能\n## 后端\nPython FastAPI")
+    assert "# 代码中的注释不是标题" in texts["技能 > 后端"]
+    assert texts["技能 > 数据库 > Redis"].endswith("#### 细节\n深层标题留在正文中")
+    # 没有正文的标题只出现在子章节的面包屑里
+    assert "技能 > 数据库" not in paths
+
+
+def test_section_level_setting(chunker, monkeypatch):
+    monkeypatch.setattr(settings, "MARKDOWN_SECTION_LEVEL", 1)
+    paths = [path for path, _ in chunker.chunk_document(MARKDOWN, Path("a.md"))]
+    assert list(dict.fromkeys(paths)) == ["", "技能", "爱好"]
+
+
+def test_long_section_repeats_breadcrumb_within_budget(chunker):
+    body = " ".join(f"Sentence number {i:02d} is here." for i in range(30))
+    chunks = chunker.chunk_document(f"# 项目\n## 电商平台\n{body}", Path("a.md"))
+
+    assert len(chunks) > 1
+    for path, chunk in chunks:
+        assert path == "项目 > 电商平台"
+        assert chunk.startswith("# 项目\n## 电商平台\n")
+        assert token_count(chunker, chunk) <= settings.CHUNK_SIZE
+
+
+def test_long_breadcrumb_is_shortened_not_over_budget(chunker):
+    # 完整面包屑超过CHUNK_SIZE的1/4：省略外层标题，分块仍不超过CHUNK_SIZE
+    outer = "很长的外层标题" * 3
+    body = " ".join(f"Sentence number {i:02d} is here." for i in range(30))
+    chunks = chunker.chunk_document(f"# {outer}\n## 内层\n{body}", Path("a.md"))
+
+    for path, chunk in chunks:
+        assert path == f"{outer} > 内层"
+        assert chunk.startswith("## 内层\n") and outer not in chunk
+        assert token_count(chunker, chunk) <= settings.CHUNK_SIZE
+
+
+def test_oversized_heading_is_dropped_from_prefix(chunker):
+    heading = "超长标题" * 20
+    chunks = chunker.chunk_document(f"# {heading}\n正文内容", Path("a.md"))
+    assert chunks == [(heading, "正文内容")]
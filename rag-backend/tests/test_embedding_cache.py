@@ -0,0 +1,94 @@
+"""嵌入缓存和批处理器测试"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.config import settings
+from app.core import embedding_cache
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_cache import EmbeddingCache, close_embedding_cache
+
+
+class FakeClient:
+    """按文本长度生成向量的嵌入客户端"""
+
+    def __init__(self, encoding, cache_key: str = "onnx:model@aaaa"):
+        self.embedding_encoding = encoding
+        self.embedding_cache_key = cache_key
+        self.embedding_dimensions = None
+        self.requested: List[str] = []
+
+    def count_embedding_tokens(self, text: str) -> int:
+        return len(self.embedding_encoding.encode(text))
+
+    async def create_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        self.requested.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def cache_settings(tmp_path, monkeypatch):
+    close_embedding_cache()
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.db"))
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_MAX_MB", 1)
+    yield
+    close_embedding_cache()
+
+
+def test_cache_roundtrip_and_key_isolation(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db", 1024 * 1024)
+    text_hash = EmbeddingCache.hash_text("hello")
+    cache.put_many("onnx:model@aaaa", None, {text_hash: [0.5, 0.25]})
+
+    assert cache.get_many("onnx:model@aaaa", None, [text_hash]) == {text_hash: [0.5, 0.25]}
+    # 同名目录下的不同模型、不同维度互不命中
+    assert cache.get_many("onnx:model@bbbb", None, [text_hash]) == {}
+    assert cache.get_many("onnx:model@aaaa", 256, [text_hash]) == {}
+    cache.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db", 4 * 100 * 3)
+    for i in range(4):
+        cache.put_many("m", None, {f"h{i}": [0.0] * 100})
+    stats = cache.get_stats()
+    assert stats["evictions"] > 0 and stats["entries"] < 4
+    assert cache.get_many("m", None, ["h3"]) != {}
+    cache.close()
+
+
+def test_batcher_reuses_cached_vectors(cache_settings, byte_encoding):
+    client = FakeClient(byte_encoding)
+    batcher = EmbeddingBatcher(openai_client=client)
+
+    first = asyncio.run(batcher.embed(["alpha", "beta", "alpha"]))
+    assert client.requested == ["alpha", "beta"]
+    assert first[0] == first[2] == [5.0, 1.0]
+
+    client.requested.clear()
+    assert asyncio.run(batcher.embed(["beta"])) == [[4.0, 1.0]]
+    assert client.requested == []
+
+
+def test_batcher_keys_by_provider_identity(cache_settings, byte_encoding):
+    asyncio.run(EmbeddingBatcher(openai_client=FakeClient(byte_encoding, "onnx:model@aaaa")).embed(["alpha"]))
+
+    other = FakeClient(byte_encoding, "onnx:model@bbbb")
+    asyncio.run(EmbeddingBatcher(openai_client=other).embed(["alpha"]))
+    assert other.requested == ["alpha"]
+
+
+def test_batcher_survives_cache_close(cache_settings, byte_encoding):
+    client = FakeClient(byte_encoding)
+    batcher = EmbeddingBatcher(openai_client=client)
+    asyncio.run(batcher.embed(["alpha"]))
+
+    # 关闭后重新打开的缓存仍能命中持久化的向量
+    close_embedding_cache()
+    client.requested.clear()
+    assert asyncio.run(batcher.embed(["alpha"])) == [[5.0, 1.0]]
+    assert client.requested == []
+    assert embedding_cache.embedding_cache_instance is not None
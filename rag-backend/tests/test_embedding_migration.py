@@ -0,0 +1,73 @@
+"""嵌入迁移令牌桶测试"""
+
+import asyncio
+
+import pytest
+
+from app.core import embedding_migration
+from app.core.embedding_migration import TokenBucket
+
+
+class FakeClock:
+    """可控的单调时钟，sleep只推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_migration.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(embedding_migration.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_within_capacity_does_not_wait(clock):
+    bucket = TokenBucket(600)
+    asyncio.run(bucket.acquire(600))
+    assert clock.now == 0.0 and bucket.waited_seconds == 0.0
+
+
+def test_waits_for_refill(clock):
+    bucket = TokenBucket(600)
+
+    async def run():
+        await bucket.acquire(600)
+        await bucket.acquire(100)
+
+    asyncio.run(run())
+    # 600/min = 10/s，补足100个令牌需要10秒
+    assert clock.now == pytest.approx(10.0)
+    assert bucket.waited_seconds == pytest.approx(10.0)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(60)
+        clock.now += 600
+        await bucket.acquire(60)
+        await bucket.acquire(30)
+
+    asyncio.run(run())
+    assert bucket.waited_seconds == pytest.approx(30.0)
+
+
+def test_oversized_request_counts_as_capacity(clock):
+    bucket = TokenBucket(60)
+    asyncio.run(bucket.acquire(10_000))
+    assert bucket.waited_seconds == 0.0
+
+
+def test_zero_budget_is_unlimited(clock):
+    bucket = TokenBucket(0)
+    asyncio.run(bucket.acquire(10_000))
+    assert bucket.waited_seconds == 0.0
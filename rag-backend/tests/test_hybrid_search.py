@@ -0,0 +1,174 @@
+"""混合检索(BM25 + 向量)测试"""
+
+import asyncio
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.core import vector_store as vector_store_module
+from app.core.vector_backends.numpy_backend import NumpyCollection
+from app.core.vector_store import VectorStore
+
+DIM = 4
+
+
+def unit(*weights: float) -> List[float]:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[:len(weights)] = weights
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeQueryEmbeddings:
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    async def embed(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_SEARCH_ENABLED", True)
+    monkeypatch.setattr(settings, "LEXICAL_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(settings, "LEXICAL_MIN_COVERAGE", 0.0)
+    monkeypatch.setattr(settings, "HIERARCHICAL_SEARCH_ENABLED", False)
+    monkeypatch.setattr(settings, "NUMPY_INDEX_MODE", "exact")
+    monkeypatch.setattr(settings, "NUMPY_QUANTIZATION", "none")
+    stores = []
+
+    def make(rows, queries: Dict[str, List[float]]) -> VectorStore:
+        """rows: [(id, 文本, 向量)]"""
+        monkeypatch.setattr(
+            vector_store_module, "get_query_embedding_cache", lambda: FakeQueryEmbeddings(queries)
+        )
+        store = VectorStore()
+        store.collection = NumpyCollection(tmp_path / f"c{len(stores)}")
+        ids = [chunk_id for chunk_id, _, _ in rows]
+        documents = [document for _, document, _ in rows]
+        metadatas = [{"filename": f"{chunk_id}.md"} for chunk_id in ids]
+        store.collection.upsert(ids, [vector for _, _, vector in rows], documents, metadatas)
+        store.lexical_index.add(ids, documents, metadatas)
+        store._initialized = True
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.collection.close()
+
+
+def search(store: VectorStore, query: str, n_results: int = 3):
+    return asyncio.run(store.search(query, n_results=n_results))
+
+
+def test_lexical_only_hits_carry_cosine_not_coverage(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.7)
+    monkeypatch.setattr(settings, "MMR_ENABLED", False)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", False)
+    store = make_store([
+        ("dense", "个人简介和联系方式", unit(1, 0)),
+        # 只被词法召回：与查询向量的余弦为0.6，低于向量阈值
+        ("lexical", "kubernetes operator", unit(0.6, 0.8)),
+    ], {"kubernetes operator": unit(1, 0)})
+
+    results = {result.source: result for result in search(store, "kubernetes operator")}
+    assert set(results) == {"dense.md", "lexical.md"}
+    assert results["lexical.md"].similarity == pytest.approx(0.6, abs=1e-5)
+    assert results["dense.md"].similarity == pytest.approx(1.0, abs=1e-5)
+    # 融合分数单独保存
+    assert results["lexical.md"].rrf_score == pytest.approx(1.0 / (settings.HYBRID_RRF_K + 1))
+    assert results["dense.md"].rrf_score == pytest.approx(1.0 / (settings.HYBRID_RRF_K + 1))
+
+
+def test_dense_only_search_has_no_rrf_score(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_SEARCH_ENABLED", False)
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.0)
+    store = make_store([("a", "alpha", unit(1, 0))], {"q": unit(1, 0)})
+    [result] = search(store, "q")
+    assert result.rrf_score is None and result.similarity == pytest.approx(1.0, abs=1e-5)
+
+
+def test_tag_boost_reorders_without_filtering(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_SEARCH_ENABLED", False)
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.0)
+    monkeypatch.setattr(settings, "MMR_ENABLED", False)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", False)
+    monkeypatch.setattr(settings, "QUERY_ROUTER_TAG_BOOST", 0.2)
+    store = make_store([
+        ("plain", "a", unit(1, 0.3)),
+        ("tagged", "b", unit(1, 0.5)),
+        ("other", "c", unit(0, 1)),
+    ], {"q": unit(1, 0)})
+    store.collection.update_metadatas(["tagged"], [{"tags": ["react"]}])
+
+    assert [r.source for r in search(store, "q")] == ["plain.md", "tagged.md", "other.md"]
+    results = asyncio.run(store.search("q", n_results=3, boost_tags=["react"]))
+    assert [r.source for r in results] == ["tagged.md", "plain.md", "other.md"]
+    # 加权只影响排序，报告的仍是余弦相似度
+    assert results[0].similarity == pytest.approx(float(np.dot(unit(1, 0.5), unit(1, 0))), abs=1e-5)
+
+
+def test_keyword_check_and_search_share_one_bm25_pass(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_FAST_PATH_ENABLED", True)
+    store = make_store([("a", "fastapi backend", unit(1, 0))], {})
+    calls = []
+    search_lexical = store.lexical_index.search
+    monkeypatch.setattr(
+        store.lexical_index, "search", lambda *args: calls.append(args) or search_lexical(*args)
+    )
+
+    assert store.answers_lexically("fastapi")
+    [result] = search(store, "fastapi", n_results=settings.TOP_K_RESULTS)
+    assert result.source == "a.md" and len(calls) == 1
+
+    # 索引变化后不复用
+    asyncio.run(store.update_metadatas(["a"], [{"filename": "b.md"}]))
+    assert search(store, "fastapi")[0].source == "b.md" and len(calls) == 2
+
+
+def test_partition_sizes_from_bitmaps_or_lexical_index(make_store):
+    store = make_store([("a", "x", unit(1, 0)), ("b", "y", unit(0, 1))], {})
+    asyncio.run(store.update_metadatas(
+        ["a", "b"], [{"content_type": "skills", "tags": ["python"]}, {"content_type": "skills"}]
+    ))
+    assert store.partition_sizes("content_type") == {"skills": 2}
+    assert store.partition_sizes("tags") == {"python": 1}
+
+    # 没有分区位图的后端按词法索引中的元数据统计
+    assert store.lexical_index.partition_sizes("content_type") == {"skills": 2}
+    assert store.lexical_index.partition_sizes("tags") == {"python": 1}
+
+
+def test_fused_candidates_are_cut_off_by_cosine(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.7)
+    monkeypatch.setattr(settings, "MMR_ENABLED", False)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", True)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_MIN_RESULTS", 1)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_MIN_GAP", 0.15)
+    store = make_store([
+        ("near", "个人简介", unit(1, 0)),
+        ("close", "联系方式", unit(1, 0.2)),
+        # 词法召回排名第一，但与问题语义无关
+        ("far", "kubernetes kubernetes", unit(0.1, 1)),
+    ], {"kubernetes": unit(1, 0)})
+
+    assert [r.source for r in search(store, "kubernetes")] == ["near.md", "close.md"]
+
+
+def test_rrf_rank_breaks_cosine_ties(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.0)
+    monkeypatch.setattr(settings, "MMR_ENABLED", True)
+    monkeypatch.setattr(settings, "MMR_LAMBDA", 0.7)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", True)
+    store = make_store([
+        ("dense_only", "个人简介", unit(1, 0.5)),
+        # 与上一条向量相同，另外被词法召回，融合名次更高
+        ("both", "python fastapi", unit(1, 0.5)),
+        ("other", "摄影", unit(0, 1)),
+    ], {"python": unit(1, 0.5)})
+
+    results = search(store, "python")
+    assert results[0].source == "both.md"
+    assert results[0].rrf_score > results[1].rrf_score
@@ -0,0 +1,65 @@
+"""索引清单测试"""
+
+import json
+import os
+
+from app.core.index_manifest import IndexManifest, FileRecord, ChunkRecord, MANIFEST_VERSION
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = tmp_path / "manifests" / "personal_knowledge.json"
+    manifest = IndexManifest(path)
+    manifest.set("a.md", FileRecord(mtime=1.5, size=10, sha256="abc", chunk_ids=["a1"]))
+    manifest.chunks["a1"] = ChunkRecord(fingerprint="00ff", sources=["a.md"])
+    manifest.save()
+    assert not path.with_suffix(".json.tmp").exists()
+
+    loaded = IndexManifest(path)
+    loaded.load()
+    assert loaded.get("a.md") == FileRecord(mtime=1.5, size=10, sha256="abc", chunk_ids=["a1"])
+    assert loaded.chunks == {"a1": ChunkRecord(fingerprint="00ff", sources=["a.md"])}
+
+
+def test_load_ignores_version_mismatch(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({
+        "version": MANIFEST_VERSION - 1,
+        "files": {"a.md": {"mtime": 1.0, "size": 1, "sha256": "x", "chunk_ids": []}}
+    }), encoding="utf-8")
+
+    manifest = IndexManifest(path)
+    manifest.load()
+    assert manifest.files == {} and manifest.chunks == {}
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    manifest = IndexManifest(tmp_path / "missing.json")
+    manifest.load()
+    assert manifest.files == {}
+
+    path = tmp_path / "corrupt.json"
+    path.write_text("{not json", encoding="utf-8")
+    manifest = IndexManifest(path)
+    manifest.load()
+    assert manifest.files == {} and manifest.chunks == {}
+
+
+def test_matches_stat(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text("hello", encoding="utf-8")
+    stat = os.stat(path)
+    record = FileRecord(mtime=stat.st_mtime, size=stat.st_size, sha256=IndexManifest.hash_content(b"hello"))
+    assert record.matches_stat(stat)
+    assert not FileRecord(mtime=stat.st_mtime, size=stat.st_size + 1, sha256="").matches_stat(stat)
+
+
+def test_remove_clear_delete(tmp_path):
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    manifest.set("a.md", FileRecord(mtime=1.0, size=1, sha256="x"))
+    assert manifest.remove("a.md").sha256 == "x"
+    assert manifest.remove("a.md") is None
+
+    manifest.set("b.md", FileRecord(mtime=1.0, size=1, sha256="y"))
+    manifest.save()
+    manifest.delete()
+    assert manifest.files == {} and not manifest.path.exists()
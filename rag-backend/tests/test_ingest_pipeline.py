@@ -0,0 +1,251 @@
+"""文档摄取流水线测试"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import pytest
+
+from app.config import settings
+from app.core import ingest_pipeline
+from app.core.document_chunker import DocumentChunker
+from app.core.index_manifest import IndexManifest
+from app.core.ingest_pipeline import IngestPipeline
+
+
+class FakeBatcher:
+    """按文本长度生成一维向量的嵌入批处理器"""
+
+    max_batch_tokens = 10_000
+
+    def __init__(self):
+        self.calls: List[int] = []
+        self.fail_on: Optional[str] = None
+
+    def count_tokens(self, text: str) -> int:
+        return len(text)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(len(texts))
+        if self.fail_on and any(self.fail_on in text for text in texts):
+            raise RuntimeError("embed boom")
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorStore:
+    """内存向量库"""
+
+    collection_name = "test"
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.documents_index: Dict[str, List[str]] = {}
+        self.fail_on: Optional[str] = None
+
+    async def upsert_documents(self, documents, metadatas, ids, embeddings=None):
+        if self.fail_on and any(metadata["filename"] == self.fail_on for metadata in metadatas):
+            raise RuntimeError("write boom")
+        for document, metadata, chunk_id, embedding in zip(documents, metadatas, ids, embeddings):
+            self.rows[chunk_id] = {"document": document, "metadata": metadata, "embedding": embedding}
+
+    async def update_metadatas(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.rows[chunk_id]["metadata"] = {**self.rows[chunk_id]["metadata"], **metadata}
+
+    async def delete_documents(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+    async def index_document(self, file_path, chunk_ids):
+        self.documents_index[file_path] = list(chunk_ids)
+
+
+class FakeProcessor:
+    def __init__(self, chunker: DocumentChunker):
+        self.chunker = chunker
+
+    def _read_raw_document(self, doc_path: Path) -> bytes:
+        return doc_path.read_bytes()
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    batcher = FakeBatcher()
+    monkeypatch.setattr(ingest_pipeline, "get_embedding_batcher", lambda: batcher)
+    monkeypatch.setattr(settings, "INGEST_PROCESS_WORKERS", 0)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_LINGER_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", False)
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    return batcher
+
+
+@pytest.fixture
+def processor(byte_encoding):
+    return FakeProcessor(DocumentChunker(byte_encoding))
+
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "about.md").write_text("# 关于\n## 简介\n全栈开发者\n## 爱好\n摄影和徒步\n", encoding="utf-8")
+    (kb / "skills.md").write_text("# 技能\n## 后端\nPython FastAPI\n## 数据库\nPostgreSQL Redis\n", encoding="utf-8")
+    (kb / "notes.txt").write_text("plain text notes", encoding="utf-8")
+    return kb
+
+
+def run(pipeline: IngestPipeline, kb: Path) -> Dict[str, Any]:
+    return asyncio.run(pipeline.run(sorted(kb.iterdir())))
+
+
+def test_full_run_writes_every_document(batcher, processor, knowledge_base, tmp_path):
+    store = FakeVectorStore()
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    report = run(IngestPipeline(processor, store, manifest), knowledge_base)
+
+    assert report["added"] == 3 and report["documents"] == 3
+    assert report["chunks_upserted"] == len(store.rows) == 5
+    assert list(report["stages"]) == IngestPipeline.STAGES
+    assert all(stage["processed"] == 3 for stage in report["stages"].values())
+    assert set(manifest.files) == {str(path) for path in knowledge_base.iterdir()}
+    for record in manifest.files.values():
+        assert all(chunk_id in store.rows for chunk_id in record.chunk_ids)
+    # 向量与分块一一对应
+    assert all(row["embedding"] == [float(len(row["document"]))] for row in store.rows.values())
+
+
+def test_incremental_run_skips_unchanged_and_replaces_edited(batcher, processor, knowledge_base, tmp_path):
+    store = FakeVectorStore()
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    run(IngestPipeline(processor, store, manifest), knowledge_base)
+    batcher.calls.clear()
+
+    # 只修改mtime
+    about = knowledge_base / "about.md"
+    os.utime(about, (1, 1))
+    report = run(IngestPipeline(processor, store, manifest, incremental=True), knowledge_base)
+    assert report["unchanged"] == 3 and batcher.calls == []
+    assert manifest.get(str(about)).mtime == 1
+
+    # 修改一个章节：只向量化新分块，删除旧分块
+    about.write_text("# 关于\n## 简介\n全栈开发者\n## 爱好\n音乐\n", encoding="utf-8")
+    old_ids = set(store.rows)
+    report = run(IngestPipeline(processor, store, manifest, incremental=True), knowledge_base)
+    assert report["updated"] == 1 and report["unchanged"] == 2
+    assert report["chunks_upserted"] == 1 and report["chunks_deleted"] == 1
+    assert len(old_ids - set(store.rows)) == 1
+    assert any("音乐" in row["document"] for row in store.rows.values())
+
+
+def test_backpressure_with_single_slot_queues(batcher, processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_QUEUE_SIZE", 1)
+    kb = tmp_path / "many"
+    kb.mkdir()
+    for i in range(20):
+        (kb / f"doc{i:02d}.txt").write_text(f"document {i}", encoding="utf-8")
+
+    store = FakeVectorStore()
+    report = run(IngestPipeline(processor, store, IndexManifest(tmp_path / "m.json")), kb)
+    assert report["added"] == 20 and len(store.rows) == 20
+    # 嵌入阶段跨文档合并请求
+    assert sum(batcher.calls) == 20 and len(batcher.calls) < 20
+
+
+def test_failed_document_does_not_stop_pipeline(batcher, processor, knowledge_base, tmp_path):
+    store = FakeVectorStore()
+    store.fail_on = "skills.md"
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    report = run(IngestPipeline(processor, store, manifest), knowledge_base)
+
+    assert report["added"] == 2
+    assert report["stages"]["write"]["failed"] == 1
+    assert str(knowledge_base / "skills.md") not in manifest.files
+    assert all(row["metadata"]["filename"] != "skills.md" for row in store.rows.values())
+    # 清单中没有未写入的分块
+    assert set(manifest.chunks) == set(store.rows)
+
+    # 下次增量同步重新处理失败的文件
+    store.fail_on = None
+    report = run(IngestPipeline(processor, store, manifest, incremental=True), knowledge_base)
+    assert report["added"] == 1 and report["unchanged"] == 2
+    assert set(manifest.chunks) == set(store.rows)
+
+
+def test_empty_document_is_dropped(batcher, processor, tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "empty.md").write_text("\n\n  \n", encoding="utf-8")
+    store = FakeVectorStore()
+    report = run(IngestPipeline(processor, store, IndexManifest(tmp_path / "m.json")), kb)
+    assert report["added"] == 0 and report["stages"]["clean"]["dropped"] == 1
+    assert store.rows == {}
+
+
+INTRO = "我是一名全栈开发者，主要使用Python和TypeScript"
+
+
+@pytest.fixture
+def duplicated_kb(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", True)
+    monkeypatch.setattr(settings, "NEAR_DUP_MAX_DISTANCE", 6)
+    kb = tmp_path / "dup"
+    kb.mkdir()
+    (kb / "backend_projects.md").write_text(f"# 后端项目\n## 简介\n{INTRO}\n## 订单\n订单服务重构\n", encoding="utf-8")
+    (kb / "frontend_skills.md").write_text(f"# 前端技能\n{INTRO}\n", encoding="utf-8")
+    return kb
+
+
+def shared_chunk(store: FakeVectorStore) -> Dict[str, Any]:
+    return next(row for row in store.rows.values() if INTRO in row["document"])
+
+
+def test_near_duplicate_metadata_follows_primary_source(batcher, processor, duplicated_kb, tmp_path):
+    store = FakeVectorStore()
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    report = run(IngestPipeline(processor, store, manifest), duplicated_kb)
+    assert report["chunks_merged"] == 1 and len(store.rows) == 2
+
+    metadata = shared_chunk(store)["metadata"]
+    assert metadata["filename"] == "backend_projects.md"
+    assert metadata["content_type"] == "projects" and metadata["section_path"] == "后端项目 > 简介"
+    assert metadata["tags"] == ["backend", "frontend", "python", "typescript"]
+
+    # 主来源不再包含该分块：文件路径、内容类型和章节路径一起切换到另一个来源
+    (duplicated_kb / "backend_projects.md").write_text("# 后端项目\n## 订单\n订单服务重构\n", encoding="utf-8")
+    run(IngestPipeline(processor, store, manifest, incremental=True), duplicated_kb)
+
+    metadata = shared_chunk(store)["metadata"]
+    assert metadata["sources"] == [str(duplicated_kb / "frontend_skills.md")]
+    assert metadata["filename"] == "frontend_skills.md"
+    assert metadata["content_type"] == "skills" and metadata["section_path"] == "前端技能"
+    assert metadata["tags"] == ["frontend", "python", "typescript"]
+
+
+@pytest.mark.parametrize("stage", ["embed", "write"])
+def test_failed_primary_rolls_back_merged_sources(batcher, processor, duplicated_kb, tmp_path, stage):
+    store = FakeVectorStore()
+    manifest = IndexManifest(tmp_path / "manifest.json")
+    if stage == "embed":
+        batcher.fail_on = "订单服务"
+    else:
+        store.fail_on = "backend_projects.md"
+
+    report = run(IngestPipeline(processor, store, manifest), duplicated_kb)
+    assert report["stages"][stage]["failed"] >= 1
+    assert str(duplicated_kb / "backend_projects.md") not in manifest.files
+    # 撤销后清单中没有未写入的分块；合并到被撤销分块的文件下次重新处理，
+    # 先于失败文件写入(自身为主来源)的文件保持已索引
+    assert set(manifest.chunks) <= set(store.rows)
+    skills = manifest.get(str(duplicated_kb / "frontend_skills.md"))
+    if skills is not None and skills.sha256:
+        assert skills.chunk_ids and all(chunk_id in store.rows for chunk_id in skills.chunk_ids)
+        assert shared_chunk(store)["metadata"]["filename"] == "frontend_skills.md"
+
+    batcher.fail_on = store.fail_on = None
+    run(IngestPipeline(processor, store, manifest, incremental=True), duplicated_kb)
+    assert set(manifest.files) == {str(path) for path in duplicated_kb.iterdir()}
+    assert set(manifest.chunks) == set(store.rows)
+    for record in manifest.files.values():
+        assert all(chunk_id in store.rows for chunk_id in record.chunk_ids)
@@ -0,0 +1,92 @@
+"""知识库监听器测试"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+import pytest
+
+from app.config import settings
+from app.core.kb_watcher import KnowledgeBaseWatcher
+
+
+class FakeProcessor:
+    """记录同步调用的文档处理器，按预设结果依次返回或抛出异常"""
+
+    supported_extensions = {".md", ".txt"}
+
+    def __init__(self, results: List[Any]):
+        self.results = results
+        self.calls: List[List[Path]] = []
+
+    def _find_documents(self, path: Path) -> List[Path]:
+        return sorted(path.rglob("*.md"))
+
+    async def sync_documents(self, knowledge_path, vector_store) -> Dict[str, Any]:
+        return {"failed_paths": []}
+
+    async def sync_paths(self, paths, vector_store) -> Dict[str, Any]:
+        self.calls.append(list(paths))
+        result = self.results.pop(0) if self.results else {"failed_paths": []}
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture(autouse=True)
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(settings, "KB_WATCH_DEBOUNCE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "KB_WATCH_MAX_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "KB_WATCH_RETRY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "KB_WATCH_RETRY_MAX_SECONDS", 0.08)
+
+
+async def run_until(watcher: KnowledgeBaseWatcher, processor: FakeProcessor, calls: int, changes):
+    task = asyncio.create_task(watcher._sync_loop())
+    watcher._enqueue(changes)
+    deadline = time.monotonic() + 2
+    while len(processor.calls) < calls and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    watcher._stop.set()
+    watcher._changed.set()
+    await asyncio.wait_for(task, 1)
+
+
+def test_failed_sync_is_retried_with_backoff(tmp_path):
+    processor = FakeProcessor([RuntimeError("embedding API down"), RuntimeError("still down")])
+    watcher = KnowledgeBaseWatcher(tmp_path, processor, None)
+    changed = {tmp_path / "a.md", tmp_path / "b.md"}
+
+    started = time.monotonic()
+    asyncio.run(run_until(watcher, processor, 3, changed))
+
+    assert len(processor.calls) == 3
+    assert all(set(call) == changed for call in processor.calls)
+    # 第一次重试等待0.05s，第二次翻倍后受上限0.08s限制
+    assert time.monotonic() - started >= 0.13
+    stats = watcher.get_stats()
+    assert stats["errors"] == 2 and stats["retries"] == 2
+    assert stats["queue_depth"] == 0 and watcher._failures == 0
+
+
+def test_only_failed_paths_are_requeued(tmp_path):
+    processor = FakeProcessor([{"failed_paths": [str(tmp_path / "b.md")]}])
+    watcher = KnowledgeBaseWatcher(tmp_path, processor, None)
+
+    asyncio.run(run_until(watcher, processor, 2, {tmp_path / "a.md", tmp_path / "b.md"}))
+
+    assert processor.calls[1] == [tmp_path / "b.md"]
+    assert watcher.get_stats()["retries"] == 1
+
+
+def test_directories_are_relevant(tmp_path):
+    watcher = KnowledgeBaseWatcher(tmp_path, FakeProcessor([]), None)
+    moved_in = tmp_path / "projects"
+    moved_in.mkdir()
+    (tmp_path / "image.png").write_bytes(b"")
+
+    assert watcher._is_relevant(moved_in)
+    assert watcher._is_relevant(tmp_path / "deleted_dir")
+    assert watcher._is_relevant(tmp_path / "a.md")
+    assert not watcher._is_relevant(tmp_path / "image.png")
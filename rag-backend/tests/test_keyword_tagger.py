@@ -0,0 +1,58 @@
+"""关键词标签器测试"""
+
+import pytest
+
+from app.core.keyword_tagger import KeywordMatcher, KeywordTagger, DEFAULT_KEYWORDS_FILE
+
+
+@pytest.fixture(scope="module")
+def tagger():
+    return KeywordTagger(DEFAULT_KEYWORDS_FILE)
+
+
+@pytest.mark.parametrize("text", [
+    "I googled it",
+    "a good day",
+    "algorithm and gorilla",
+    "cargo build",
+    "javascript only",
+])
+def test_ascii_boundaries_reject_partial_words(tagger, text):
+    assert "go" not in tagger.tag_content(text)
+    assert "java" not in tagger.tag_content(text)
+
+
+@pytest.mark.parametrize("text", [
+    "I write Go.",
+    "熟悉Go语言并发",
+    "用go开发微服务",
+    "Golang developer",
+    "(go)",
+])
+def test_go_matches_standalone_and_mixed_script(tagger, text):
+    assert "go" in tagger.tag_content(text)
+
+
+def test_longest_alias_wins(tagger):
+    assert tagger.tag_content("Node.js and Vue.js") == {"node.js", "vue"}
+    assert tagger.tag_content("React.js with reactjs") == {"react"}
+    assert tagger.tag_content("node") == set()
+
+
+def test_multiple_tags_case_insensitive(tagger):
+    assert tagger.tag_content("PYTHON, FastAPI, K8S 和 Postgres") == {
+        "python", "fastapi", "kubernetes", "postgresql"
+    }
+
+
+def test_filename_and_query_matchers(tagger):
+    assert tagger.tag_filename("frontend-react.md") == {"frontend", "react"}
+    assert tagger.tag_filename("后端笔记.md") == {"backend"}
+    assert tagger.tag_query_content_types("你的技术栈和联系方式?") == {"skills", "contact"}
+
+
+def test_trie_pattern_shares_prefixes():
+    matcher = KeywordMatcher({"node": ["no"], "nodejs": ["node.js"]})
+    assert matcher.match("no node node.js nodes") == {"node", "nodejs"}
+    assert KeywordMatcher({}).match("anything") == set()
+    assert KeywordMatcher({"x": []}).match("") == set()
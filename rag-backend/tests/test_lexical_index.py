@@ -0,0 +1,75 @@
+"""BM25词法索引测试"""
+
+import pytest
+
+from app.core.lexical_index import LexicalIndex, tokenize
+
+
+@pytest.fixture
+def index():
+    index = LexicalIndex()
+    index.build([
+        ("s1", "熟悉 FastAPI 和 Kubernetes 部署", {"file_path": "skills.md", "category": "skills"}),
+        ("s2", "PostgreSQL、Redis 数据库调优", {"file_path": "skills.md", "category": "skills"}),
+        ("h1", "周末喜欢摄影和徒步", {"file_path": "about.md", "category": "hobby"}),
+    ])
+    return index
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("ＦａｓｔＡＰＩ v2") == ["fastapi", "v2"]
+    assert tokenize("摄影和徒步") == ["摄影", "影和", "和徒", "徒步"]
+    assert tokenize("我") == ["我"]
+    assert tokenize("，。!") == []
+
+
+def test_search_ranks_exact_term(index):
+    hits = index.search("fastapi", n_results=3)
+    assert [hit.id for hit in hits] == ["s1"]
+    assert hits[0].coverage == pytest.approx(1.0)
+    assert hits[0].metadata["file_path"] == "skills.md"
+
+
+def test_search_partial_coverage(index):
+    hits = index.search("Redis 摄影", n_results=3)
+    assert {hit.id for hit in hits} == {"s2", "h1"}
+    assert all(0 < hit.coverage < 1 for hit in hits)
+
+
+def test_search_where_filter(index):
+    assert index.search("摄影 redis", n_results=3, where={"category": "hobby"})[0].id == "h1"
+    assert len(index.search("摄影 redis", n_results=3, where={"category": "hobby"})) == 1
+
+
+def test_search_no_match(index):
+    assert index.search("rust", n_results=3) == []
+    assert index.search("", n_results=3) == []
+    assert LexicalIndex().search("fastapi", n_results=3) == []
+
+
+def test_add_overwrites_and_remove(index):
+    index.add(["s1"], ["Go 和 gRPC"], [{"file_path": "skills.md"}])
+    assert len(index) == 3
+    assert index.search("fastapi", n_results=3) == []
+    assert index.search("grpc", n_results=3)[0].id == "s1"
+
+    index.remove(["s1", "missing"])
+    assert "s1" not in index and len(index) == 2
+    assert index.search("grpc", n_results=3) == []
+
+
+def test_update_metadatas(index):
+    index.update_metadatas(["h1"], [{"file_path": "life.md", "category": "hobby"}])
+    assert index.search("徒步", n_results=1)[0].metadata["file_path"] == "life.md"
+
+
+def test_clear_and_stats(index):
+    stats = index.get_stats()
+    assert stats["documents"] == 3 and stats["terms"] > 0
+    index.clear()
+    assert len(index) == 0
+    assert index.get_stats()["avg_document_length"] == 0.0
+
+
+def test_query_term_count():
+    assert LexicalIndex().query_term_count("FastAPI fastapi 摄影") == 2
@@ -0,0 +1,227 @@
+"""NumPy向量后端测试"""
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.core.vector_backends.numpy_backend import NumpyBackend, NumpyCollection
+
+DIM = 8
+
+
+def unit(*hot: int) -> list:
+    vector = [0.0] * DIM
+    for i in hot:
+        vector[i] = 1.0
+    return vector
+
+
+def add(collection: NumpyCollection, rows):
+    """rows: [(id, 向量, 元数据)]"""
+    collection.upsert(
+        [chunk_id for chunk_id, _, _ in rows],
+        [vector for _, vector, _ in rows],
+        [f"doc {chunk_id}" for chunk_id, _, _ in rows],
+        [metadata for _, _, metadata in rows]
+    )
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_INDEX_MODE", "exact")
+    monkeypatch.setattr(settings, "NUMPY_QUANTIZATION", "none")
+    collection = NumpyCollection(tmp_path / "c")
+    add(collection, [
+        ("a", unit(0), {"content_type": "skills", "tags": ["python"], "chunk_index": 0}),
+        ("b", unit(0, 1), {"content_type": "projects", "tags": ["python", "react"], "chunk_index": 1}),
+        ("c", unit(2), {"content_type": "about", "chunk_index": 2}),
+    ])
+    yield collection
+    collection.close()
+
+
+def test_exact_query_orders_by_cosine(collection):
+    hits = collection.query(unit(0), 3)
+    assert [hit.id for hit in hits] == ["a", "b", "c"]
+    assert hits[0].similarity == pytest.approx(1.0)
+    assert hits[1].similarity == pytest.approx(1 / np.sqrt(2))
+    assert hits[2].similarity == pytest.approx(0.0)
+    assert hits[1].metadata["content_type"] == "projects"
+
+
+def test_upsert_replaces_and_delete_reuses_slots(collection):
+    add(collection, [("a", unit(3), {"content_type": "skills"})])
+    assert collection.count() == 3
+    assert collection.query(unit(3), 1)[0].id == "a"
+    assert collection.get_documents(["a"]) == {"a": "doc a"}
+
+    collection.delete(["a", "missing"])
+    assert collection.count() == 2
+    assert "a" not in [hit.id for hit in collection.query(unit(3), 3)]
+
+    add(collection, [("d", unit(4), {})])
+    assert collection.query(unit(4), 1)[0].id == "d"
+    np.testing.assert_allclose(collection.get_embeddings(["d"])[0], unit(4))
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"content_type": "skills"}, {"a"}),
+    ({"content_type": {"$in": ["skills", "about"]}}, {"a", "c"}),
+    ({"tags": {"$contains": "react"}}, {"b"}),
+    ({"$or": [{"content_type": "about"}, {"tags": {"$contains": "react"}}]}, {"b", "c"}),
+    ({"$and": [{"tags": {"$contains": "python"}}, {"content_type": "projects"}]}, {"b"}),
+    # 位图无法表达的条件逐行匹配
+    ({"content_type": {"$ne": "skills"}}, {"b", "c"}),
+    ({"chunk_index": {"$gte": 1}}, {"b", "c"}),
+])
+def test_where_filters(collection, where, expected):
+    assert {hit.id for hit in collection.query(unit(0), 10, where=where)} == expected
+
+
+def test_partitions_follow_metadata_updates(collection):
+    collection.update_metadatas(["a"], [{"content_type": "about", "tags": ["go"]}])
+    assert {hit.id for hit in collection.query(unit(0), 10, where={"content_type": "about"})} == {"a", "c"}
+    assert collection.query(unit(0), 10, where={"tags": {"$contains": "python"}})[0].id == "b"
+
+
+def test_query_restricted_to_ids(collection):
+    hits = collection.query(unit(0), 10, ids=["b", "c", "missing"])
+    assert [hit.id for hit in hits] == ["b", "c"]
+
+
+def test_dimension_mismatch(collection):
+    with pytest.raises(ValueError):
+        add(collection, [("x", [1.0, 0.0], {})])
+    with pytest.raises(ValueError):
+        collection.query([1.0, 0.0], 1)
+
+
+def test_grows_past_initial_capacity(collection):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(600, DIM)).astype(np.float32)
+    add(collection, [(f"r{i}", vector.tolist(), {}) for i, vector in enumerate(vectors)])
+    assert collection.count() == 603
+    assert collection.query(vectors[123].tolist(), 1)[0].id == "r123"
+
+
+def test_persists_across_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_QUANTIZATION", "none")
+    backend = NumpyBackend(tmp_path)
+    collection = backend.create_collection("kb")
+    add(collection, [("a", unit(0), {"content_type": "skills", "tags": ["python"]})])
+    collection.set_embedding_signature("model-x", DIM)
+    backend.close()
+
+    backend = NumpyBackend(tmp_path)
+    assert backend.list_collections() == ["kb"]
+    collection = backend.get_collection("kb")
+    hits = collection.query(unit(0), 1, where={"tags": {"$contains": "python"}})
+    assert [hit.id for hit in hits] == ["a"]
+    assert collection.get_embedding_signature() == {"embedding_model": "model-x", "embedding_dimensions": DIM}
+
+    with pytest.raises(ValueError):
+        backend.create_collection("kb")
+    backend.delete_collection("kb")
+    assert backend.list_collections() == [] and backend.get_collection("kb") is None
+    backend.close()
+
+
+def random_rows(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def exact_top(vectors: np.ndarray, query: np.ndarray, k: int) -> list:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"r{i}" for i in np.argsort(-(normalized @ query))[:k]]
+
+
+@pytest.fixture
+def ivf_settings(monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_QUANTIZATION", "none")
+    monkeypatch.setattr(settings, "NUMPY_INDEX_MODE", "ivf")
+    monkeypatch.setattr(settings, "NUMPY_IVF_MIN_VECTORS", 200)
+    monkeypatch.setattr(settings, "NUMPY_IVF_NLIST", 8)
+
+
+def test_ivf_trains_after_min_vectors(tmp_path, ivf_settings):
+    collection = NumpyCollection(tmp_path / "c")
+    vectors = random_rows(300)
+    add(collection, [(f"r{i}", v.tolist(), {}) for i, v in enumerate(vectors[:100])])
+    assert not collection.get_stats()["ivf_trained"]
+
+    add(collection, [(f"r{i}", v.tolist(), {}) for i, v in enumerate(vectors[100:], start=100)])
+    assert collection.get_stats()["ivf_trained"]
+    collection.close()
+
+
+def test_ivf_probing_every_list_is_exact(tmp_path, ivf_settings, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_IVF_NPROBE", 8)
+    collection = NumpyCollection(tmp_path / "c")
+    vectors = random_rows(300)
+    add(collection, [(f"r{i}", v.tolist(), {"content_type": "even" if i % 2 else "odd"}) for i, v in enumerate(vectors)])
+
+    query = vectors[7] / np.linalg.norm(vectors[7])
+    assert [hit.id for hit in collection.query(query.tolist(), 10)] == exact_top(vectors, query, 10)
+
+    # 删除的行即使仍在IVF列表中也不会返回；过滤条件与探测结果取交集
+    collection.delete(["r7"])
+    ids = [hit.id for hit in collection.query(query.tolist(), 10, where={"content_type": "even"})]
+    assert "r7" not in ids and all(int(i[1:]) % 2 for i in ids)
+    collection.close()
+
+
+def test_ivf_recall_with_few_probes(tmp_path, ivf_settings, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_IVF_NPROBE", 3)
+    rng = np.random.default_rng(1)
+    # 8个簇的数据，近邻集中在少数列表中
+    centers = rng.normal(size=(8, 32))
+    vectors = (centers[rng.integers(0, 8, 400)] + 0.1 * rng.normal(size=(400, 32))).astype(np.float32)
+    collection = NumpyCollection(tmp_path / "c")
+    add(collection, [(f"r{i}", v.tolist(), {}) for i, v in enumerate(vectors)])
+
+    recalls = []
+    for q in range(0, 400, 40):
+        query = vectors[q] / np.linalg.norm(vectors[q])
+        found = {hit.id for hit in collection.query(query.tolist(), 10)}
+        recalls.append(len(found & set(exact_top(vectors, query, 10))) / 10)
+    assert np.mean(recalls) >= 0.9
+    collection.close()
+
+
+def test_int8_rerank_returns_full_precision_scores(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_INDEX_MODE", "exact")
+    monkeypatch.setattr(settings, "NUMPY_RERANK_FACTOR", 4)
+    vectors = random_rows(500, dim=128)
+    rows = [(f"r{i}", v.tolist(), {}) for i, v in enumerate(vectors)]
+
+    exact = NumpyCollection(tmp_path / "exact", quantization="none")
+    quantized = NumpyCollection(tmp_path / "int8", quantization="int8")
+    add(exact, rows)
+    add(quantized, rows)
+
+    for q in (3, 42, 311):
+        query = vectors[q] / np.linalg.norm(vectors[q])
+        expected = exact.query(query.tolist(), 10)
+        hits = quantized.query(query.tolist(), 10)
+        assert [hit.id for hit in hits] == [hit.id for hit in expected]
+        # 重排使用全精度向量，相似度与精确检索一致
+        assert [hit.similarity for hit in hits] == pytest.approx([hit.similarity for hit in expected])
+
+    stats = quantized.get_stats()
+    assert stats["quantization"] == "int8"
+    assert stats["resident_vector_mb"] < stats["full_precision_mb"] / 3
+    exact.close()
+    quantized.close()
+
+
+def test_int8_codes_rebuilt_on_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "NUMPY_INDEX_MODE", "exact")
+    vectors = random_rows(50)
+    collection = NumpyCollection(tmp_path / "c", quantization="int8")
+    add(collection, [(f"r{i}", v.tolist(), {}) for i, v in enumerate(vectors)])
+    collection.close()
+
+    collection = NumpyCollection(tmp_path / "c", quantization="int8")
+    query = vectors[9] / np.linalg.norm(vectors[9])
+    assert collection.query(query.tolist(), 1)[0].id == "r9"
+    collection.close()
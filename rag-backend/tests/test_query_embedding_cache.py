@@ -0,0 +1,36 @@
+"""查询向量缓存规范化测试"""
+
+import pytest
+
+from app.core.query_embedding_cache import QueryEmbeddingCache
+
+normalize = QueryEmbeddingCache.normalize
+
+
+@pytest.mark.parametrize("query", [
+    "你会什么技术？",
+    "你会什么技术?",
+    "  你会什么技术  ",
+    "你会什么技术。",
+    "你会什么技术!!",
+])
+def test_equivalent_queries_share_key(query):
+    assert normalize(query) == "你会什么技术"
+
+
+def test_fullwidth_case_and_whitespace():
+    assert normalize("ＦａｓｔＡＰＩ   用过吗") == "fastapi 用过吗"
+    assert normalize("What\tis\nyour STACK?") == "what is your stack"
+
+
+def test_cjk_punctuation_unified():
+    assert normalize("「摄影」、徒步") == '"摄影",徒步'
+
+
+def test_punctuation_only_query_kept():
+    assert normalize("？？") == "??"
+    assert normalize("") == ""
+
+
+def test_inner_punctuation_kept():
+    assert normalize("Python, Go?") == "python, go"
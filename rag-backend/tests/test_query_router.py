@@ -0,0 +1,49 @@
+"""查询路由测试"""
+
+import json
+
+import pytest
+
+from app.core.keyword_tagger import KeywordTagger
+from app.core.query_router import QueryRouter, RouteDecision
+
+
+@pytest.fixture
+def router(tmp_path):
+    keywords = tmp_path / "keywords.json"
+    keywords.write_text(json.dumps({
+        "content_tags": {"python": ["python"], "react": ["react"]},
+        "query_content_types": {"projects": ["项目"], "experience": ["经历"]}
+    }), encoding="utf-8")
+    return QueryRouter(KeywordTagger(keywords))
+
+
+def test_where_filters_content_types_only():
+    decision = RouteDecision(content_types=["projects", "skills"], tags=["python"])
+    assert decision.where == {"content_type": {"$in": ["projects", "skills"]}}
+    assert RouteDecision(tags=["python"]).where is None
+    assert RouteDecision().where is None
+
+
+def test_routes_query_to_types_and_tags(router):
+    decision = router.route("用Python做过哪些项目")
+    assert decision.content_types == ["projects"] and decision.tags == ["python"]
+    assert router.get_stats()["top_partitions"] == {"content_type:projects": 1, "tag:python": 1}
+
+
+def test_skips_empty_partitions(router):
+    sizes = {"content_type": {"projects": 3, "skills": 5}, "tags": {"react": 2}}
+    decision = router.route("项目和工作经历里用过Python和React吗", sizes.__getitem__)
+    # experience和python在知识库中没有分块，不参与路由
+    assert decision.content_types == ["projects"] and decision.tags == ["react"]
+
+    decision = router.route("工作经历", sizes.__getitem__)
+    assert decision.where is None and decision.tags == []
+    stats = router.get_stats()
+    assert stats["routed"] == 1 and stats["unrouted"] == 1
+
+
+def test_tags_only_query_is_routed_without_filter(router):
+    decision = router.route("python", {"content_type": {}, "tags": {"python": 1}}.__getitem__)
+    assert decision.where is None and decision.tags == ["python"]
+    assert router.get_stats()["routed"] == 1
@@ -0,0 +1,60 @@
+"""检索结果截断与去冗余测试"""
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.core.result_diversifier import ResultDiversifier, adaptive_cutoff, mmr_select
+
+
+@pytest.fixture
+def diversifier(monkeypatch):
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", True)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_MIN_RESULTS", 2)
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_MIN_GAP", 0.15)
+    monkeypatch.setattr(settings, "MMR_ENABLED", True)
+    monkeypatch.setattr(settings, "MMR_LAMBDA", 0.5)
+    return ResultDiversifier()
+
+
+def test_adaptive_cutoff_at_largest_gap():
+    scores = np.array([0.9, 0.88, 0.85, 0.4, 0.38])
+    assert adaptive_cutoff(scores, min_keep=2, min_gap=0.15) == 3
+
+
+def test_adaptive_cutoff_respects_min_keep_and_gap():
+    scores = np.array([0.9, 0.3, 0.29])
+    assert adaptive_cutoff(scores, min_keep=2, min_gap=0.15) == 3
+    assert adaptive_cutoff(np.array([0.9, 0.85, 0.8]), min_keep=1, min_gap=0.15) == 3
+    assert adaptive_cutoff(np.array([0.9]), min_keep=2, min_gap=0.15) == 1
+    assert adaptive_cutoff(np.array([0.0, 0.0, 0.0]), min_keep=1, min_gap=0.15) == 3
+
+
+def test_mmr_skips_redundant_candidate():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
+    relevance = np.array([1.0, 0.98, 0.8])
+    assert mmr_select(vectors, relevance, 2, lambda_mult=0.5) == [0, 2]
+    # λ=1只看相关性
+    assert mmr_select(vectors, relevance, 2, lambda_mult=1.0) == [0, 1]
+
+
+def test_mmr_edge_cases():
+    vectors = np.array([[1.0, 0.0]])
+    assert mmr_select(vectors, np.array([1.0]), 0, 0.5) == []
+    assert mmr_select(vectors, np.array([1.0]), 5, 0.5) == [0]
+
+
+def test_select_cutoff_then_mmr(diversifier):
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0], [0.7, 0.7]])
+    scores = np.array([0.9, 0.89, 0.85, 0.3])
+    assert diversifier.select(vectors, scores, 3) == [0, 2, 1]
+
+    stats = diversifier.get_stats()
+    assert stats == {"requests": 1, "avg_candidates": 4.0, "avg_after_cutoff": 3.0, "avg_returned": 3.0}
+
+
+def test_select_disabled(diversifier, monkeypatch):
+    monkeypatch.setattr(settings, "ADAPTIVE_CUTOFF_ENABLED", False)
+    monkeypatch.setattr(settings, "MMR_ENABLED", False)
+    vectors = np.eye(3)
+    assert diversifier.select(vectors, np.array([0.9, 0.2, 0.1]), 2) == [0, 1]